@@ -2,8 +2,8 @@
 from flask import Blueprint, request, jsonify
 from datetime import date, datetime, time as dtime
 from App.controllers import (
-    schedule_shift, schedule_week, get_roster,
-    clock_in, clock_out, weekly_report
+    schedule_shift, schedule_week, schedule_bulk,
+    clock_in, clock_out, weekly_report, roster_cache, ShiftConflictError
 )
 
 api = Blueprint('api', __name__, url_prefix='/api')
@@ -15,35 +15,59 @@ def parse_datetime(s): return datetime.fromisoformat(s)
 @api.route('/admin/shifts', methods=['POST'])
 def api_create_shift():
     data = request.get_json() or {}
-    shift = schedule_shift(
-        user_id=int(data['user_id']),
-        work_date=parse_date(data['date']),
-        start=_to_time(data['start']),
-        end=_to_time(data['end']),
-        role=data.get('role'),
-        location=data.get('location'),
-    )
+    try:
+        shift = schedule_shift(
+            user_id=int(data['user_id']),
+            work_date=parse_date(data['date']),
+            start=_to_time(data['start']),
+            end=_to_time(data['end']),
+            role=data.get('role'),
+            location=data.get('location'),
+        )
+    except ShiftConflictError as e:
+        return _conflict_response(e)
     return jsonify(shift.get_json()), 201
 
 # --- Admin: create a week's schedule for a user ---
 @api.route('/admin/shifts/bulk', methods=['POST'])
 def api_create_week():
+    """Overlapping shifts -> 409 with the conflicts, unless skip_conflicts."""
     data = request.get_json() or {}
-    created = schedule_week(
-        user_id=int(data['user_id']),
-        week_start=parse_date(data['week_start']),
-        daily_windows=data['daily_windows'],
-        role=data.get('role'),
-        location=data.get('location'),
-    )
-    return jsonify([s.get_json() for s in created]), 201
+    try:
+        result = schedule_week(
+            user_id=int(data['user_id']),
+            week_start=parse_date(data['week_start']),
+            daily_windows=data['daily_windows'],
+            role=data.get('role'),
+            location=data.get('location'),
+            skip_existing=data.get('skip_existing', True),
+            skip_conflicts=data.get('skip_conflicts', False),
+        )
+    except ShiftConflictError as e:
+        return _conflict_response(e)
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result), 201
 
-# --- Staff: combined roster ---
-@api.route('/roster', methods=['GET'])
-def api_roster():
-    start = parse_date(request.args.get('start'))
-    end = parse_date(request.args.get('end'))
-    return jsonify(get_roster(start, end)), 200
+# --- Admin: schedule many shifts (any users/dates) in one transaction ---
+@api.route('/admin/shifts/batch', methods=['POST'])
+def api_create_batch():
+    """
+    { "skip_existing": true, "skip_conflicts": false,
+      "shifts": [{"user_id": 1, "date": "2024-01-01", "start": "09:00", "end": "17:00",
+                  "role": "cashier", "location": "front"}, ...] }
+    Overlapping shifts -> 409 with the conflicts, unless skip_conflicts.
+    """
+    data = request.get_json() or {}
+    try:
+        result = schedule_bulk(data.get('shifts') or [],
+                               skip_existing=data.get('skip_existing', True),
+                               skip_conflicts=data.get('skip_conflicts', False))
+    except ShiftConflictError as e:
+        return _conflict_response(e)
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result), 201
 
 # --- Staff: time in/out ---
 @api.route('/attendance/clock-in', methods=['POST'])
@@ -64,6 +88,14 @@ def api_weekly_report():
     week_start = parse_date(request.args.get('week_start'))
     return jsonify(weekly_report(week_start)), 200
 
+# --- Admin: roster cache counters (for sizing ROSTER_CACHE_MAX_*) ---
+@api.route('/admin/cache', methods=['GET'])
+def api_cache_stats():
+    return jsonify(roster=roster_cache().stats()), 200
+
 # helpers
 def _to_time(s: str) -> dtime:
     return dtime.fromisoformat(s)
+
+def _conflict_response(e):
+    return jsonify(error=str(e), conflicts=e.conflicts), 409
@@ -0,0 +1,478 @@
+"""Synthetic data and timing harness for the scheduling/reporting paths.
+
+`flask bench seed` fills the configured database with users, shifts and
+attendance; `flask bench run` times the hot controllers against whatever is
+in it and prints JSON (p50/p95 latency in ms, queries per call, peak
+traced memory) so runs on different sizes or commits can be diffed.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import contains_eager
+
+from App.database import db
+from App.hashing import hash_password
+from App.packing import pack, unpack, zstandard
+from App.intervals import IntervalIndex
+from App import serializers
+from App.models import User, Shift, Attendance
+from App.controllers import (
+    schedule_bulk,
+    schedule_week,
+    get_roster,
+    roster_cache,
+    weekly_report,
+    generate_weekly_report,
+    clock_in,
+    clock_out,
+    clock_coalescer,
+    rebuild_daily_hours,
+    payroll_rows,
+    compute_payroll,
+    approve_attendance,
+    set_attendance_approval,
+)
+from App.controllers import payroll as payroll_module
+from App.controllers.shift import _roster_select
+
+ROLES = ["cashier", "stock", "floor", "supervisor", "cleaner"]
+LOCATIONS = ["front", "back", "warehouse", "kiosk"]
+WINDOWS = [("06:00", "14:00"), ("09:00", "17:00"), ("12:00", "16:00"), ("14:00", "22:00")]
+
+
+def _monday(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def seed(users=100, weeks=4, start=None, rng_seed=42, clock_rate=0.9, approve_rate=0.7):
+    """Insert `users` staff with ~5 shifts a week for `weeks` weeks from `start`
+    (a Monday, default: `weeks` weeks before this one). Past shifts get
+    attendance with jittered clock times; some of those are approved.
+    Returns counts of what was created."""
+    rng = random.Random(rng_seed)
+    start = _monday(start or date.today() - timedelta(weeks=weeks))
+
+    # one hash shared by every synthetic user keeps seeding fast
+    pw = hash_password("benchpass")
+    taken = set(db.session.execute(db.select(User.username).where(User.username.like("bench%"))).scalars())
+    names = [f"bench{i:05d}" for i in range(users)]
+    new = [n for n in names if n not in taken]
+    if new:
+        db.session.execute(db.insert(User), [{"username": n, "password": pw, "isAdmin": False} for n in new])
+        db.session.commit()
+    user_ids = db.session.execute(db.select(User.id).where(User.username.in_(names))).scalars().all()
+
+    created = 0
+    for w in range(weeks):
+        week = start + timedelta(weeks=w)
+        rows = []
+        for uid in user_ids:
+            role, location = rng.choice(ROLES), rng.choice(LOCATIONS)
+            for offset in sorted(rng.sample(range(7), 5)):
+                begin, end = rng.choice(WINDOWS)
+                rows.append({"user_id": uid, "date": week + timedelta(days=offset),
+                             "start": begin, "end": end, "role": role, "location": location})
+        created += len(schedule_bulk(rows)["created"])
+
+    today = date.today()
+    updates = []
+    pending = db.session.execute(
+        db.select(Attendance.id, Shift.work_date, Shift.start_time, Shift.end_time)
+        .join(Shift, Shift.id == Attendance.shift_id)
+        .where(Shift.user_id.in_(user_ids), Shift.work_date < today, Attendance.time_in.is_(None))
+    ).all()
+    for att_id, work_date, begin, end in pending:
+        if rng.random() > clock_rate:
+            continue
+        t_in = datetime.combine(work_date, begin) + timedelta(minutes=rng.randint(-10, 15))
+        t_out = datetime.combine(work_date, end) + timedelta(minutes=rng.randint(-15, 30))
+        updates.append({"id": att_id, "time_in": t_in, "time_out": t_out,
+                        "approved": rng.random() < approve_rate})
+    if updates:
+        db.session.execute(db.update(Attendance), updates)
+        db.session.commit()
+    rebuild_daily_hours()
+    return {"users": len(new), "shifts": created, "attendance_clocked": len(updates)}
+
+
+@contextmanager
+def count_queries():
+    counter = {"n": 0}
+
+    def on_execute(*args):
+        counter["n"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", on_execute)
+
+
+def measure(fn, repeat=10, setup=None):
+    """Run fn() `repeat` times; return latency percentiles (ms) and mean query
+    count per call, plus the peak traced allocation (KiB) from one extra run
+    (tracing is kept out of the timed runs because it slows them down)."""
+    call = (lambda arg: fn()) if setup is None else fn
+    timings, queries = [], []
+    for i in range(repeat + 1):
+        arg = setup(i) if setup else None
+        db.session.expunge_all()
+        if i == repeat:
+            tracemalloc.start()
+            call(arg)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            break
+        with count_queries() as counter:
+            t0 = time.perf_counter()
+            call(arg)
+            timings.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter["n"])
+    timings.sort()
+    return {
+        "runs": repeat,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 3),
+        "queries": round(sum(queries) / len(queries), 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def dataset_size():
+    return {
+        "users": db.session.scalar(db.select(func.count(User.id))),
+        "shifts": db.session.scalar(db.select(func.count(Shift.id))),
+        "attendance": db.session.scalar(db.select(func.count(Attendance.id))),
+    }
+
+
+def run(repeat=10, range_weeks=(1, 4)):
+    """Time the hot paths against the current database; returns a JSON-able dict."""
+    first, last = db.session.execute(db.select(func.min(Shift.work_date), func.max(Shift.work_date))).one()
+    if not first:
+        raise ValueError("No shifts to benchmark; run `flask bench seed` first.")
+    week = _monday(first)
+    results = {}
+
+    for weeks in range_weeks:
+        end = min(week + timedelta(weeks=weeks) - timedelta(days=1), last)
+
+        def roster_cold(end=end):
+            roster_cache().clear()
+            get_roster(week, end)
+        results[f"get_roster_{weeks}w"] = measure(roster_cold, repeat)
+        results[f"get_roster_{weeks}w_cached"] = measure(lambda end=end: get_roster(week, end), repeat)
+
+    results["weekly_report"] = measure(lambda: weekly_report(week), repeat)
+    results["generate_weekly_report"] = measure(
+        lambda: generate_weekly_report(week, week + timedelta(days=6)), repeat)
+
+    client = current_app.test_client()
+    results["shifts_summary"] = measure(
+        lambda: client.get(f"/api/shifts/summary?start_date={week}&end_date={week + timedelta(days=6)}"),
+        repeat)
+
+    open_rows = db.session.execute(
+        db.select(Attendance.user_id, Attendance.shift_id)
+        .where(Attendance.time_in.is_(None)).limit(repeat + 1)
+    ).all()
+    if len(open_rows) == repeat + 1:
+        results["clock_in"] = measure(lambda r: clock_in(r.user_id, r.shift_id),
+                                      repeat, setup=lambda i: open_rows[i])
+        results["clock_out"] = measure(lambda r: clock_out(r.user_id, r.shift_id),
+                                       repeat, setup=lambda i: open_rows[i])
+
+    uid = db.session.scalar(db.select(User.id).where(User.username.like("bench%")).limit(1))
+    if uid:
+        future = _monday(last) + timedelta(weeks=1)
+        windows = {i: ("09:00", "17:00") for i in range(5)}
+        results["schedule_week"] = measure(
+            lambda ws: schedule_week(uid, ws, windows), repeat,
+            setup=lambda i: future + timedelta(weeks=i))
+
+    return {
+        "dataset": dataset_size(),
+        "database": db.engine.dialect.name,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def clock_storm(clients=100, windows=(0, 5)):
+    """Shift-start load: `clients` threads clock in at once, for each
+    ATTENDANCE_COALESCE_MS in `windows` (0 = one commit per clock-in).
+    Each window gets a fresh day of shifts after the last scheduled one.
+    Returns clock-ins per second (and batches used) per window."""
+    app = current_app._get_current_object()
+    user_ids = db.session.execute(
+        db.select(User.id).where(User.username.like("bench%")).order_by(User.id).limit(clients)
+    ).scalars().all()
+    if not user_ids:
+        raise ValueError("No bench users; run `flask bench seed` first.")
+    last = db.session.scalar(db.select(func.max(Shift.work_date)))
+    saved = app.config.get("ATTENDANCE_COALESCE_MS", 0)
+    results = {}
+    try:
+        for n, window in enumerate(windows, start=1):
+            day = last + timedelta(days=n)
+            created = schedule_bulk([{"user_id": uid, "date": day, "start": "09:00", "end": "17:00"}
+                                     for uid in user_ids])["created"]
+            app.config["ATTENDANCE_COALESCE_MS"] = window
+            coalescer = clock_coalescer()
+            batches_before = coalescer.batches if coalescer else 0
+            errors = []
+            gate = threading.Barrier(len(created) + 1)
+
+            def worker(shift):
+                with app.app_context():
+                    gate.wait()
+                    try:
+                        clock_in(shift["user_id"], shift["id"])
+                    except Exception as e:
+                        errors.append(repr(e))
+
+            threads = [threading.Thread(target=worker, args=(shift,)) for shift in created]
+            for t in threads:
+                t.start()
+            gate.wait()
+            t0 = time.perf_counter()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - t0
+            done = len(created) - len(errors)
+            results[f"{window}ms" if window else "off"] = {
+                "clock_ins": done,
+                "errors": len(errors),
+                "seconds": round(elapsed, 3),
+                "per_sec": round(done / elapsed, 1) if elapsed else None,
+                "batches": (coalescer.batches - batches_before) if coalescer else done,
+            }
+    finally:
+        app.config["ATTENDANCE_COALESCE_MS"] = saved
+    return {"clients": len(user_ids), "database": db.engine.dialect.name, "results": results}
+
+
+def _timed(fn, items):
+    timings = []
+    out = []
+    for item in items:
+        t0 = time.perf_counter()
+        out.append(fn(item))
+        timings.append((time.perf_counter() - t0) * 1000)
+    return out, round(statistics.median(timings), 3)
+
+
+def report_storage(weeks=52):
+    """Size and encode/decode time of `weeks` weekly report payloads stored
+    as plain JSON vs packed (App/packing.py). Payloads come from the weeks
+    that have shifts, cycled if there are fewer than `weeks` of them."""
+    first, last = db.session.execute(db.select(func.min(Shift.work_date), func.max(Shift.work_date))).one()
+    if not first:
+        raise ValueError("No shifts to report on; run `flask bench seed` first.")
+    available = [r for r in (weekly_report(_monday(first) + timedelta(weeks=w))
+                             for w in range((last - _monday(first)).days // 7 + 1)) if r["shifts"]]
+    payloads = [available[i % len(available)] for i in range(weeks)]
+
+    results = {}
+    stored, encode_ms = _timed(lambda p: json.dumps(p).encode(), payloads)
+    _, decode_ms = _timed(json.loads, stored)
+    results["json"] = {"bytes": sum(map(len, stored)), "encode_p50_ms": encode_ms, "decode_p50_ms": decode_ms}
+    for codec in ("zlib", "zstd"):
+        if codec == "zstd" and zstandard is None:
+            continue
+        packed, encode_ms = _timed(lambda p: pack(p, codec), payloads)
+        _, decode_ms = _timed(unpack, packed)
+        size = sum(map(len, packed))
+        results[codec] = {"bytes": size, "encode_p50_ms": encode_ms, "decode_p50_ms": decode_ms,
+                          "ratio": round(results["json"]["bytes"] / size, 1)}
+    return {"reports": weeks, "distinct_weeks": len(available),
+            "shifts_per_report": round(sum(len(p["shifts"]) for p in payloads) / weeks, 1),
+            "results": results}
+
+
+def serialization(weeks=4, repeat=5):
+    """Rows/s for the roster and attendance read paths: ORM instances +
+    get_json() + jsonify's encoder, vs column projection + row_json() +
+    serializers.dumps (orjson if installed). Both must produce identical
+    bytes. Uses the `weeks` weeks up to the latest shift."""
+    last = db.session.scalar(db.select(func.max(Shift.work_date)))
+    if not last:
+        raise ValueError("No shifts to serialize; run `flask bench seed` first.")
+    start, end = last - timedelta(weeks=weeks) + timedelta(days=1), last
+    provider = current_app.json
+
+    def orm_roster():
+        shifts = (Shift.query.join(Shift.user).options(contains_eager(Shift.user))
+                  .filter(Shift.work_date.between(start, end))
+                  .order_by(Shift.work_date.asc(), Shift.start_time.asc(), Shift.id.asc()).all())
+        return provider.dumps([s.get_json() for s in shifts], separators=(",", ":")).encode()
+
+    def projected_roster():
+        rows = db.session.execute(_roster_select(start, end))
+        return serializers.dumps([Shift.row_json(r) for r in rows], sort_keys=True)
+
+    in_range = db.select(Shift.id).where(Shift.work_date.between(start, end))
+
+    def orm_attendance():
+        atts = Attendance.query.filter(Attendance.shift_id.in_(in_range)).order_by(Attendance.id).all()
+        return provider.dumps([a.get_json() for a in atts], separators=(",", ":")).encode()
+
+    def projected_attendance():
+        rows = db.session.execute(db.select(*Attendance.json_columns())
+                                  .where(Attendance.shift_id.in_(in_range)).order_by(Attendance.id))
+        return serializers.dumps([Attendance.row_json(r) for r in rows], sort_keys=True)
+
+    results = {}
+    for name, before, after in (("roster", orm_roster, projected_roster),
+                                ("attendance", orm_attendance, projected_attendance)):
+        db.session.expunge_all()
+        body = before()
+        if after() != body:
+            raise AssertionError(f"{name}: projected output differs from get_json()")
+        rows = len(json.loads(body))
+        entry = {"rows": rows}
+        for label, fn in (("orm", before), ("projected", after)):
+            timings = []
+            for _ in range(repeat):
+                db.session.expunge_all()
+                t0 = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - t0)
+            entry[f"{label}_rows_per_s"] = round(rows / statistics.median(timings))
+        entry["speedup"] = round(entry["projected_rows_per_s"] / entry["orm_rows_per_s"], 1)
+        results[name] = entry
+    return {"weeks": weeks, "encoder": "orjson" if serializers.orjson else "json", "results": results}
+
+
+def _overlap_rows(users, shifts, start, rng):
+    """~`shifts` windows for `users` users from `start`, two a day per user
+    with a random chance of the second overlapping the first."""
+    rows = []
+    per_user = max(1, shifts // users)
+    for uid in range(users):
+        for n in range(per_user):
+            day = start + timedelta(days=n // 2)
+            if n % 2 == 0:
+                begin, end = rng.randint(6, 10), rng.randint(12, 14)
+            else:
+                begin, end = rng.randint(11, 15), rng.randint(17, 22)  # overlaps if begin < first end
+            rows.append((uid, day, f"{begin:02d}:00", f"{end:02d}:00"))
+    return rows
+
+
+def overlap_check(users=100, shifts=40000, rng_seed=42, write=False):
+    """Overlap checks/s over `shifts` synthetic windows: IntervalIndex
+    (bisect per user and day) vs scanning each user's accepted shifts.
+    Both must flag the same rows. With write=True the rows are also fed to
+    schedule_bulk (skip_conflicts) for real users, dated from next year."""
+    rng = random.Random(rng_seed)
+    start = _monday(date(date.today().year + 1, 1, 8))
+    rows = _overlap_rows(users, shifts, start, rng)
+    windows = [(uid, day, datetime.strptime(b, "%H:%M").time(), datetime.strptime(e, "%H:%M").time())
+               for uid, day, b, e in rows]
+
+    def naive():
+        accepted, flagged = {}, 0
+        for uid, day, b, e in windows:
+            mine = accepted.setdefault(uid, [])
+            if any(d == day and s < e and b < f for d, s, f in mine):
+                flagged += 1
+            else:
+                mine.append((day, b, e))
+        return flagged
+
+    def indexed():
+        index, flagged = IntervalIndex(), 0
+        for uid, day, b, e in windows:
+            if index.overlapping((uid, day), b, e):
+                flagged += 1
+            else:
+                index.add((uid, day), b, e)
+        return flagged
+
+    results = {}
+    for name, fn in (("scan", naive), ("interval_index", indexed)):
+        t0 = time.perf_counter()
+        flagged = fn()
+        elapsed = time.perf_counter() - t0
+        results[name] = {"conflicts": flagged, "checks_per_s": round(len(windows) / elapsed)}
+    if results["scan"]["conflicts"] != results["interval_index"]["conflicts"]:
+        raise AssertionError("interval index and scan disagree")
+    out = {"shifts": len(windows), "users": users, "results": results}
+
+    if write:
+        names = [f"bench{i:05d}" for i in range(users)]
+        ids = dict(db.session.execute(db.select(User.username, User.id).where(User.username.in_(names))).all())
+        if len(ids) < users:
+            raise ValueError(f"Needs {users} bench users; run `flask bench seed --users {users}` first.")
+        bulk = [{"user_id": ids[names[uid]], "date": day, "start": b, "end": e} for uid, day, b, e in rows]
+        t0 = time.perf_counter()
+        result = schedule_bulk(bulk, skip_conflicts=True)
+        out["schedule_bulk"] = {"seconds": round(time.perf_counter() - t0, 2),
+                                "created": len(result["created"]), "skipped": len(result["skipped"]),
+                                "conflicts": len(result["conflicts"])}
+    return out
+
+
+def payroll(repeat=5):
+    """compute_payroll over every shift in the database (one "period"):
+    numpy grouped sums vs plain lists, plus the row load. Both must agree."""
+    first, last = db.session.execute(db.select(func.min(Shift.work_date), func.max(Shift.work_date))).one()
+    if not first:
+        raise ValueError("No shifts to pay; run `flask bench seed` first.")
+    t0 = time.perf_counter()
+    rows = payroll_rows(first, last)
+    load_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    backends = [False] + ([True] if payroll_module.numpy is not None else [])
+    results, outputs = {}, {}
+    for use_numpy in backends:
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            outputs[use_numpy] = compute_payroll(rows, first, last, use_numpy=use_numpy)
+            timings.append((time.perf_counter() - t0) * 1000)
+        results["numpy" if use_numpy else "python"] = {"p50_ms": round(statistics.median(timings), 1)}
+    if len(outputs) == 2 and outputs[True] != outputs[False]:
+        raise AssertionError("numpy and python payroll totals differ")
+    return {"rows": len(rows), "users": len(outputs[False]["per_user"]),
+            "days": (last - first).days + 1, "load_ms": load_ms, "results": results}
+
+
+def approvals(days=7):
+    """Approving every attendance record in the last `days` of shifts:
+    one approve_attendance call per record vs one set_attendance_approval.
+    Each side starts from all records unapproved; the end state is the same."""
+    last = db.session.execute(db.select(func.max(Shift.work_date))).scalar()
+    if not last:
+        raise ValueError("No shifts to approve; run `flask bench seed` first.")
+    first = last - timedelta(days=days - 1)
+    pairs = db.session.execute(
+        db.select(Attendance.user_id, Attendance.shift_id)
+        .join(Shift, Shift.id == Attendance.shift_id)
+        .where(Shift.work_date.between(first, last))
+    ).all()
+
+    results = {}
+    for name in ("per_record", "bulk"):
+        set_attendance_approval(False, start_date=first, end_date=last)
+        with count_queries() as queries:
+            t0 = time.perf_counter()
+            if name == "bulk":
+                set_attendance_approval(True, start_date=first, end_date=last)
+            else:
+                for user_id, shift_id in pairs:
+                    approve_attendance(user_id, shift_id)
+            elapsed = time.perf_counter() - t0
+        results[name] = {"seconds": round(elapsed, 3), "queries": queries["n"]}
+    return {"records": len(pairs), "start_date": first.isoformat(), "end_date": last.isoformat(),
+            "results": results}
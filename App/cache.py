@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Small in-process LRU cache bounded by entry count and approximate bytes.
+
+    Values are stored with a caller-supplied size; the least recently used
+    entries are evicted until both bounds hold. An optional ttl (seconds)
+    expires entries on read. Hit/miss/eviction counters are kept for sizing.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[2] > self.ttl:
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, size=1):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._bytes -= self._data.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key satisfies predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
@@ -0,0 +1,79 @@
+"""Group-commit queue for small, frequent writes.
+
+Callers hand an item to ``submit`` and block until it has been written.
+A background thread collects everything submitted within ``window`` seconds
+(or until ``max_batch`` items are waiting) and passes the whole batch to
+``flush_batch`` inside an app context, so one transaction and one commit
+cover many requests. The caller only returns once that commit has happened,
+so a response still means the write is durable.
+
+``flush_batch(items)`` must return one entry per item, in order: either the
+item's result or an Exception instance, which is re-raised in that caller.
+If it raises, every caller in the batch gets the error.
+Under gunicorn's gevent worker the thread and its waits are greenlets.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class Coalescer:
+    def __init__(self, app, flush_batch, window=0.005, max_batch=500, timeout=10):
+        self.app = app
+        self.flush_batch = flush_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        with self._cond:
+            self._pending.append((item, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return future.result(timeout=self.timeout)
+
+    def alive(self):
+        # threads don't survive fork, so a gunicorn worker needs its own
+        return self._pid == os.getpid() and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            with self.app.app_context():
+                results = self.flush_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items, "pending": len(self._pending)}
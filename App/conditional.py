@@ -0,0 +1,44 @@
+"""Conditional GET (ETag / Last-Modified) for polled JSON endpoints.
+
+A view builds its ETag from cheap change counters (the data_versions table,
+see App/controllers/versions.py) or a row's updated_at *before* it queries
+anything else; when the client's copy is still current it answers 304 with
+no body, skipping the row query and the serialization entirely.
+"""
+import hashlib
+from datetime import timezone
+from flask import request, make_response
+
+
+def make_etag(*parts) -> str:
+    """Short opaque tag over everything that shapes a response."""
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def _http_date(dt):
+    # stored timestamps are naive UTC; HTTP dates have whole seconds
+    return dt.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach the validators. no-cache makes clients revalidate every time
+    rather than reuse a copy that may have gone stale."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """A 304 response if the request's validators match, else None.
+    If-None-Match wins over If-Modified-Since when both are sent."""
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif last_modified is not None and request.if_modified_since:
+        matched = _http_date(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return with_validators(make_response("", 304), etag, last_modified)
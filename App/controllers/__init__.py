@@ -1,6 +1,13 @@
+from .versions import *
 from .user import *
 from .auth import *
 from .initialize import *
+from .rollup import *
 from .attendance import *
 from .shift import *
+from .coverage import *
+from .payroll import *
 from .report import *
+from .period import *
+from .jobs import *
+from .precompute import *
@@ -1,33 +1,200 @@
-from App.models import Attendance
-from App.database import db
-from datetime import datetime
-from typing import Optional
+import threading
+from flask import current_app
+from sqlalchemy import bindparam, tuple_
+from App.models import Attendance, Shift
+from App.models.attendance import not_approved
+from App.database import db, dialect_insert
+from App.coalescer import Coalescer
+from .rollup import refresh_daily_hours
+from .precompute import requeue_reports_for_dates
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
 
-def clock_in(user_id: int, shift_id: int, when: Optional[datetime] = None):
-    when = when or datetime.now()
+_coalescer_lock = threading.Lock()
+
+
+def clock_coalescer():
+    """This worker's clock-in/out write queue, or None when
+    ATTENDANCE_COALESCE_MS is 0 (the default: each call commits on its own).
+
+    With a window set, clock_in/clock_out queue their write and wait until
+    the batch it landed in has committed (see App/coalescer.py).
+    """
+    window_ms = current_app.config.get("ATTENDANCE_COALESCE_MS", 0)
+    if not window_ms:
+        return None
+    coalescer = current_app.extensions.get("clock_coalescer")
+    if coalescer is None or not coalescer.alive():
+        with _coalescer_lock:
+            coalescer = current_app.extensions.get("clock_coalescer")
+            if coalescer is None or not coalescer.alive():
+                coalescer = Coalescer(
+                    current_app._get_current_object(), _apply_clock_batch,
+                    window=window_ms / 1000.0,
+                    max_batch=current_app.config.get("ATTENDANCE_COALESCE_MAX_BATCH", 500),
+                )
+                current_app.extensions["clock_coalescer"] = coalescer
+    return coalescer
+
+
+def _apply_clock_batch(items):
+    """Apply queued ("in"|"out", user_id, shift_id, when) writes in one
+    transaction: one SELECT for the rows, at most one executemany UPDATE per
+    column, one rollup refresh and one commit. Items are resolved in order,
+    so a clock-in and clock-out in the same batch behave as if sequential;
+    a clock-in with no row yet creates it via the single-row upsert.
+    Returns the attendance id (or a ValueError) per item."""
+    keys = {(user_id, shift_id) for _, user_id, shift_id, _ in items}
+    rows = db.session.execute(
+        db.select(Attendance.id, Attendance.user_id, Attendance.shift_id,
+                  Attendance.time_in, Attendance.time_out, Shift.work_date)
+        .join(Shift, Shift.id == Attendance.shift_id)
+        .where(tuple_(Attendance.user_id, Attendance.shift_id).in_(list(keys)))
+    ).all()
+    state = {(r.user_id, r.shift_id): [r.id, r.time_in, r.time_out, r.work_date] for r in rows}
+
+    results, ins, outs, touched = [], [], [], set()
+    for action, user_id, shift_id, when in items:
+        row = state.get((user_id, shift_id))
+        if row is None and action == "in":
+            try:
+                att = _clock_in_row(user_id, shift_id, when)
+            except ValueError as e:
+                results.append(e)
+                continue
+            row = state[(user_id, shift_id)] = [
+                att.id, att.time_in, att.time_out, db.session.get(Shift, shift_id).work_date]
+        if row is None:
+            results.append(ValueError("Attendance record not found for this shift/user."))
+            continue
+        if action == "in":
+            if not row[1]:
+                row[1] = when
+                ins.append({"att_id": row[0], "when": when})
+        else:
+            if not row[1]:
+                results.append(ValueError("Cannot clock out before clocking in."))
+                continue
+            if not row[2]:
+                row[2] = when
+                outs.append({"att_id": row[0], "when": when})
+                touched.add((user_id, row[3]))
+        results.append(row[0])
+
+    table = Attendance.__table__
+    if ins:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("att_id"), table.c.time_in.is_(None))
+            .values(time_in=bindparam("when")),
+            ins,
+        )
+    if outs:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("att_id"), table.c.time_out.is_(None))
+            .values(time_out=bindparam("when")),
+            outs,
+        )
+    refresh_daily_hours(touched)
+    db.session.commit()
+    return results
+
+
+def _coalesced(coalescer, action, user_id, shift_id, when):
+    att_id = coalescer.submit((action, int(user_id), int(shift_id), when))
+    return db.session.get(Attendance, att_id, populate_existing=True)
+
+
+def _write_returning(stmt, user_id: int, shift_id: int):
+    """Execute an INSERT/UPDATE on one attendance row and return the row it
+    wrote (refreshed in the session), or None if it matched nothing. Uses
+    RETURNING where the dialect has it, else re-selects the row."""
+    options = {"populate_existing": True}
+    if stmt.is_update:
+        options["synchronize_session"] = False
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_returning and dialect.update_returning:
+        return db.session.execute(stmt.returning(Attendance), execution_options=options).scalar_one_or_none()
+    if not db.session.execute(stmt, execution_options=options).rowcount:
+        return None
+    return (Attendance.query.filter_by(shift_id=shift_id, user_id=user_id)
+            .populate_existing().first())
+
+
+def _clock_in_upsert(user_id: int, shift_id: int, when: datetime):
+    """INSERT ... SELECT from the user's shift, ON CONFLICT setting time_in
+    only where it is still NULL: creates the row if schedule_shift didn't,
+    and is a no-op (no row returned) if already clocked in."""
+    source = db.select(Shift.id, db.literal(user_id), db.literal(when, db.DateTime)).where(
+        Shift.id == shift_id, Shift.user_id == user_id)
+    stmt = dialect_insert(Attendance).from_select(["shift_id", "user_id", "time_in"], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["shift_id", "user_id"],
+        set_={"time_in": stmt.excluded.time_in},
+        where=Attendance.time_in.is_(None),
+    )
+    return _write_returning(stmt, user_id, shift_id)
+
+
+def _clock_in_row(user_id: int, shift_id: int, when: datetime):
+    """Set time_in on the (user_id, shift_id) row if unset; does not commit."""
+    att = _clock_in_upsert(user_id, shift_id, when)
+    if att is not None:
+        return att
     att = Attendance.query.filter_by(shift_id=shift_id, user_id=user_id).first()
     if not att:
-        raise ValueError("Attendance record not found for this shift/user.")
-    if att.time_in:
-        return att
-    att.time_in = when
+        raise ValueError("Shift not found for this user.")
+    if att.time_in is None:
+        # existing row on a shift the user doesn't own (see ensure_attendance_record)
+        att = _write_returning(
+            db.update(Attendance)
+            .where(Attendance.id == att.id, Attendance.time_in.is_(None))
+            .values(time_in=when),
+            user_id, shift_id) or att
+    return att
+
+
+def clock_in(user_id: int, shift_id: int, when: Optional[datetime] = None):
+    when = when or datetime.now()
+    coalescer = clock_coalescer()
+    if coalescer:
+        return _coalesced(coalescer, "in", user_id, shift_id, when)
+    att = _clock_in_row(int(user_id), int(shift_id), when)
     db.session.commit()
     return att
 
 def clock_out(user_id: int, shift_id: int, when: Optional[datetime] = None):
     when = when or datetime.now()
-    att = Attendance.query.filter_by(shift_id=shift_id, user_id=user_id).first()
-    if not att:
-        raise ValueError("Attendance record not found for this shift/user.")
-    if not att.time_in:
-        raise ValueError("Cannot clock out before clocking in.")
-    if att.time_out:
+    coalescer = clock_coalescer()
+    if coalescer:
+        return _coalesced(coalescer, "out", user_id, shift_id, when)
+    att = _write_returning(
+        db.update(Attendance)
+        .where(Attendance.shift_id == shift_id, Attendance.user_id == user_id,
+               Attendance.time_in.isnot(None), Attendance.time_out.is_(None))
+        .values(time_out=when),
+        user_id, shift_id)
+    if att is None:
+        att = Attendance.query.filter_by(shift_id=shift_id, user_id=user_id).first()
+        if not att:
+            raise ValueError("Attendance record not found for this shift/user.")
+        if not att.time_in:
+            raise ValueError("Cannot clock out before clocking in.")
         return att
-    att.time_out = when
+    _refresh_rollup(att)
     db.session.commit()
     return att
 
 
+def _refresh_rollup(att: Attendance):
+    """Refresh the rollup for att's day and return that work_date."""
+    shift = db.session.get(Shift, att.shift_id)
+    if shift:
+        refresh_daily_hours([(att.user_id, shift.work_date)])
+        return shift.work_date
+
+
 def ensure_attendance_record(user_id: int, shift_id: int, approved: Optional[bool] = None):
     """Return existing attendance record for (user_id, shift_id) or create it.
     If `approved` is provided, update the approved flag on the record.
@@ -41,13 +208,16 @@ def ensure_attendance_record(user_id: int, shift_id: int, approved: Optional[boo
         # update approved flag if caller provided a value
         if approved is not None and att.approved != approved:
             att.approved = bool(approved)
+            work_date = _refresh_rollup(att)
             db.session.commit()
+            requeue_reports_for_dates([work_date])
         return att
 
     att = Attendance(user_id=user_id, shift_id=shift_id)
     if approved is not None:
         att.approved = bool(approved)
     db.session.add(att)
+    _refresh_rollup(att)
     db.session.commit()
     return att
 
@@ -64,13 +234,58 @@ def get_attendance_for_shift(shift_id: int):
     return Attendance.query.filter_by(shift_id=shift_id).all()
 
 
+def _pending_criteria(user_id: Optional[int] = None):
+    criteria = [not_approved, Attendance.time_out.isnot(None)]
+    return criteria + [Attendance.user_id == user_id] if user_id else criteria
+
+
+def _clocked_in_criteria(user_id: Optional[int] = None):
+    criteria = [Attendance.time_in.isnot(None), Attendance.time_out.is_(None)]
+    return criteria + [Attendance.user_id == user_id] if user_id else criteria
+
+
+def get_pending_approvals(user_id: Optional[int] = None):
+    """Clocked-out attendance not yet approved (served by ix_attendance_pending_approval)."""
+    return Attendance.query.filter(*_pending_criteria(user_id)).all()
+
+
+def get_clocked_in(user_id: Optional[int] = None):
+    """Attendance with a time_in but no time_out yet (served by ix_attendance_clocked_in)."""
+    return Attendance.query.filter(*_clocked_in_criteria(user_id)).all()
+
+
+ATTENDANCE_STATUSES = ("pending", "clocked_in")
+
+
+def list_attendance_json(user_id: Optional[int] = None, shift_id: Optional[int] = None,
+                         status: Optional[str] = None):
+    """get_json() dicts for GET /api/attendance, read as column tuples: by
+    status (optionally one user's), else by user_id, else by shift_id."""
+    if status == "pending":
+        criteria = _pending_criteria(user_id)
+    elif status == "clocked_in":
+        criteria = _clocked_in_criteria(user_id)
+    elif status:
+        raise ValueError(f"status must be {' or '.join(ATTENDANCE_STATUSES)}")
+    elif user_id:
+        criteria = [Attendance.user_id == user_id]
+    elif shift_id:
+        criteria = [Attendance.shift_id == shift_id]
+    else:
+        raise ValueError("Provide user_id or shift_id")
+    rows = db.session.execute(db.select(*Attendance.json_columns()).where(*criteria))
+    return [Attendance.row_json(r) for r in rows]
+
+
 def approve_attendance(user_id: int, shift_id: int):
     att = Attendance.query.filter_by(user_id=user_id, shift_id=shift_id).first()
     if not att:
         raise ValueError("Attendance record not found for this shift/user.")
     if not att.approved:
         att.approved = True
+        work_date = _refresh_rollup(att)
         db.session.commit()
+        requeue_reports_for_dates([work_date])
     return att
 
 
@@ -80,9 +295,81 @@ def unapprove_attendance(user_id: int, shift_id: int):
         raise ValueError("Attendance record not found for this shift/user.")
     if att.approved:
         att.approved = False
+        work_date = _refresh_rollup(att)
         db.session.commit()
+        requeue_reports_for_dates([work_date])
     return att
 
 
+def _approval_criteria(pairs, start_date, end_date, location, user_ids):
+    if pairs is None and not (start_date and end_date) and not user_ids:
+        raise ValueError("Provide pairs, start_date and end_date, or user_ids")
+    criteria = []
+    if pairs is not None:
+        pairs = {(int(user_id), int(shift_id)) for user_id, shift_id in pairs}
+        if not pairs:
+            return None
+        # (shift_id, user_id) order matches uq_attendance_shift_user
+        criteria.append(tuple_(Attendance.shift_id, Attendance.user_id).in_(
+            [(shift_id, user_id) for user_id, shift_id in pairs]))
+    if user_ids:
+        criteria.append(Attendance.user_id.in_({int(u) for u in user_ids}))
+    shift_criteria = []
+    if start_date:
+        shift_criteria.append(Shift.work_date >= start_date)
+    if end_date:
+        shift_criteria.append(Shift.work_date <= end_date)
+    if location is not None:
+        shift_criteria.append(Shift.location == location)
+    if user_ids and shift_criteria:
+        shift_criteria.append(Shift.user_id.in_({int(u) for u in user_ids}))
+    if shift_criteria:
+        criteria.append(Attendance.shift_id.in_(db.select(Shift.id).where(*shift_criteria)))
+    return criteria
+
+
+def set_attendance_approval(approved: bool, pairs: Optional[Iterable[Tuple[int, int]]] = None,
+                            start_date: Optional[date] = None, end_date: Optional[date] = None,
+                            location: Optional[str] = None, user_ids: Optional[Iterable[int]] = None):
+    """Approve (or unapprove) many attendance records with one UPDATE.
+
+    Records are picked by explicit (user_id, shift_id) `pairs` and/or a
+    filter on the shift (work_date range, location) and user_ids; at least
+    pairs, a full date range or user_ids is required. Only records whose flag
+    actually changes are written. The affected days' rollups are refreshed
+    in the same transaction, and stored reports covering them are requeued.
+    Returns {"approved", "count", "ids"}.
+    """
+    approved = bool(approved)
+    criteria = _approval_criteria(pairs, start_date, end_date, location,
+                                  list(user_ids) if user_ids is not None else None)
+    if criteria is None:
+        return {"approved": approved, "count": 0, "ids": []}
+    criteria.append(not_approved if approved else Attendance.approved == db.true())
+
+    stmt = db.update(Attendance).values(approved=approved)
+    options = {"synchronize_session": False}
+    if db.session.get_bind().dialect.update_returning:
+        changed = db.session.execute(
+            stmt.where(*criteria).returning(Attendance.id, Attendance.user_id, Attendance.shift_id),
+            execution_options=options).all()
+    else:
+        changed = db.session.execute(
+            db.select(Attendance.id, Attendance.user_id, Attendance.shift_id).where(*criteria)).all()
+        if changed:
+            db.session.execute(stmt.where(Attendance.id.in_([r.id for r in changed])),
+                               execution_options=options)
+    if not changed:
+        return {"approved": approved, "count": 0, "ids": []}
+
+    work_dates = dict(db.session.execute(
+        db.select(Shift.id, Shift.work_date).where(Shift.id.in_({r.shift_id for r in changed}))).all())
+    refresh_daily_hours((r.user_id, work_dates.get(r.shift_id)) for r in changed)
+    db.session.commit()
+    requeue_reports_for_dates(set(work_dates.values()))
+    ids = sorted(r.id for r in changed)
+    return {"approved": approved, "count": len(ids), "ids": ids}
+
+
 def attendance_to_json(att: Attendance):
     return att.get_json() if att else None
\ No newline at end of file
@@ -1,8 +1,37 @@
 from flask_jwt_extended import create_access_token, jwt_required, JWTManager, get_jwt_identity, verify_jwt_in_request
 
+from flask import g
+from typing import NamedTuple, Optional
+
 from App.models import User
 from App.database import db
 
+
+class UserIdentity(NamedTuple):
+  """Lightweight stand-in for User as jwt current_user (id, username, isAdmin)."""
+  id: int
+  username: str
+  isAdmin: bool
+
+  def is_authenticated_admin(self):
+    return self.isAdmin
+
+
+def load_user_identity(user_id: int) -> Optional[UserIdentity]:
+  """Identity for user_id: one query per request, memoized on g for the
+  JWT loader and the template context. Not cached across requests, so a
+  rename, demotion or deletion made through any worker applies at once."""
+  memo = g.setdefault("_user_identities", {})
+  if user_id not in memo:
+    row = db.session.execute(
+      db.select(User.id, User.username, User.isAdmin).where(User.id == user_id)
+    ).first()
+    memo[user_id] = UserIdentity(row.id, row.username, bool(row.isAdmin)) if row else None
+  return memo[user_id]
+
+def invalidate_user_identity(user_id: int):
+  g.get("_user_identities", {}).pop(user_id, None)
+
 def login(username, password):
   result = db.session.execute(db.select(User).filter_by(username=username))
   user = result.scalar_one_or_none()
@@ -26,7 +55,7 @@ def setup_jwt(app):
       user_id = int(identity)
     except (TypeError, ValueError):
       return None
-    return db.session.get(User, user_id)
+    return load_user_identity(user_id)
 
   return jwt
 
@@ -37,7 +66,7 @@ def add_auth_context(app):
           verify_jwt_in_request()
           identity = get_jwt_identity()
           user_id = int(identity) if identity is not None else None
-          current_user = db.session.get(User, user_id) if user_id is not None else None
+          current_user = load_user_identity(user_id) if user_id is not None else None
           is_authenticated = current_user is not None
       except Exception as e:
           print(e)
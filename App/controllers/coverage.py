@@ -0,0 +1,115 @@
+from App.models import Shift, Attendance
+from App.database import db
+from flask import current_app, has_app_context
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Optional
+
+COVERAGE_SLOT_MINUTES = 15
+COVERAGE_MAX_DAYS = 93
+
+
+def _sweep(intervals, slot: int, slots: int):
+    """Headcount per slot from (begin, end) minute offsets: +1/-1 into a
+    difference array, then one running sum. O(intervals + slots).
+    Someone counts in a slot if they are on shift when it starts."""
+    diff = [0] * (slots + 1)
+    for begin, end in intervals:
+        a, b = max(-(-begin // slot), 0), min(-(-end // slot), slots)  # ceil
+        if a < b:
+            diff[a] += 1
+            diff[b] -= 1
+    return list(accumulate(diff[:-1]))
+
+
+def _understaffed(scheduled, actual, origin: datetime, slot: int):
+    """Runs of consecutive slots where fewer people were clocked in than
+    scheduled, with the largest shortfall in each run."""
+    runs, start, short = [], None, 0
+    for i, (want, got) in enumerate(zip(scheduled + [0], actual + [0])):
+        if got < want:
+            start = i if start is None else start
+            short = max(short, want - got)
+        elif start is not None:
+            runs.append({
+                "start": (origin + timedelta(minutes=start * slot)).isoformat(),
+                "end": (origin + timedelta(minutes=i * slot)).isoformat(),
+                "short": short,
+            })
+            start, short = None, 0
+    return runs
+
+
+def coverage_timeline(start_date: date, end_date: date, slot_minutes: int = COVERAGE_SLOT_MINUTES,
+                      location: Optional[str] = None, role: Optional[str] = None,
+                      actual: bool = False, now: Optional[datetime] = None):
+    """Scheduled headcount per (location, role) per `slot_minutes` slot from
+    start_date 00:00 to the end of end_date, in one query and one sweep per
+    group. Slot i starts at start_date + i * slot_minutes.
+
+    With actual=True the same is computed from attendance time_in/time_out
+    (an open clock-in counts until `now`), attributed to the shift's
+    location and role, and each group lists its understaffed runs.
+    """
+    if start_date is None or end_date is None:
+        raise ValueError("start_date and end_date are required")
+    if start_date > end_date:
+        raise ValueError("start_date must be on or before end_date")
+    max_days = current_app.config.get("COVERAGE_MAX_DAYS", COVERAGE_MAX_DAYS) if has_app_context() \
+        else COVERAGE_MAX_DAYS
+    if (end_date - start_date).days + 1 > max_days:
+        raise ValueError(f"range is limited to {max_days} days")
+    slot = int(slot_minutes or COVERAGE_SLOT_MINUTES)
+    if slot < 1 or 1440 % slot:
+        raise ValueError("slot_minutes must divide a day (e.g. 15, 30, 60)")
+
+    origin = datetime.combine(start_date, datetime.min.time())
+    slots = ((end_date - start_date).days + 1) * 1440 // slot
+
+    def minutes(d: date, hour: int, minute: int):
+        # offset from origin in whole minutes
+        return (d - start_date).days * 1440 + hour * 60 + minute
+
+    criteria = [Shift.work_date.between(start_date, end_date)]
+    if location is not None:
+        criteria.append(Shift.location == location)
+    if role is not None:
+        criteria.append(Shift.role == role)
+
+    scheduled, clocked = {}, {}
+    for loc, rl, work_date, begin, end in db.session.execute(
+        db.select(Shift.location, Shift.role, Shift.work_date, Shift.start_time, Shift.end_time)
+        .where(*criteria)
+    ):
+        scheduled.setdefault((loc, rl), []).append(
+            (minutes(work_date, begin.hour, begin.minute), minutes(work_date, end.hour, end.minute)))
+
+    if actual:
+        now = now or datetime.now()
+        # clock times can fall outside the shift's date, so match on the shift
+        for loc, rl, time_in, time_out in db.session.execute(
+            db.select(Shift.location, Shift.role, Attendance.time_in, Attendance.time_out)
+            .join(Attendance, Attendance.shift_id == Shift.id)
+            .where(*criteria, Attendance.time_in.isnot(None))
+        ):
+            time_out = time_out or now
+            clocked.setdefault((loc, rl), []).append(
+                (minutes(time_in.date(), time_in.hour, time_in.minute),
+                 minutes(time_out.date(), time_out.hour, time_out.minute)))
+
+    groups = []
+    for key in sorted(scheduled.keys() | clocked.keys(), key=lambda k: (k[0] or "", k[1] or "")):
+        group = {"location": key[0], "role": key[1],
+                 "scheduled": _sweep(scheduled.get(key, ()), slot, slots)}
+        if actual:
+            group["actual"] = _sweep(clocked.get(key, ()), slot, slots)
+            group["understaffed"] = _understaffed(group["scheduled"], group["actual"], origin, slot)
+        groups.append(group)
+
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "slot_minutes": slot,
+        "slots": slots,
+        "groups": groups,
+    }
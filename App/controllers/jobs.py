@@ -0,0 +1,214 @@
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from App.models import ReportJob
+from App.database import db
+from App.jobs import JobRunner
+from flask import current_app
+from datetime import date, datetime, timedelta
+from typing import Optional
+from .report import generate_weekly_report, check_weekly_range
+from .period import PERIOD_BUCKETS, generate_period_report
+
+JOB_KINDS = ("weekly", "period")
+
+_runner_lock = threading.Lock()
+
+
+def job_runner():
+    """This process's report job threads, started on first use when
+    REPORT_JOB_WORKERS is set; None by default, in which case queued jobs
+    wait for `flask report work`. Web workers should leave it at 0: under
+    gevent the threads are greenlets and a report build stalls every request
+    on that worker."""
+    workers = current_app.config.get("REPORT_JOB_WORKERS", 0)
+    if not workers:
+        return None
+    runner = current_app.extensions.get("report_job_runner")
+    if runner is None or not runner.alive():
+        with _runner_lock:
+            runner = current_app.extensions.get("report_job_runner")
+            if runner is None or not runner.alive():
+                runner = JobRunner(current_app._get_current_object(), run_next_job,
+                                   workers=workers,
+                                   poll=current_app.config.get("REPORT_JOB_POLL", 2.0))
+                current_app.extensions["report_job_runner"] = runner
+    return runner
+
+
+def stop_job_runner():
+    runner = current_app.extensions.pop("report_job_runner", None)
+    if runner is not None:
+        runner.stop()
+
+
+def enqueue_report_job(kind: str, start_date: date, end_date: Optional[date] = None,
+                       bucket: Optional[str] = None, requested_by_id: Optional[int] = None):
+    """Queue a weekly (start_date, optional end_date = start_date + 6) or
+    period (start_date, end_date, bucket) report and return the ReportJob. Input is validated
+    here so bad requests fail now rather than in the job."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(JOB_KINDS)}")
+    if start_date is None:
+        raise ValueError("start_date is required")
+    if kind == "period":
+        if end_date is None:
+            raise ValueError("end_date is required for a period report")
+        if bucket not in PERIOD_BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(PERIOD_BUCKETS)}")
+    if end_date is not None and start_date > end_date:
+        raise ValueError("start_date must be on or before end_date")
+    if kind == "weekly":
+        check_weekly_range(start_date, end_date)
+
+    job = ReportJob(kind=kind, requested_by_id=requested_by_id, params={
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat() if end_date else None,
+        "bucket": bucket,
+    })
+    db.session.add(job)
+    db.session.commit()
+    runner = job_runner()
+    if runner:
+        runner.wake()
+    return job
+
+
+def get_report_job(job_id: int):
+    return db.session.get(ReportJob, job_id)
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:80]
+
+
+def _claim(job_id: int) -> Optional[str]:
+    """queued -> running for one job. Returns the claim's owner name, or
+    None if another worker got it first."""
+    now, owner = datetime.utcnow(), _worker_name()
+    claimed = db.session.execute(
+        db.update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status == ReportJob.QUEUED)
+        .values(status=ReportJob.RUNNING, claimed_by=owner, progress=0,
+                attempts=ReportJob.attempts + 1, started_at=now, heartbeat_at=now),
+        execution_options={"synchronize_session": False},
+    ).rowcount == 1
+    db.session.commit()
+    return owner if claimed else None
+
+
+def _update_job(job_id: int, owner: str, **values) -> bool:
+    """Update a job this worker still holds. False if it was re-queued (and
+    possibly claimed by someone else) since, in which case nothing is written."""
+    values.setdefault("heartbeat_at", datetime.utcnow())
+    updated = db.session.execute(
+        db.update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status == ReportJob.RUNNING,
+               ReportJob.claimed_by == owner)
+        .values(**values),
+        execution_options={"synchronize_session": False},
+    ).rowcount == 1
+    db.session.commit()
+    return updated
+
+
+@contextmanager
+def _heartbeat(job_id: int, owner: str):
+    """Refresh the job's heartbeat from a side thread every third of
+    REPORT_JOB_STALE_SECONDS while the block runs, so a long report isn't
+    taken for a dead worker and re-queued underneath it."""
+    app = current_app._get_current_object()
+    interval = app.config.get("REPORT_JOB_STALE_SECONDS", 600) / 3
+    stop = threading.Event()
+
+    def beat():
+        with app.app_context():
+            while not stop.wait(interval):
+                try:
+                    if not _update_job(job_id, owner):
+                        return
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Heartbeat for report job %s failed", job_id)
+
+    thread = threading.Thread(target=beat, name=f"report-job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def recover_stale_jobs():
+    """Re-queue running jobs whose heartbeat is older than
+    REPORT_JOB_STALE_SECONDS (their worker died or was restarted); after
+    REPORT_JOB_MAX_ATTEMPTS tries they are marked failed instead.
+    Returns the number of jobs touched."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get("REPORT_JOB_STALE_SECONDS", 600))
+    max_attempts = current_app.config.get("REPORT_JOB_MAX_ATTEMPTS", 3)
+    stale = (ReportJob.status == ReportJob.RUNNING, ReportJob.heartbeat_at < cutoff)
+    # idle runners call this every poll: only take a write lock when there is work
+    if db.session.scalar(db.select(ReportJob.id).where(*stale).limit(1)) is None:
+        return 0
+    requeued = db.session.execute(
+        db.update(ReportJob).where(*stale, ReportJob.attempts < max_attempts)
+        .values(status=ReportJob.QUEUED, claimed_by=None, progress=0),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    failed = db.session.execute(
+        db.update(ReportJob).where(*stale, ReportJob.attempts >= max_attempts)
+        .values(status=ReportJob.FAILED, finished_at=datetime.utcnow(),
+                error="Worker stopped while running this job"),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.commit()
+    return requeued + failed
+
+
+def _run_claimed(job_id: int, owner: str):
+    job = db.session.get(ReportJob, job_id)
+    kind, params, requested_by_id = job.kind, job.params or {}, job.requested_by_id
+    try:
+        start_date = date.fromisoformat(params["start_date"])
+        end_date = date.fromisoformat(params["end_date"]) if params.get("end_date") else None
+        _update_job(job_id, owner, progress=10)
+        with _heartbeat(job_id, owner):
+            if kind == "weekly":
+                rpt = generate_weekly_report(start_date, end_date, generated_by_id=requested_by_id)
+            else:
+                rpt = generate_period_report(start_date, end_date, params["bucket"],
+                                             generated_by_id=requested_by_id)
+        if not _update_job(job_id, owner, status=ReportJob.DONE, progress=100, report_id=rpt.id,
+                           finished_at=datetime.utcnow(), error=None):
+            current_app.logger.warning("Report job %s was taken over before it finished", job_id)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Report job %s failed", job_id)
+        _update_job(job_id, owner, status=ReportJob.FAILED, error=str(e)[:2000],
+                    finished_at=datetime.utcnow())
+
+
+def run_next_job() -> bool:
+    """Claim and run the oldest queued job. Returns False if none was queued."""
+    recover_stale_jobs()
+    job_id = db.session.scalar(
+        db.select(ReportJob.id).where(ReportJob.status == ReportJob.QUEUED)
+        .order_by(ReportJob.id).limit(1)
+    )
+    if job_id is None:
+        return False
+    owner = _claim(job_id)
+    if owner:
+        _run_claimed(job_id, owner)
+    return True
+
+
+def run_pending_jobs() -> int:
+    """Run queued jobs in this process until none are left; returns how many
+    were picked up (by this or another worker)."""
+    count = 0
+    while run_next_job():
+        count += 1
+    return count
@@ -0,0 +1,192 @@
+from App.models import Shift, Attendance, User
+from App.database import db, hours_between
+from flask import current_app, has_app_context
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import and_
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+PAYROLL_DAILY_OVERTIME_HOURS = 8    # 0 disables daily overtime
+PAYROLL_WEEKLY_OVERTIME_HOURS = 40  # 0 disables weekly overtime
+
+
+def _thresholds():
+    daily, weekly = PAYROLL_DAILY_OVERTIME_HOURS, PAYROLL_WEEKLY_OVERTIME_HOURS
+    if has_app_context():
+        daily = current_app.config.get("PAYROLL_DAILY_OVERTIME_HOURS", daily)
+        weekly = current_app.config.get("PAYROLL_WEEKLY_OVERTIME_HOURS", weekly)
+    return float(daily or 0), float(weekly or 0)
+
+
+def payroll_rows(start_date: date, end_date: date, user_id: Optional[int] = None):
+    """(user_id, username, work_date, start_time, worked_hours, clocked_in)
+    per shift in the range; one query. Worked hours (clocked in and out) are
+    computed by the database, so the rows carry numbers rather than
+    timestamps: None when the shift has no clock-out."""
+    stmt = (
+        db.select(Shift.user_id, User.username, Shift.work_date, Shift.start_time,
+                  hours_between(Attendance.time_in, Attendance.time_out),
+                  Attendance.time_in.isnot(None))
+        .join(User, User.id == Shift.user_id)
+        .outerjoin(Attendance, and_(Attendance.shift_id == Shift.id,
+                                    Attendance.user_id == Shift.user_id))
+        .where(Shift.work_date.between(start_date, end_date))
+    )
+    if user_id:
+        stmt = stmt.where(Shift.user_id == user_id)
+    return db.session.execute(stmt).all()
+
+
+def _columns(rows, start_date: date, as_of: datetime):
+    """Rows -> parallel columns: user index, day index, worked hours,
+    due (the shift has started) and attended (clocked in) flags."""
+    users, names = {}, []
+    u, d, worked, due, attended = [], [], [], [], []
+    for uid, username, work_date, start_time, hours, clocked in rows:
+        i = users.get(uid)
+        if i is None:
+            i = users[uid] = len(names)
+            names.append((uid, username))
+        u.append(i)
+        d.append((work_date - start_date).days)
+        worked.append(max(hours or 0.0, 0.0))
+        is_due = datetime.combine(work_date, start_time) <= as_of
+        due.append(1.0 if is_due else 0.0)
+        attended.append(1.0 if is_due and clocked else 0.0)
+    return names, u, d, worked, due, attended
+
+
+def _columns_numpy(rows, start_date: date, as_of: datetime):
+    """_columns with array operations: the rows are transposed once and every
+    column is built and combined as a whole."""
+    uids, usernames, work_dates, starts, hours, clocked = zip(*rows)
+    username_of = dict(zip(uids, usernames))
+    # user index in order of first appearance, like _columns
+    uniq, first, inverse = numpy.unique(numpy.asarray(uids), return_index=True, return_inverse=True)
+    order = numpy.argsort(first)
+    rank = numpy.empty(len(uniq), dtype=numpy.intp)
+    rank[order] = numpy.arange(len(uniq))
+    names = [(uid, username_of[uid]) for uid in uniq[order].tolist()]
+
+    d = numpy.fromiter(map(date.toordinal, work_dates), dtype=numpy.intp, count=len(rows)) \
+        - start_date.toordinal()
+    worked = numpy.maximum(numpy.nan_to_num(numpy.array(hours, dtype=float)), 0.0)
+    clocked = numpy.array(clocked, dtype=bool)
+
+    # a shift is due once it has started: every day before as_of's, plus
+    # the shifts on that day starting by as_of's time
+    today = (as_of.date() - start_date).days
+    due = d < today
+    now = as_of.time()
+    for i in numpy.flatnonzero(d == today).tolist():
+        due[i] = starts[i] <= now
+    return names, rank[inverse.ravel()], d, worked, due.astype(float), (due & clocked).astype(float)
+
+
+def _totals_numpy(u, d, worked, due, attended, n_users, n_days, week_of_day, n_weeks, daily_t, weekly_t):
+    u, d, worked = numpy.asarray(u), numpy.asarray(d), numpy.asarray(worked, dtype=float)
+    # hours per (user, day) cell, then overtime per cell above the daily threshold
+    day_hours = numpy.bincount(u * n_days + d, worked, n_users * n_days)
+    daily_ot = numpy.maximum(day_hours - daily_t, 0) if daily_t else numpy.zeros_like(day_hours)
+    # weekly overtime counts only hours not already paid as daily overtime
+    cell_user = numpy.arange(n_users * n_days) // n_days
+    cell_week = cell_user * n_weeks + numpy.asarray(week_of_day)[numpy.arange(n_users * n_days) % n_days]
+    week_hours = numpy.bincount(cell_week, day_hours - daily_ot, n_users * n_weeks)
+    weekly_ot = numpy.maximum(week_hours - weekly_t, 0) if weekly_t else numpy.zeros_like(week_hours)
+    return {
+        "worked": numpy.bincount(u, worked, n_users),
+        "daily_ot": numpy.bincount(cell_user, daily_ot, n_users),
+        "weekly_ot": weekly_ot.reshape(n_users, n_weeks).sum(axis=1),
+        "scheduled": numpy.bincount(u, minlength=n_users),
+        "shifts": numpy.bincount(u, due, n_users),
+        "attended": numpy.bincount(u, attended, n_users),
+    }
+
+
+def _totals_python(u, d, worked, due, attended, n_users, n_days, week_of_day, n_weeks, daily_t, weekly_t):
+    # the same steps as _totals_numpy, with lists
+    day_hours = [0.0] * (n_users * n_days)
+    out = {key: [0.0] * n_users for key in ("worked", "daily_ot", "weekly_ot", "scheduled", "shifts", "attended")}
+    for i, day, hours, is_due, came in zip(u, d, worked, due, attended):
+        day_hours[i * n_days + day] += hours
+        out["worked"][i] += hours
+        out["scheduled"][i] += 1
+        out["shifts"][i] += is_due
+        out["attended"][i] += came
+    week_hours = [0.0] * (n_users * n_weeks)
+    for cell, hours in enumerate(day_hours):
+        i, day = divmod(cell, n_days)
+        over = max(hours - daily_t, 0) if daily_t else 0.0
+        out["daily_ot"][i] += over
+        week_hours[i * n_weeks + week_of_day[day]] += hours - over
+    for cell, hours in enumerate(week_hours):
+        if weekly_t:
+            out["weekly_ot"][cell // n_weeks] += max(hours - weekly_t, 0)
+    return out
+
+
+def compute_payroll(rows, start_date: date, end_date: date, as_of: Optional[datetime] = None,
+                    use_numpy: Optional[bool] = None):
+    """Regular hours, daily/weekly overtime and attendance rate per user.
+
+    `rows` are payroll_rows() tuples. They are turned into columns once and
+    reduced with grouped sums: numpy arrays and bincount when numpy is
+    installed (it is in requirements.txt), plain lists otherwise, with
+    identical results. Hours are worked (clocked
+    in and out) hours on the shift's date. Overtime is the part of a day
+    above PAYROLL_DAILY_OVERTIME_HOURS, plus the part of the remaining hours
+    of a Monday-Sunday week (clipped to the period) above
+    PAYROLL_WEEKLY_OVERTIME_HOURS. The attendance rate is clocked-in shifts
+    (attended_shifts) over shifts that have started by `as_of`, default now
+    (shifts); scheduled_shifts counts every shift in the period.
+    """
+    daily_t, weekly_t = _thresholds()
+    fast = (numpy is not None if use_numpy is None else use_numpy) and bool(rows)
+    names, u, d, worked, due, attended = (_columns_numpy if fast else _columns)(
+        rows, start_date, as_of or datetime.now())
+    n_users, n_days = len(names), (end_date - start_date).days + 1
+    week_of_day = [(start_date.weekday() + day) // 7 for day in range(n_days)]
+    n_weeks = week_of_day[-1] + 1
+
+    totals = (_totals_numpy if fast else _totals_python)(
+        u, d, worked, due, attended, n_users, n_days, week_of_day, n_weeks, daily_t, weekly_t)
+
+    per_user = {}
+    sums = dict.fromkeys(("worked", "daily_ot", "weekly_ot", "scheduled", "shifts", "attended"), 0.0)
+    for i, (uid, username) in enumerate(names):
+        values = {key: float(totals[key][i]) for key in sums}
+        for key in sums:
+            sums[key] += values[key]
+        per_user[uid] = _summary(values, username=username)
+    return {
+        "thresholds": {"daily_hours": daily_t, "weekly_hours": weekly_t},
+        "totals": _summary(sums),
+        "per_user": per_user,
+    }
+
+
+def _summary(values, **extra):
+    overtime = values["daily_ot"] + values["weekly_ot"]
+    return {
+        **extra,
+        "scheduled_shifts": int(values["scheduled"]),
+        "shifts": int(values["shifts"]),
+        "attended_shifts": int(values["attended"]),
+        "attendance_rate": round(values["attended"] / values["shifts"], 4) if values["shifts"] else None,
+        "worked_hours": round(values["worked"], 2),
+        "regular_hours": round(values["worked"] - overtime, 2),
+        "overtime_hours": round(overtime, 2),
+        "daily_overtime_hours": round(values["daily_ot"], 2),
+        "weekly_overtime_hours": round(values["weekly_ot"], 2),
+    }
+
+
+def payroll_report(start_date: date, end_date: date, user_id: Optional[int] = None,
+                   as_of: Optional[datetime] = None):
+    if start_date > end_date:
+        raise ValueError("start_date must be on or before end_date")
+    return compute_payroll(payroll_rows(start_date, end_date, user_id), start_date, end_date, as_of)
@@ -0,0 +1,135 @@
+from App.models import DailyHours, User, Report
+from App.database import db
+from flask import current_app, has_app_context
+from datetime import date, timedelta
+from typing import Optional
+from .versions import REPORTS_SCOPE, bump_versions, report_source_token
+from .payroll import payroll_report
+
+PERIOD_BUCKETS = ("day", "week", "pay_period", "month")
+PERIOD_REPORT_TYPES = {b: f"by_{b}" for b in PERIOD_BUCKETS}
+PAY_PERIOD_ANCHOR = "2024-01-01"  # a Monday that starts a pay period
+PAY_PERIOD_DAYS = 14
+
+
+def _pay_period_config():
+    anchor, days = PAY_PERIOD_ANCHOR, PAY_PERIOD_DAYS
+    if has_app_context():
+        anchor = current_app.config.get("PAY_PERIOD_ANCHOR", anchor)
+        days = current_app.config.get("PAY_PERIOD_DAYS", days)
+    return (anchor if isinstance(anchor, date) else date.fromisoformat(anchor)), int(days)
+
+
+def bucket_bounds(d: date, bucket: str):
+    """(first, last) day of the `bucket` containing `d`."""
+    if bucket == "day":
+        return d, d
+    if bucket == "week":
+        start = d - timedelta(days=d.weekday())
+        return start, start + timedelta(days=6)
+    if bucket == "pay_period":
+        anchor, days = _pay_period_config()
+        start = anchor + timedelta(days=((d - anchor).days // days) * days)
+        return start, start + timedelta(days=days - 1)
+    if bucket == "month":
+        start = d.replace(day=1)
+        following = (start + timedelta(days=32)).replace(day=1)
+        return start, following - timedelta(days=1)
+    raise ValueError(f"bucket must be one of: {', '.join(PERIOD_BUCKETS)}")
+
+
+def _empty_bucket(start: date, end: date):
+    return {"start": start.isoformat(), "end": end.isoformat(),
+            "scheduled_hours": 0.0, "worked_hours": 0.0, "approved_hours": 0.0,
+            "totals_per_user": {}}
+
+
+def period_report(start_date: date, end_date: date, bucket: str = "week",
+                  user_id: Optional[int] = None):
+    """Hours for [start_date, end_date] split into day/week/pay_period/month
+    buckets (the first and last are clipped to the period).
+
+    One ordered scan over the per-user/per-day rollup fills every bucket;
+    each day's bucket is found by date arithmetic, so the cost is one query
+    however many buckets there are.
+    """
+    if bucket not in PERIOD_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(PERIOD_BUCKETS)}")
+    if start_date > end_date:
+        raise ValueError("start_date must be on or before end_date")
+
+    buckets = []
+    by_day = {}
+    d = start_date
+    while d <= end_date:
+        first, last = bucket_bounds(d, bucket)
+        current = _empty_bucket(max(first, start_date), min(last, end_date))
+        buckets.append(current)
+        while d <= min(last, end_date):
+            by_day[d] = current
+            d += timedelta(days=1)
+
+    stmt = (
+        db.select(DailyHours.user_id, User.username, DailyHours.work_date,
+                  DailyHours.scheduled_hours, DailyHours.worked_hours, DailyHours.approved_hours)
+        .join(User, User.id == DailyHours.user_id)
+        .where(DailyHours.work_date.between(start_date, end_date))
+        .order_by(DailyHours.work_date.asc(), DailyHours.user_id.asc())
+    )
+    if user_id:
+        stmt = stmt.where(DailyHours.user_id == user_id)
+
+    users = set()
+    for uid, username, work_date, scheduled, worked, approved in db.session.execute(stmt):
+        b = by_day[work_date]
+        u = b["totals_per_user"].get(uid)
+        if u is None:
+            u = b["totals_per_user"][uid] = {"username": username, "scheduled_hours": 0.0,
+                                             "worked_hours": 0.0, "approved_hours": 0.0}
+        for key, value in (("scheduled_hours", scheduled), ("worked_hours", worked),
+                           ("approved_hours", approved)):
+            u[key] += value
+            b[key] += value
+        users.add(uid)
+
+    totals = {"scheduled_hours": 0.0, "worked_hours": 0.0, "approved_hours": 0.0}
+    for b in buckets:
+        for key in totals:
+            totals[key] += b[key]
+            b[key] = round(b[key], 2)
+        for u in b["totals_per_user"].values():
+            for key in totals:
+                u[key] = round(u[key], 2)
+        b["unique_users"] = len(b["totals_per_user"])
+    totals = {key: round(value, 2) for key, value in totals.items()}
+    totals["unique_users"] = len(users)
+
+    return {
+        "period_start": start_date.isoformat(),
+        "period_end": end_date.isoformat(),
+        "bucket": bucket,
+        "totals": totals,
+        "buckets": buckets,
+    }
+
+
+def generate_period_report(start_date: date, end_date: date, bucket: str = "week",
+                           generated_by_id: int = None):
+    """Compute period_report, plus payroll_report for the whole period, and
+    persist it as a Report of type by_<bucket> (unique by type+period, like
+    weekly reports). Returns the Report."""
+    token = report_source_token(start_date, end_date)
+    payload = period_report(start_date, end_date, bucket)
+    payload["payroll"] = payroll_report(start_date, end_date)
+    report_type = PERIOD_REPORT_TYPES[bucket]
+    rpt = Report.query.filter_by(report_type=report_type, period_start=start_date,
+                                 period_end=end_date).first()
+    if rpt is None:
+        rpt = Report(report_type=report_type, period_start=start_date, period_end=end_date)
+        db.session.add(rpt)
+    rpt.payload = payload
+    rpt.generated_by_id = generated_by_id
+    rpt.source_token = token
+    bump_versions(REPORTS_SCOPE, [start_date])
+    db.session.commit()
+    return rpt
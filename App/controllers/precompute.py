@@ -0,0 +1,120 @@
+from App.models import Report, ReportJob
+from App.database import db
+from flask import current_app, has_app_context
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import tuple_
+from .versions import report_source_token
+from .period import PERIOD_REPORT_TYPES
+from .jobs import enqueue_report_job
+
+REPORT_OFF_PEAK_HOURS = "1-5"  # local hours [start, end); may wrap midnight, e.g. "22-4"
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def in_off_peak(now: Optional[datetime] = None) -> bool:
+    start, end = (int(h) for h in str(_config("REPORT_OFF_PEAK_HOURS", REPORT_OFF_PEAK_HOURS)).split("-"))
+    hour = (now or datetime.now()).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def _week_of(d: date):
+    start = d - timedelta(days=d.weekday())
+    return ("weekly", start, start + timedelta(days=6), None)
+
+
+def _month_of(d: date):
+    start = d.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return ("period", start, end, "month")
+
+
+def closed_periods(today: Optional[date] = None):
+    """(kind, start, end, bucket) for the last REPORT_SCHEDULE_WEEKS (8)
+    complete weeks and REPORT_SCHEDULE_MONTHS (3) complete months."""
+    today = today or date.today()
+    this_monday = today - timedelta(days=today.weekday())
+    periods = [_week_of(this_monday - timedelta(weeks=i + 1))
+               for i in range(_config("REPORT_SCHEDULE_WEEKS", 8))]
+    month_start = today.replace(day=1)
+    for _ in range(_config("REPORT_SCHEDULE_MONTHS", 3)):
+        month_start = (month_start - timedelta(days=1)).replace(day=1)
+        periods.append(_month_of(month_start))
+    return periods
+
+
+def _report_key(kind, start, end, bucket):
+    return ("weekly" if kind == "weekly" else PERIOD_REPORT_TYPES[bucket], start, end)
+
+
+def _stored_tokens(periods):
+    keys = [_report_key(*p) for p in periods]
+    if not keys:
+        return {}
+    rows = db.session.execute(
+        db.select(Report.report_type, Report.period_start, Report.period_end, Report.source_token)
+        .where(tuple_(Report.report_type, Report.period_start, Report.period_end).in_(keys))
+    ).all()
+    return {(t, s, e): token for t, s, e, token in rows}
+
+
+def stale_periods(periods):
+    """The periods with no stored report, or whose report was built from
+    data that has changed since (source_token mismatch)."""
+    stored = _stored_tokens(periods)
+    return [p for p in periods
+            if stored.get(_report_key(*p)) != report_source_token(p[1], p[2])]
+
+
+def _pending_jobs():
+    pending = set()
+    for kind, params in db.session.execute(
+        db.select(ReportJob.kind, ReportJob.params)
+        .where(ReportJob.status.in_([ReportJob.QUEUED, ReportJob.RUNNING]))
+    ):
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"]) if params.get("end_date") else start + timedelta(days=6)
+        pending.add((kind, start, end, params.get("bucket")))
+    return pending
+
+
+def queue_report_periods(periods: Iterable, requested_by_id: Optional[int] = None):
+    """Enqueue a job per period unless one is already queued or running."""
+    pending = _pending_jobs()
+    jobs = []
+    for kind, start, end, bucket in periods:
+        if (kind, start, end, bucket) in pending:
+            continue
+        jobs.append(enqueue_report_job(kind, start, end, bucket, requested_by_id=requested_by_id))
+        pending.add((kind, start, end, bucket))
+    return jobs
+
+
+def schedule_closed_reports(today: Optional[date] = None):
+    """Queue generation of every closed period's report that is missing or stale."""
+    return queue_report_periods(stale_periods(closed_periods(today)))
+
+
+def requeue_reports_for_dates(dates: Iterable[date], today: Optional[date] = None):
+    """After a late change (e.g. an approval once the week is over), queue
+    regeneration of the stored weekly/monthly reports covering `dates`.
+    Dates in still-open periods are ignored: nothing is stored for them yet."""
+    today = today or date.today()
+    this_monday = today - timedelta(days=today.weekday())
+    this_month = today.replace(day=1)
+    periods = set()
+    for d in dates:
+        if d is None:
+            continue
+        if d < this_monday:
+            periods.add(_week_of(d))
+        if d < this_month:
+            periods.add(_month_of(d))
+    if not periods:
+        return []
+    stored = _stored_tokens(periods)
+    return queue_report_periods(sorted((p for p in periods if _report_key(*p) in stored),
+                                       key=lambda p: (p[1], p[0])))
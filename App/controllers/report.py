@@ -1,11 +1,40 @@
+import base64
+import csv
+import io
+import json
 from App.models import Shift, Attendance, User
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import undefer_group
 from App.models.report import Report
 from App.database import db
+from App.conditional import make_etag
+from .versions import REPORTS_SCOPE, bump_versions, report_source_token
+from .payroll import compute_payroll
+from typing import Optional
+
+def _hours_between(start: datetime, end: datetime) -> float:
+    return max((end - start).total_seconds() / 3600.0, 0)
+
+
+def _shift_attendance_rows(start_date: date, end_date: date):
+    """One query joining Shift, User and the matching Attendance row for a date range."""
+    return db.session.execute(
+        db.select(
+            Shift.id, Shift.user_id, User.username, Shift.work_date,
+            Shift.start_time, Shift.end_time, Shift.role, Shift.location,
+            Attendance.time_in, Attendance.time_out,
+        )
+        .join(User, User.id == Shift.user_id)
+        .outerjoin(Attendance, and_(Attendance.shift_id == Shift.id,
+                                    Attendance.user_id == Shift.user_id))
+        .where(Shift.work_date.between(start_date, end_date))
+        .order_by(Shift.work_date.asc(), Shift.start_time.asc(), Shift.id.asc())
+    ).all()
+
 
 def weekly_report(week_start: date):
     week_end = week_start + timedelta(days=6)
-    shifts = Shift.query.filter(Shift.work_date.between(week_start, week_end)).all()
 
     report = {
         'week_start': week_start.isoformat(),
@@ -13,55 +42,148 @@ def weekly_report(week_start: date):
         'totals_per_user': {},
         'shifts': []
     }
+    totals = report['totals_per_user']
+    payroll_rows = []  # in payroll_rows() shape, from the same query
+
+    for (shift_id, user_id, username, work_date, start_time, end_time,
+         role, location, time_in, time_out) in _shift_attendance_rows(week_start, week_end):
+        scheduled = _hours_between(datetime.combine(work_date, start_time),
+                                   datetime.combine(work_date, end_time))
+        worked = _hours_between(time_in, time_out) if (time_in and time_out) else 0.0
 
-    def init_user(u: User):
-        if u.id not in report['totals_per_user']:
-            report['totals_per_user'][u.id] = {
-                'username': u.username,
+        if user_id not in totals:
+            totals[user_id] = {
+                'username': username,
                 'scheduled_hours': 0.0,
                 'worked_hours': 0.0
             }
-
-    for s in shifts:
-        scheduled = s.duration_hours()
-        att = Attendance.query.filter_by(shift_id=s.id, user_id=s.user_id).first()
-        worked = att.hours_worked() if att else 0.0
-
-        init_user(s.user)
-        report['totals_per_user'][s.user_id]['scheduled_hours'] += scheduled
-        report['totals_per_user'][s.user_id]['worked_hours'] += worked
+        totals[user_id]['scheduled_hours'] += scheduled
+        totals[user_id]['worked_hours'] += worked
+        payroll_rows.append((user_id, username, work_date, start_time, worked, time_in is not None))
 
         report['shifts'].append({
-            **s.get_json(),
+            'id': shift_id,
+            'user_id': user_id,
+            'username': username,
+            'date': work_date.isoformat(),
+            'start': start_time.strftime("%H:%M"),
+            'end': end_time.strftime("%H:%M"),
+            'role': role,
+            'location': location,
             'scheduled_hours': round(scheduled, 2),
             'worked_hours': round(worked, 2),
-            'time_in': att.time_in.isoformat() if (att and att.time_in) else None,
-            'time_out': att.time_out.isoformat() if (att and att.time_out) else None,
+            'time_in': time_in.isoformat() if time_in else None,
+            'time_out': time_out.isoformat() if time_out else None,
         })
 
-    for u in report['totals_per_user'].values():
+    for u in totals.values():
         u['scheduled_hours'] = round(u['scheduled_hours'], 2)
         u['worked_hours'] = round(u['worked_hours'], 2)
 
+    report['payroll'] = compute_payroll(payroll_rows, week_start, week_end)
     return report
 
 
+REPORT_PAGE_DEFAULT = 20
+REPORT_PAGE_MAX = 200
+
+
 def get_all_reports():
-    """Return all reports ordered by created_at desc."""
-    return Report.query.order_by(Report.created_at.desc()).all()
+    """Return all reports ordered by created_at desc. The payload columns are
+    deferred: they are only loaded for the reports whose .payload is read."""
+    return Report.query.order_by(Report.created_at.desc(), Report.id.desc()).all()
+
+
+def get_latest_report():
+    return (Report.query.options(undefer_group("payload"))
+            .order_by(Report.created_at.desc(), Report.id.desc()).first())
 
 
 def get_report_by_id(report_id: int):
-    return Report.query.get(report_id)
+    return db.session.get(Report, report_id, options=[undefer_group("payload")])
+
+
+def encode_report_cursor(report: Report) -> str:
+    raw = f"{report.created_at.isoformat()}|{report.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_report_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created, i = raw.split("|")
+        return datetime.fromisoformat(created), int(i)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid report cursor")
+
+
+def list_reports(limit: int = REPORT_PAGE_DEFAULT, after: str = None, report_type: str = None):
+    """One page of report metadata (no payload), newest first, keyset-ordered
+    by (created_at, id). Pass the returned next_cursor back as `after` for
+    the following page; it is None on the last page.
+    """
+    limit = max(1, min(int(limit or REPORT_PAGE_DEFAULT), REPORT_PAGE_MAX))
+    q = Report.query
+    if report_type:
+        q = q.filter(Report.report_type == report_type)
+    if after:
+        created, i = decode_report_cursor(after)
+        q = q.filter(or_(
+            Report.created_at < created,
+            and_(Report.created_at == created, Report.id < i),
+        ))
+    rows = q.order_by(Report.created_at.desc(), Report.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    return {
+        "reports": [r.get_json(include_payload=False) for r in page],
+        "next_cursor": encode_report_cursor(page[-1]) if len(rows) > limit else None,
+    }
 
 
-def generate_weekly_report(start_date: date, end_date: date, generated_by_id: int = None):
+def report_validators(report_id: int):
+    """(etag, last_modified) of a report read from its metadata alone, so a
+    conditional GET can answer 304 without loading the payload; None if the
+    report doesn't exist."""
+    updated = db.session.scalar(db.select(Report.updated_at).where(Report.id == report_id))
+    if updated is None:
+        return None
+    return make_etag("report", report_id, updated.isoformat()), updated
+
+
+def pack_report_payloads(batch: int = 100):
+    """Move reports still stored as plain JSON into payload_packed, `batch`
+    rows per commit. Returns how many rows were converted."""
+    converted = 0
+    while True:
+        rows = (Report.query.options(undefer_group("payload"))
+                .filter(Report.payload_packed.is_(None))
+                .order_by(Report.id).limit(batch).all())
+        if not rows:
+            return converted
+        for rpt in rows:
+            rpt.payload = rpt.payload_json
+        db.session.commit()
+        converted += len(rows)
+
+
+def check_weekly_range(start_date: date, end_date: date = None):
+    """A weekly report always covers start_date..start_date + 6 (what
+    weekly_report computes); any other end_date is a period report."""
+    if end_date is not None and end_date != Report.weekly_key(start_date)[2]:
+        raise ValueError("a weekly report ends 6 days after start_date; "
+                         "use a period report (bucket) for other ranges")
+
+
+def generate_weekly_report(start_date: date, end_date: date = None, generated_by_id: int = None):
     """Compute the weekly payload and persist a Report row (unique by type+period).
+    end_date, if given, must be start_date + 6, the range weekly_report covers.
     Returns the Report instance.
     """
-    period_start = start_date
-    period_end = end_date
+    check_weekly_range(start_date, end_date)
+    _, period_start, period_end = Report.weekly_key(start_date)
 
+    # read before computing: a write that lands mid-way leaves the token stale
+    token = report_source_token(period_start, period_end)
     payload = weekly_report(period_start)
 
     rpt = (
@@ -71,11 +193,103 @@ def generate_weekly_report(start_date: date, end_date: date, generated_by_id: in
     if rpt:
         rpt.payload = payload
         rpt.generated_by_id = generated_by_id
+        rpt.source_token = token
         db.session.add(rpt)
+        bump_versions(REPORTS_SCOPE, [period_start])
         db.session.commit()
         return rpt
 
-    rpt = Report(report_type="weekly", period_start=period_start, period_end=period_end, payload=payload, generated_by_id=generated_by_id)
+    rpt = Report(report_type="weekly", period_start=period_start, period_end=period_end, payload=payload, generated_by_id=generated_by_id,
+                 source_token=token)
     db.session.add(rpt)
+    bump_versions(REPORTS_SCOPE, [period_start])
     db.session.commit()
-    return rpt
\ No newline at end of file
+    return rpt
+
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_FIELDS = [
+    "shift_id", "user_id", "username", "work_date", "start_time", "end_time",
+    "role", "location", "scheduled_hours", "attendance_id", "time_in", "time_out",
+    "approved", "worked_hours",
+]
+EXPORT_CHUNK = 1000
+
+
+def iter_export_rows(start_date: date, end_date: date, user_id: Optional[int] = None,
+                     chunk: int = EXPORT_CHUNK):
+    """Yield one dict per shift (with its attendance, if any) in the range.
+
+    Rows are plain column tuples fetched `chunk` at a time (yield_per, which
+    uses a server-side cursor on PostgreSQL), so memory doesn't grow with
+    the range.
+    """
+    stmt = (
+        db.select(
+            Shift.id, Shift.user_id, User.username, Shift.work_date,
+            Shift.start_time, Shift.end_time, Shift.role, Shift.location,
+            Attendance.id, Attendance.time_in, Attendance.time_out, Attendance.approved,
+        )
+        .join(User, User.id == Shift.user_id)
+        .outerjoin(Attendance, and_(Attendance.shift_id == Shift.id,
+                                    Attendance.user_id == Shift.user_id))
+        .where(Shift.work_date.between(start_date, end_date))
+        .order_by(Shift.work_date.asc(), Shift.start_time.asc(), Shift.id.asc())
+        .execution_options(yield_per=chunk)
+    )
+    if user_id:
+        stmt = stmt.where(Shift.user_id == user_id)
+    for (shift_id, uid, username, work_date, start_time, end_time, role, location,
+         att_id, time_in, time_out, approved) in db.session.execute(stmt):
+        worked = _hours_between(time_in, time_out) if time_in and time_out else 0.0
+        yield {
+            "shift_id": shift_id,
+            "user_id": uid,
+            "username": username,
+            "work_date": work_date.isoformat(),
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "role": role,
+            "location": location,
+            "scheduled_hours": round(_hours_between(datetime.combine(work_date, start_time),
+                                                    datetime.combine(work_date, end_time)), 2),
+            "attendance_id": att_id,
+            "time_in": time_in.isoformat() if time_in else None,
+            "time_out": time_out.isoformat() if time_out else None,
+            "approved": bool(approved) if att_id else None,
+            "worked_hours": round(worked, 2),
+        }
+
+
+def stream_export(start_date: date, end_date: date, fmt: str = "csv",
+                  user_id: Optional[int] = None, chunk: int = EXPORT_CHUNK):
+    """Yield the line-level export as text chunks of about `chunk` rows,
+    CSV (with header) or NDJSON. Raises ValueError for an unknown format or
+    an inverted range before any rows are read."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if start_date > end_date:
+        raise ValueError("start_date must be on or before end_date")
+    return _export_chunks(iter_export_rows(start_date, end_date, user_id, chunk), fmt, chunk)
+
+
+def _export_chunks(rows, fmt, chunk):
+    buf = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+    n = 0
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(row))
+            buf.write("\n")
+        n += 1
+        if n % chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
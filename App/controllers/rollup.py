@@ -0,0 +1,119 @@
+from App.models import Shift, Attendance, DailyHours
+from App.database import db
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import and_, func, tuple_
+
+
+def _day_totals(rows):
+    """Fold (user_id, work_date, start, end, time_in, time_out, approved) rows
+    into {(user_id, work_date): [scheduled, worked, approved]}."""
+    totals = {}
+    for user_id, work_date, start, end, time_in, time_out, approved in rows:
+        scheduled = max((datetime.combine(work_date, end)
+                         - datetime.combine(work_date, start)).total_seconds() / 3600.0, 0)
+        worked = 0.0
+        if time_in and time_out:
+            worked = max((time_out - time_in).total_seconds() / 3600.0, 0)
+        t = totals.setdefault((user_id, work_date), [0.0, 0.0, 0.0])
+        t[0] += scheduled
+        t[1] += worked
+        if approved:
+            t[2] += worked
+    return totals
+
+
+def _rollup_source():
+    return (
+        db.select(
+            Shift.user_id, Shift.work_date, Shift.start_time, Shift.end_time,
+            Attendance.time_in, Attendance.time_out, Attendance.approved,
+        )
+        .outerjoin(Attendance, and_(Attendance.shift_id == Shift.id,
+                                    Attendance.user_id == Shift.user_id))
+    )
+
+
+def refresh_daily_hours(keys: Iterable[Tuple[int, date]]):
+    """Recompute the rollup rows for the given (user_id, work_date) pairs.
+
+    Does not commit: callers run this just before their own commit so the
+    rollup changes land in the same transaction as the shift/attendance write.
+    """
+    keys = {(int(u), d) for u, d in keys if u is not None and d is not None}
+    if not keys:
+        return
+    rows = db.session.execute(
+        _rollup_source().where(tuple_(Shift.user_id, Shift.work_date).in_(list(keys)))
+    ).all()
+    totals = _day_totals(rows)
+
+    existing = {
+        (r.user_id, r.work_date): r
+        for r in DailyHours.query.filter(
+            tuple_(DailyHours.user_id, DailyHours.work_date).in_(list(keys))
+        )
+    }
+    for key in keys:
+        rec = existing.get(key)
+        if key not in totals:
+            if rec:
+                db.session.delete(rec)
+            continue
+        scheduled, worked, approved = totals[key]
+        if not rec:
+            rec = DailyHours(user_id=key[0], work_date=key[1])
+            db.session.add(rec)
+        rec.scheduled_hours = scheduled
+        rec.worked_hours = worked
+        rec.approved_hours = approved
+
+
+def rebuild_daily_hours():
+    """Drop and recompute every rollup row from Shift/Attendance. Returns the row count."""
+    totals = _day_totals(db.session.execute(_rollup_source()))
+    db.session.execute(db.delete(DailyHours))
+    if totals:
+        db.session.execute(db.insert(DailyHours), [
+            {"user_id": u, "work_date": d, "scheduled_hours": s,
+             "worked_hours": w, "approved_hours": a}
+            for (u, d), (s, w, a) in totals.items()
+        ])
+    db.session.commit()
+    return len(totals)
+
+
+def _rollup_query(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                  user_id: Optional[int] = None):
+    q = DailyHours.query
+    if start_date:
+        q = q.filter(DailyHours.work_date >= start_date)
+    if end_date:
+        q = q.filter(DailyHours.work_date <= end_date)
+    if user_id:
+        q = q.filter(DailyHours.user_id == user_id)
+    return q
+
+
+def get_daily_hours(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    user_id: Optional[int] = None):
+    return _rollup_query(start_date, end_date, user_id)\
+        .order_by(DailyHours.work_date.asc(), DailyHours.user_id.asc()).all()
+
+
+def get_hours_totals(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                     user_id: Optional[int] = None):
+    """Summed rollup hours over a range: {'scheduled_hours', 'worked_hours',
+    'approved_hours', 'unique_users'}."""
+    row = _rollup_query(start_date, end_date, user_id).with_entities(
+        func.coalesce(func.sum(DailyHours.scheduled_hours), 0.0),
+        func.coalesce(func.sum(DailyHours.worked_hours), 0.0),
+        func.coalesce(func.sum(DailyHours.approved_hours), 0.0),
+        func.count(func.distinct(DailyHours.user_id)),
+    ).one()
+    return {
+        "scheduled_hours": round(row[0], 2),
+        "worked_hours": round(row[1], 2),
+        "approved_hours": round(row[2], 2),
+        "unique_users": row[3],
+    }
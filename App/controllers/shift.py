@@ -1,20 +1,82 @@
-from App.models import Shift, Attendance
-from App.database import db
+from App.models import Shift, Attendance, User
+from App.database import db, hours_between
+from App.cache import LRUCache
+from App.intervals import IntervalIndex
+from .rollup import refresh_daily_hours, get_hours_totals
+from .versions import SHIFTS_SCOPE, bump_versions, range_version
 from datetime import date, timedelta, time as dtime
+from flask import current_app
+from sqlalchemy import and_, or_, func
+import base64
+
+ROSTER_PAGE_DEFAULT = 100
+ROSTER_PAGE_MAX = 1000
+ROSTER_ENTRY_BYTES = 160  # rough JSON size of one cached shift dict, for cache sizing
+
+class ShiftConflictError(ValueError):
+    """A shift overlaps another shift of the same user on the same day.
+    `conflicts` has one dict per rejected window (see _conflict)."""
+
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+def _hhmm(t: dtime) -> str:
+    return f"{t.hour:02d}:{t.minute:02d}"
+
+def _conflict(user_id, work_date, start, end, overlaps):
+    # overlaps: (start, end, shift id or None for a window earlier in the same batch)
+    return {
+        "user_id": user_id,
+        "date": work_date.isoformat(),
+        "start": _hhmm(start),
+        "end": _hhmm(end),
+        "overlaps": [{"id": i, "start": _hhmm(s), "end": _hhmm(e)} for s, e, i in overlaps],
+    }
+
+def _raise_conflict(conflict):
+    windows = ", ".join(f"{o['start']}-{o['end']}" for o in conflict["overlaps"])
+    raise ShiftConflictError(
+        f"Shift {conflict['start']}-{conflict['end']} on {conflict['date']} overlaps "
+        f"this user's shift(s) {windows}", [conflict])
+
+def check_shift_conflicts(user_id: int, work_date: date, start: dtime, end: dtime, exclude_id: int = None):
+    """Raise ShiftConflictError if [start, end) overlaps another of the user's
+    shifts that day (touching windows are fine). The range predicates are
+    served by uq_user_shift_window's (user_id, work_date, start_time) prefix."""
+    q = db.select(Shift.start_time, Shift.end_time, Shift.id).where(
+        Shift.user_id == user_id, Shift.work_date == work_date,
+        Shift.start_time < end, Shift.end_time > start,
+    ).order_by(Shift.start_time)
+    if exclude_id is not None:
+        q = q.where(Shift.id != exclude_id)
+    with db.session.no_autoflush:
+        clashes = db.session.execute(q).all()
+    if clashes:
+        _raise_conflict(_conflict(user_id, work_date, start, end, clashes))
 
 def schedule_shift(user_id: int, work_date: date, start: dtime, end: dtime, role=None, location=None):
-    existing = Shift.query.filter_by(
-        user_id=user_id,
-        work_date=work_date,
-        start_time=start,
-        end_time=end
-    ).first()
+    """Create a shift, or update role/location of the identical window if it
+    exists. Raises ShiftConflictError if it overlaps another of the user's
+    shifts that day."""
+    work_date, start, end = _as_date(work_date), _as_time(start), _as_time(end)
+    same_day = Shift.query.filter_by(user_id=user_id, work_date=work_date)\
+                          .order_by(Shift.start_time).all()
+    existing = next((s for s in same_day if (s.start_time, s.end_time) == (start, end)), None)
     if existing:
         if role is not None: existing.role = role
         if location is not None: existing.location = location
+        if db.session.is_modified(existing):
+            invalidate_roster([work_date])
         db.session.commit()
         return existing
 
+    clashes = [(s.start_time, s.end_time, s.id) for s in same_day
+               if s.start_time < end and start < s.end_time]
+    if clashes:
+        _raise_conflict(_conflict(user_id, work_date, start, end, clashes))
+
     shift = Shift(
         user_id=user_id,
         work_date=work_date,
@@ -24,54 +86,287 @@ def schedule_shift(user_id: int, work_date: date, start: dtime, end: dtime, role
         location=location
     )
     db.session.add(shift)
-    db.session.commit()
+    db.session.flush()
 
     # Ensure attendance exists
     att = Attendance.query.filter_by(shift_id=shift.id, user_id=user_id).first()
     if not att:
         db.session.add(Attendance(shift_id=shift.id, user_id=user_id))
-        db.session.commit()
+
+    refresh_daily_hours([(user_id, work_date)])
+    invalidate_roster([work_date])
+    db.session.commit()
 
     return shift
 
-def schedule_week(user_id: int, week_start: date, daily_windows: dict, role=None, location=None, skip_existing=True):
-    created, skipped = [], []
+def schedule_week(user_id: int, week_start: date, daily_windows: dict, role=None, location=None,
+                  skip_existing=True, skip_conflicts=False):
+    if isinstance(week_start, str):
+        week_start = date.fromisoformat(week_start)
+    rows = []
     for offset in range(7):
-        pair = daily_windows.get(offset)
+        pair = daily_windows.get(offset) or daily_windows.get(str(offset))
         if not pair:
             continue
         start_s, end_s = pair
-        start = dtime.fromisoformat(start_s)
-        end   = dtime.fromisoformat(end_s)
-        work_day = week_start + timedelta(days=offset)
-
-        existing = Shift.query.filter_by(
-            user_id=user_id,
-            work_date=work_day,
-            start_time=start,
-            end_time=end
-        ).first()
-
-        if existing:
-            if skip_existing:
-                if role is not None: existing.role = role
-                if location is not None: existing.location = location
-                db.session.commit()
-                skipped.append(existing)
-                continue
-            else:
-                raise ValueError("Duplicate shift exists")
+        rows.append({
+            "user_id": user_id,
+            "date": week_start + timedelta(days=offset),
+            "start": start_s,
+            "end": end_s,
+            "role": role,
+            "location": location,
+        })
+    return schedule_bulk(rows, skip_existing=skip_existing, skip_conflicts=skip_conflicts)
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _as_time(value):
+    return dtime.fromisoformat(value) if isinstance(value, str) else value
 
-        created.append(
-            schedule_shift(user_id, work_day, start, end, role, location)
+def schedule_bulk(rows, skip_existing=True, skip_conflicts=False):
+    """Schedule many shifts in one transaction.
+
+    `rows` is an iterable of dicts with user_id, date (or work_date), start,
+    end and optional role/location; dates and times may be ISO strings.
+    Existing windows are looked up in one query, new shifts and their
+    Attendance rows are inserted in batches, and everything commits once.
+
+    Overlaps with the users' other shifts (existing, or earlier in the
+    batch) are checked against an IntervalIndex built from that same query,
+    O(log n) per row. By default any overlap raises ShiftConflictError and
+    nothing is written; with skip_conflicts the overlapping rows are left
+    out and reported instead.
+    Returns {"created": [...], "skipped": [...], "conflicts": [...]} like schedule_week.
+    """
+    wanted = {}
+    for row in rows:
+        key = (
+            int(row["user_id"]),
+            _as_date(row.get("date", row.get("work_date"))),
+            _as_time(row["start"]),
+            _as_time(row["end"]),
         )
+        # a repeated window in the same batch is scheduled once
+        wanted.setdefault(key, (row.get("role"), row.get("location")))
+    if not wanted:
+        return {"created": [], "skipped": [], "conflicts": []}
 
-    return {
+    user_ids = {k[0] for k in wanted}
+    users = User.query.filter(User.id.in_(user_ids)).all()  # also fills the identity map for get_json
+    missing = user_ids - {u.id for u in users}
+    if missing:
+        raise ValueError(f"Unknown user id(s): {sorted(missing)}")
+
+    dates = [k[1] for k in wanted]
+    existing = {
+        (s.user_id, s.work_date, s.start_time, s.end_time): s
+        for s in Shift.query.filter(Shift.user_id.in_(user_ids),
+                                    Shift.work_date.between(min(dates), max(dates)))
+    }
+
+    index = IntervalIndex()
+    for s in existing.values():
+        index.add((s.user_id, s.work_date), s.start_time, s.end_time, s.id)
+
+    created, skipped, conflicts = [], [], []
+    for key, (role, location) in wanted.items():
+        shift = existing.get(key)
+        if shift:
+            if not skip_existing:
+                db.session.rollback()  # drop role/location edits made to earlier rows
+                raise ValueError("Duplicate shift exists")
+            if role is not None: shift.role = role
+            if location is not None: shift.location = location
+            skipped.append(shift)
+            continue
+        user_id, work_date, start, end = key
+        clashes = index.overlapping((user_id, work_date), start, end)
+        if clashes:
+            conflicts.append(_conflict(user_id, work_date, start, end, clashes))
+            continue
+        index.add((user_id, work_date), start, end)
+        created.append(Shift(user_id=user_id, work_date=work_date, start_time=start,
+                             end_time=end, role=role, location=location))
+
+    if conflicts and not skip_conflicts:
+        db.session.rollback()
+        raise ShiftConflictError(f"{len(conflicts)} shift(s) overlap other shifts of the same user",
+                                 conflicts)
+
+    touched = [s.work_date for s in created] + \
+              [s.work_date for s in skipped if db.session.is_modified(s)]
+    db.session.add_all(created)
+    db.session.flush()
+    db.session.add_all([Attendance(shift_id=s.id, user_id=s.user_id) for s in created])
+    refresh_daily_hours({(s.user_id, s.work_date) for s in created})
+    invalidate_roster(touched)
+
+    result = {
         "created": [s.get_json() for s in created],
-        "skipped": [s.get_json() for s in skipped]
+        "skipped": [s.get_json() for s in skipped],
+        "conflicts": conflicts,
     }
+    db.session.commit()
+    return result
+
+def _shift_rows():
+    # plain column tuples for Shift.row_json, in roster order: no instances are built
+    return db.select(*Shift.json_columns()).join(User, User.id == Shift.user_id)\
+             .order_by(Shift.work_date.asc(), Shift.start_time.asc(), Shift.id.asc())
+
+def _roster_select(start_date: date, end_date: date):
+    return _shift_rows().where(Shift.work_date.between(start_date, end_date))
+
+def roster_cache() -> LRUCache:
+    """Per-app cache of serialized roster ranges/pages (see _cached_roster)."""
+    cache = current_app.extensions.get("roster_cache")
+    if cache is None:
+        cache = current_app.extensions["roster_cache"] = LRUCache(
+            max_entries=current_app.config.get("ROSTER_CACHE_MAX_ENTRIES", 256),
+            max_bytes=current_app.config.get("ROSTER_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+        )
+    return cache
+
+def invalidate_roster(dates):
+    """Mark roster data for these dates as changed. Call before committing the
+    shift write: the version bump joins the transaction, so every worker's
+    cached ranges covering the dates stop matching once it commits."""
+    dates = {d for d in dates if d is not None}
+    if not dates:
+        return
+    bump_versions(SHIFTS_SCOPE, dates)
+    # a None bound (no start_date/end_date on the request) is open-ended
+    roster_cache().invalidate_where(lambda k: any(
+        (k[1] is None or k[1] <= d) and (k[2] is None or d <= k[2]) for d in dates))
+
+def _cached_roster(key: tuple, start_date: date, end_date: date, compute):
+    # key is (kind, start, end, ...); the range version makes stale entries unreachable
+    key = key + (range_version(SHIFTS_SCOPE, start_date, end_date),)
+    cache = roster_cache()
+    payload = cache.get(key)
+    if payload is None:
+        payload = compute()
+        rows = payload["shifts"] if isinstance(payload, dict) else payload
+        cache.set(key, payload, size=(len(rows) + 1) * ROSTER_ENTRY_BYTES)
+    return payload
 
 def get_roster(start_date: date, end_date: date):
-    q = Shift.query.filter(Shift.work_date.between(start_date, end_date))\
-                   .order_by(Shift.work_date.asc(), Shift.start_time.asc())
-    return [s.get_json() for s in q.all()]
\ No newline at end of file
+    return list(_cached_roster(
+        ("range", start_date, end_date), start_date, end_date,
+        lambda: [Shift.row_json(r) for r in db.session.execute(_roster_select(start_date, end_date))],
+    ))
+
+def encode_roster_cursor(shift) -> str:
+    # a Shift or a _roster_select row: both have work_date, start_time and id
+    raw = f"{shift.work_date.isoformat()}|{shift.start_time.isoformat()}|{shift.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_roster_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        d, t, i = raw.split("|")
+        return date.fromisoformat(d), dtime.fromisoformat(t), int(i)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid roster cursor")
+
+def get_roster_page(start_date: date, end_date: date, limit: int = ROSTER_PAGE_DEFAULT, after: str = None):
+    """One page of the roster, keyset-ordered by (work_date, start_time, id).
+    Pass the returned next_cursor back as `after` to fetch the following page;
+    it is None on the last page.
+    """
+    limit = max(1, min(int(limit or ROSTER_PAGE_DEFAULT), ROSTER_PAGE_MAX))
+    q = _roster_select(start_date, end_date)
+    if after:
+        d, t, i = decode_roster_cursor(after)
+        q = q.where(or_(
+            Shift.work_date > d,
+            and_(Shift.work_date == d, Shift.start_time > t),
+            and_(Shift.work_date == d, Shift.start_time == t, Shift.id > i),
+        ))
+
+    def compute():
+        rows = db.session.execute(q.limit(limit + 1)).all()
+        page = rows[:limit]
+        return {
+            "shifts": [Shift.row_json(r) for r in page],
+            "next_cursor": encode_roster_cursor(page[-1]) if len(rows) > limit else None,
+        }
+
+    page = _cached_roster(("page", start_date, end_date, limit, after), start_date, end_date, compute)
+    return {"shifts": list(page["shifts"]), "next_cursor": page["next_cursor"]}
+
+def get_user_shifts_json(user_id: int, start_date: date = None, end_date: date = None):
+    """get_json() dicts of one user's shifts, oldest first, read as column tuples."""
+    q = _shift_rows().where(Shift.user_id == user_id)
+    if start_date:
+        q = q.where(Shift.work_date >= start_date)
+    if end_date:
+        q = q.where(Shift.work_date <= end_date)
+    return [Shift.row_json(r) for r in db.session.execute(q)]
+
+SUMMARY_GROUPS = ("day", "user", "location_role")
+
+def get_shift_summary(start_date: date = None, end_date: date = None, user_id: int = None, group_by: str = None):
+    """Shift counts and hours computed with GROUP BY/SUM in the database.
+
+    Totals come from the daily hours rollup; per location/role counts from one
+    grouped query over shifts. `group_by` (one of SUMMARY_GROUPS) adds a
+    "groups" list with shifts and hours per day, per user or per location x role.
+    """
+    if group_by is not None and group_by not in SUMMARY_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(SUMMARY_GROUPS)}")
+
+    def filtered(q):
+        if start_date:
+            q = q.where(Shift.work_date >= start_date)
+        if end_date:
+            q = q.where(Shift.work_date <= end_date)
+        if user_id:
+            q = q.where(Shift.user_id == user_id)
+        return q
+
+    hours = hours_between(Shift.start_time, Shift.end_time)
+    by_loc_role = db.session.execute(filtered(
+        db.select(Shift.location, Shift.role, func.count(Shift.id), func.sum(hours))
+        .group_by(Shift.location, Shift.role)
+    )).all()
+
+    shifts_by_location, shifts_by_role = {}, {}
+    for location, role, count, _ in by_loc_role:
+        if location:
+            shifts_by_location[location] = shifts_by_location.get(location, 0) + count
+        if role:
+            shifts_by_role[role] = shifts_by_role.get(role, 0) + count
+
+    totals = get_hours_totals(start_date, end_date, user_id)
+    summary = {
+        "total_shifts": sum(r[2] for r in by_loc_role),
+        "total_hours": totals["scheduled_hours"],
+        "unique_users": totals["unique_users"],
+        "shifts_by_location": shifts_by_location,
+        "shifts_by_role": shifts_by_role
+    }
+
+    if group_by == "location_role":
+        groups = [{"location": loc, "role": role, "shifts": n, "hours": round(h or 0, 2)}
+                  for loc, role, n, h in by_loc_role]
+    elif group_by == "day":
+        groups = [{"date": d.isoformat(), "shifts": n, "users": u, "hours": round(h or 0, 2)}
+                  for d, n, u, h in db.session.execute(filtered(
+                      db.select(Shift.work_date, func.count(Shift.id),
+                                func.count(func.distinct(Shift.user_id)), func.sum(hours))
+                      .group_by(Shift.work_date).order_by(Shift.work_date)
+                  ))]
+    elif group_by == "user":
+        groups = [{"user_id": uid, "username": name, "shifts": n, "hours": round(h or 0, 2)}
+                  for uid, name, n, h in db.session.execute(filtered(
+                      db.select(Shift.user_id, User.username, func.count(Shift.id), func.sum(hours))
+                      .join(User, User.id == Shift.user_id)
+                      .group_by(Shift.user_id, User.username).order_by(Shift.user_id)
+                  ))]
+    else:
+        return summary
+    summary["groups"] = groups
+    return summary
@@ -1,5 +1,8 @@
 from App.models import User
 from App.database import db
+from .versions import bump_user_shift_versions
+from .shift import roster_cache
+from .auth import invalidate_user_identity
 
 def create_user(username, password, isAdmin=False):
     newuser = User(username=username, password=password, isAdmin=isAdmin)
@@ -20,11 +23,21 @@ def get_all_users_json():
     users = User.query.all()
     return [user.get_json() for user in users] if users else []
 
+def invalidate_user(user_id):
+    """Invalidate what is derived from a user's name and admin flag: the
+    shift versions of their dates (rosters embed usernames) and this
+    request's identity memo. Does not commit: call it inside the edit's
+    transaction."""
+    bump_user_shift_versions(user_id)
+    invalidate_user_identity(user_id)
+    roster_cache().clear()
+
 def update_user(id, username):
     user = get_user(id)
     if user:
         user.username = username
         db.session.add(user)
+        invalidate_user(user.id)
         db.session.commit()
         return user
     return None
@@ -0,0 +1,86 @@
+from App.models import DataVersion, Shift, Attendance
+from App.database import db, dialect_insert, epoch_ms
+from App.conditional import make_etag
+from datetime import date
+import hashlib
+from typing import Iterable, Optional
+from sqlalchemy import case, func
+
+SHIFTS_SCOPE = "shifts"
+REPORTS_SCOPE = "reports"  # bumped on period_start whenever a report is written
+
+
+def bump_versions(scope: str, dates: Iterable[date]):
+    """Increment the change counter for each date in one statement.
+    Does not commit: call it inside the writer's transaction."""
+    dates = sorted({d for d in dates if d is not None})
+    if not dates:
+        return
+    stmt = dialect_insert(DataVersion.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scope", "work_date"],
+        set_={"version": DataVersion.__table__.c.version + 1},
+    )
+    db.session.execute(stmt, [{"scope": scope, "work_date": d, "version": 1} for d in dates])
+
+
+def bump_user_shift_versions(user_id: int):
+    """Bump every date on which the user has a shift (e.g. after a rename)."""
+    dates = db.session.execute(
+        db.select(Shift.work_date).where(Shift.user_id == user_id).distinct()
+    ).scalars().all()
+    bump_versions(SHIFTS_SCOPE, dates)
+
+
+def range_version(scope: str, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """Token that changes whenever any date in [start_date, end_date] is bumped.
+
+    Counters only ever grow, so (rows, sum of versions) strictly changes on
+    every bump or first write to a new date in the range.
+    """
+    q = db.select(func.count(DataVersion.id), func.coalesce(func.sum(DataVersion.version), 0))\
+          .where(DataVersion.scope == scope)
+    if start_date:
+        q = q.where(DataVersion.work_date >= start_date)
+    if end_date:
+        q = q.where(DataVersion.work_date <= end_date)
+    count, total = db.session.execute(q).one()
+    return f"{count}.{total}"
+
+
+def range_etag(scope: str, start_date: Optional[date] = None, end_date: Optional[date] = None, *extra):
+    """ETag for a response built from `scope` data in [start_date, end_date];
+    `extra` is anything else that shapes it (query args, user). Costs one
+    aggregate query on data_versions, no data rows."""
+    return make_etag(scope, start_date, end_date, range_version(scope, start_date, end_date), *extra)
+
+
+def attendance_fingerprint(start_date: date, end_date: date):
+    """Token over every attendance row (clock-in, clock-out, approval) on
+    the shifts in [start_date, end_date], aggregated in SQL from the rows
+    themselves: one row comes back however many there are. Only the report
+    scheduler and report writers need it, so attendance writes (clock-in/out,
+    approvals) bump no shared counter row: they would all queue on the same
+    ('hours', today) row lock otherwise."""
+    approved_id = case((Attendance.approved == db.true(), Attendance.id), else_=0)
+    row = db.session.execute(
+        db.select(
+            func.count(Attendance.id),
+            func.coalesce(func.max(Attendance.id), 0),
+            func.coalesce(func.sum(Attendance.id), 0),
+            func.coalesce(func.sum(epoch_ms(Attendance.time_in)), 0),
+            func.coalesce(func.sum(epoch_ms(Attendance.time_out)), 0),
+            func.coalesce(func.sum(approved_id), 0),
+        )
+        .join(Shift, Shift.id == Attendance.shift_id)
+        .where(Shift.work_date.between(start_date, end_date))
+    ).one()
+    # digest so the token fits Report.source_token with the shifts version
+    return hashlib.blake2b(repr(tuple(int(v) for v in row)).encode(), digest_size=12).hexdigest()
+
+
+def report_source_token(start_date: date, end_date: date):
+    """Token over everything a report for [start_date, end_date] is built
+    from: shift details (the shifts data version) and attendance. Equal
+    tokens mean a stored report for the range is still current."""
+    return f"{range_version(SHIFTS_SCOPE, start_date, end_date)}:{attendance_fingerprint(start_date, end_date)}"
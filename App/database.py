@@ -1,5 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import BigInteger, Float
 
 
 db = SQLAlchemy()
@@ -11,4 +14,48 @@ def create_db():
     db.create_all()
     
 def init_db(app):
-    db.init_app(app)
\ No newline at end of file
+    db.init_app(app)
+
+def dialect_insert(table):
+    """INSERT construct for the bound dialect, so callers can use
+    on_conflict_do_update/do_nothing on both SQLite and PostgreSQL."""
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+class hours_between(FunctionElement):
+    """SQL expression for the hours from `start` to `end` (TIME or TIMESTAMP
+    columns), clamped at 0 like Shift.duration_hours/Attendance.hours_worked."""
+    type = Float()
+    name = "hours_between"
+    inherit_cache = True
+
+@compiles(hours_between)
+def _hours_between(element, compiler, **kw):
+    start, end = (compiler.process(c, **kw) for c in element.clauses)
+    return f"GREATEST(EXTRACT(EPOCH FROM ({end} - {start})) / 3600.0, 0)"
+
+@compiles(hours_between, "sqlite")
+def _hours_between_sqlite(element, compiler, **kw):
+    start, end = (compiler.process(c, **kw) for c in element.clauses)
+    # julianday() parses both 'HH:MM:SS' and full timestamps; round to ms to drop float noise
+    return f"max(round((julianday({end}) - julianday({start})) * 86400.0, 3) / 3600.0, 0)"
+
+class epoch_ms(FunctionElement):
+    """SQL expression for a TIMESTAMP column as integer milliseconds since
+    the Unix epoch (NULL stays NULL), exact enough to sum and compare."""
+    type = BigInteger()
+    name = "epoch_ms"
+    inherit_cache = True
+
+@compiles(epoch_ms)
+def _epoch_ms(element, compiler, **kw):
+    (value,) = (compiler.process(c, **kw) for c in element.clauses)
+    return f"CAST(round(EXTRACT(EPOCH FROM {value}) * 1000) AS BIGINT)"
+
+@compiles(epoch_ms, "sqlite")
+def _epoch_ms_sqlite(element, compiler, **kw):
+    (value,) = (compiler.process(c, **kw) for c in element.clauses)
+    return f"CAST(round((julianday({value}) - 2440587.5) * 86400000.0) AS INTEGER)"
@@ -0,0 +1,74 @@
+"""Password hashing off the request workers.
+
+PBKDF2/scrypt hashing is CPU-bound; run on a gevent worker it stalls every
+other greenlet in that worker. With PASSWORD_POOL_SIZE > 0 the work goes to
+a per-worker process pool instead. The calling greenlet waits on the future,
+and gunicorn's gevent worker monkey-patches threading, so the wait yields to
+other greenlets. PASSWORD_POOL_MAX_QUEUE bounds how many calls may wait for a
+free process. Past that, callers wait up to PASSWORD_POOL_TIMEOUT seconds for
+a slot and then get HashingPoolBusy. With no pool configured, or outside an
+app context (e.g. unit tests), hashing runs inline.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingPoolBusy(RuntimeError):
+    """Raised when the hashing pool queue is full for longer than the timeout."""
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = None
+
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    if not has_app_context():
+        return None
+    size = current_app.config.get("PASSWORD_POOL_SIZE", 0)
+    if not size:
+        return None
+    with _lock:
+        # pools don't survive fork, so each gunicorn worker builds its own
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=size,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(
+                size + current_app.config.get("PASSWORD_POOL_MAX_QUEUE", 32))
+        return _pool
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+    if not _slots.acquire(timeout=current_app.config.get("PASSWORD_POOL_TIMEOUT", 5)):
+        raise HashingPoolBusy("Password hashing queue is full, try again shortly.")
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password)
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def shutdown_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
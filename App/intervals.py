@@ -0,0 +1,36 @@
+"""Per-key index of half-open [start, end) intervals for overlap checks.
+
+Intervals are kept sorted by start in one list per key (the scheduler keys
+by (user_id, work_date)). As long as the intervals under a key don't overlap
+each other -- which is what the index is used to enforce -- their ends are
+sorted too, so the intervals overlapping a window are a contiguous run found
+with one bisect: O(log n) per check, plus the number of conflicts.
+Touching intervals (one ends when the next starts) do not overlap.
+"""
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    def __init__(self):
+        self._keys = {}  # key -> ([start...], [(start, end, value)...]), sorted by start
+
+    def add(self, key, start, end, value=None):
+        starts, items = self._keys.setdefault(key, ([], []))
+        i = bisect_left(starts, start)
+        starts.insert(i, start)
+        items.insert(i, (start, end, value))
+
+    def overlapping(self, key, start, end):
+        """(start, end, value) of every interval under `key` overlapping
+        [start, end), in start order."""
+        entry = self._keys.get(key)
+        if entry is None:
+            return []
+        starts, items = entry
+        found = []
+        i = bisect_left(starts, end) - 1  # last interval starting before `end`
+        while i >= 0 and items[i][1] > start:
+            found.append(items[i])
+            i -= 1
+        found.reverse()
+        return found
@@ -0,0 +1,55 @@
+"""Per-worker background threads that drain a durable job queue.
+
+``run_next()`` is called inside an app context; it should claim and run one
+job and return True, or return False when nothing is queued. Idle threads
+sleep for ``poll`` seconds or until ``wake()`` is called. The queue itself
+lives in the database (see App/models/report_job.py), so jobs queued by one
+process are picked up by any other and survive restarts.
+Under gunicorn's gevent worker the threads are greenlets and CPU-heavy jobs
+share the worker's loop, so web workers don't start them; queued jobs are run
+by ``flask report work`` in a separate process.
+"""
+import os
+import threading
+
+
+class JobRunner:
+    def __init__(self, app, run_next, workers=1, poll=2.0):
+        self.app = app
+        self.run_next = run_next
+        self.poll = poll
+        self._wake = threading.Event()
+        self._stopped = False
+        self._pid = os.getpid()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-runner-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Let the threads finish their current job and exit."""
+        self._stopped = True
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def alive(self):
+        # threads don't survive fork, so a gunicorn worker needs its own
+        return self._pid == os.getpid() and all(t.is_alive() for t in self._threads)
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                with self.app.app_context():
+                    ran = self.run_next()
+            except Exception:
+                self.app.logger.exception("Job runner iteration failed")
+                ran = False
+            if not ran and not self._stopped:
+                self._wake.wait(self.poll)
+                self._wake.clear()
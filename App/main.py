@@ -7,6 +7,7 @@ from werkzeug.datastructures import  FileStorage
 
 from App.database import init_db
 from App.config import load_config
+from App.metrics import setup_metrics
 
 from App.api import api   # <-- import your new API blueprint
 
@@ -23,6 +24,7 @@ from App.views import register_views
 def create_app(overrides={}):
     app = Flask(__name__, static_url_path='/static')
     load_config(app, overrides)
+    setup_metrics(app)
     CORS(app)
     add_auth_context(app)
 
@@ -0,0 +1,226 @@
+"""Request latency and SQL metrics in Prometheus text format.
+
+Every request is recorded under its (blueprint, endpoint, method): a latency
+histogram, a request counter by status, and the number of SQL statements
+and time spent in the database while it ran (from engine cursor events, so
+the cost is two perf_counter calls per statement).
+
+Counters live in process memory. gunicorn runs several workers, so with
+METRICS_DIR set each worker also writes its totals to
+``<METRICS_DIR>/worker-<pid>.json`` (at most every METRICS_FLUSH_INTERVAL
+seconds, atomically via rename) and ``/metrics`` sums every worker's file.
+Files from exited workers are kept so counters don't go backwards; clear
+the directory when the server starts (see gunicorn_config.py). Without
+METRICS_DIR only the serving process's own numbers are reported.
+"""
+import json
+import os
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+# (blueprint, endpoint, method) -> [bucket counts..., +Inf count, sum]
+_latency = {}
+# (blueprint, endpoint, method, status) -> count
+_requests = {}
+# (blueprint, endpoint) -> [statements, seconds]
+_db = {}
+_last_flush = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_metrics" in g:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if started and has_request_context() and "_metrics" in g:
+        g._metrics[1] += 1
+        g._metrics[2] += time.perf_counter() - started.pop()
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _start_timer():
+    # [started, statements, db seconds, status]
+    g._metrics = [time.perf_counter(), 0, 0.0, 500]
+
+
+def _capture_status(response):
+    if "_metrics" in g:
+        g._metrics[3] = response.status_code
+    return response
+
+
+def _record(exc=None):
+    m = g.pop("_metrics", None)
+    if m is None:
+        return
+    elapsed = time.perf_counter() - m[0]
+    blueprint = request.blueprint or ""
+    endpoint = request.endpoint or "unmatched"
+    key = (blueprint, endpoint, request.method)
+    with _lock:
+        hist = _latency.get(key)
+        if hist is None:
+            hist = _latency[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += elapsed
+        status_key = key + (str(m[3]),)
+        _requests[status_key] = _requests.get(status_key, 0) + 1
+        db_totals = _db.setdefault((blueprint, endpoint), [0, 0.0])
+        db_totals[0] += m[1]
+        db_totals[1] += m[2]
+    flush()
+
+
+def snapshot():
+    """This process's totals in a JSON-able shape."""
+    with _lock:
+        return {
+            "latency": [[list(k), list(v)] for k, v in _latency.items()],
+            "requests": [[list(k), v] for k, v in _requests.items()],
+            "db": [[list(k), list(v)] for k, v in _db.items()],
+        }
+
+
+def flush(force=False):
+    """Write this worker's snapshot to METRICS_DIR if it's time to."""
+    global _last_flush
+    directory = current_app.config.get("METRICS_DIR")
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < current_app.config.get("METRICS_FLUSH_INTERVAL", 1.0):
+        return
+    _last_flush = now
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"worker-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(snapshot(), fh)
+    os.replace(tmp, path)
+
+
+def _load_snapshots():
+    directory = current_app.config.get("METRICS_DIR")
+    if not directory:
+        return [snapshot()]
+    flush(force=True)
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            # worker exited or file replaced mid-read; its data shows up next scrape
+            continue
+    return snapshots
+
+
+def merge(snapshots):
+    latency, requests, db_totals = {}, {}, {}
+    for snap in snapshots:
+        for labels, values in snap["latency"]:
+            current = latency.setdefault(tuple(labels), [0] * len(values))
+            for i, v in enumerate(values):
+                current[i] += v
+        for labels, value in snap["requests"]:
+            requests[tuple(labels)] = requests.get(tuple(labels), 0) + value
+        for labels, values in snap["db"]:
+            current = db_totals.setdefault(tuple(labels), [0, 0.0])
+            current[0] += values[0]
+            current[1] += values[1]
+    return latency, requests, db_totals
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render():
+    """All workers' metrics in Prometheus text exposition format."""
+    latency, requests, db_totals = merge(_load_snapshots())
+    lines = [
+        "# HELP shiftmate_http_request_duration_seconds Request latency.",
+        "# TYPE shiftmate_http_request_duration_seconds histogram",
+    ]
+    for (blueprint, endpoint, method), values in sorted(latency.items()):
+        base = dict(blueprint=blueprint, endpoint=endpoint, method=method)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            lines.append(f"shiftmate_http_request_duration_seconds_bucket{_labels(**base, le=repr(bound))} {cumulative}")
+        cumulative += values[len(BUCKETS)]
+        lines.append(f"shiftmate_http_request_duration_seconds_bucket{_labels(**base, le='+Inf')} {cumulative}")
+        lines.append(f"shiftmate_http_request_duration_seconds_sum{_labels(**base)} {values[-1]}")
+        lines.append(f"shiftmate_http_request_duration_seconds_count{_labels(**base)} {cumulative}")
+
+    lines += [
+        "# HELP shiftmate_http_requests_total Requests by response status.",
+        "# TYPE shiftmate_http_requests_total counter",
+    ]
+    for (blueprint, endpoint, method, status), count in sorted(requests.items()):
+        labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method, status=status)
+        lines.append(f"shiftmate_http_requests_total{labels} {count}")
+
+    lines += [
+        "# HELP shiftmate_db_statements_total SQL statements executed while serving requests.",
+        "# TYPE shiftmate_db_statements_total counter",
+    ]
+    for (blueprint, endpoint), (statements, _) in sorted(db_totals.items()):
+        lines.append(f"shiftmate_db_statements_total{_labels(blueprint=blueprint, endpoint=endpoint)} {statements}")
+
+    lines += [
+        "# HELP shiftmate_db_duration_seconds_total Time spent in SQL statements while serving requests.",
+        "# TYPE shiftmate_db_duration_seconds_total counter",
+    ]
+    for (blueprint, endpoint), (_, seconds) in sorted(db_totals.items()):
+        lines.append(f"shiftmate_db_duration_seconds_total{_labels(blueprint=blueprint, endpoint=endpoint)} {seconds}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drop this process's counters (tests and benchmarks)."""
+    with _lock:
+        _latency.clear()
+        _requests.clear()
+        _db.clear()
+
+
+def setup_metrics(app):
+    app.config.setdefault("METRICS_ENABLED", True)
+    app.config.setdefault("METRICS_DIR", None)
+    app.config.setdefault("METRICS_FLUSH_INTERVAL", 1.0)
+    if not app.config["METRICS_ENABLED"]:
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    app.before_request(_start_timer)
+    app.after_request(_capture_status)
+    app.teardown_request(_record)
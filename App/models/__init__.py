@@ -2,5 +2,8 @@ from .user import *
 from .shift import Shift
 from .attendance import Attendance
 from .report import Report
+from .daily_hours import DailyHours
+from .data_version import DataVersion
+from .report_job import ReportJob
 
-__all__ = ["User", "Shift", "Attendance", "Report"]
\ No newline at end of file
+__all__ = ["User", "Shift", "Attendance", "Report", "DailyHours", "DataVersion", "ReportJob"]
\ No newline at end of file
@@ -11,7 +11,7 @@ class Attendance(db.Model):
     time_out = db.Column(db.DateTime)
     approved = db.Column(db.Boolean, default=False)
 
-    shift = db.relationship("Shift", backref=db.backref("attendance", lazy=True))
+    shift = db.relationship("Shift", backref=db.backref("attendance", lazy=True, cascade="all, delete-orphan"))
     user  = db.relationship("User", backref=db.backref("attendance", lazy=True))
 
     __table_args__ = (
@@ -27,13 +27,39 @@ class Attendance(db.Model):
             return max((self.time_out - self.time_in).total_seconds() / 3600.0, 0)
         return 0.0
 
-    def get_json(self):
+    # Column projection of get_json() (see Shift.json_columns)
+    @classmethod
+    def json_columns(cls):
+        return (cls.id, cls.shift_id, cls.user_id, cls.time_in, cls.time_out, cls.approved)
+
+    @staticmethod
+    def row_json(row):
+        att_id, shift_id, user_id, time_in, time_out, approved = row
+        hours = max((time_out - time_in).total_seconds() / 3600.0, 0) if time_in and time_out else 0.0
         return {
-            "id": self.id,
-            "shift_id": self.shift_id,
-            "user_id": self.user_id,
-            "time_in": self.time_in.isoformat() if self.time_in else None,
-            "time_out": self.time_out.isoformat() if self.time_out else None,
-            "approved": self.approved,
-            "hours_worked": round(self.hours_worked(), 2),
+            "id": att_id,
+            "shift_id": shift_id,
+            "user_id": user_id,
+            "time_in": time_in.isoformat() if time_in else None,
+            "time_out": time_out.isoformat() if time_out else None,
+            "approved": approved,
+            "hours_worked": round(hours, 2),
         }
+
+    def get_json(self):
+        return self.row_json((self.id, self.shift_id, self.user_id,
+                              self.time_in, self.time_out, self.approved))
+
+
+# A NULL approved flag counts as not approved, everywhere it is filtered on
+# (the pending list, its index and bulk approval).
+not_approved = db.func.coalesce(Attendance.approved, db.false()) == db.false()
+
+# Partial indexes for the "pending approval" and "currently clocked in" lists:
+# each covers only the handful of rows in that state.
+_pending = db.and_(not_approved, Attendance.time_out.isnot(None))
+_clocked_in = db.and_(Attendance.time_in.isnot(None), Attendance.time_out.is_(None))
+db.Index("ix_attendance_pending_approval", Attendance.user_id,
+         sqlite_where=_pending, postgresql_where=_pending)
+db.Index("ix_attendance_clocked_in", Attendance.user_id,
+         sqlite_where=_clocked_in, postgresql_where=_clocked_in)
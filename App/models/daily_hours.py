@@ -0,0 +1,35 @@
+# App/models/daily_hours.py
+from App.database import db
+
+class DailyHours(db.Model):
+    """Per-user, per-day rollup of scheduled/worked/approved hours.
+
+    Kept current by the shift and attendance controllers in the same
+    transaction as the write; rebuild with `flask report rebuild-rollups`.
+    """
+    __tablename__ = "daily_hours"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    work_date = db.Column(db.Date, nullable=False, index=True)
+    scheduled_hours = db.Column(db.Float, nullable=False, default=0.0)
+    worked_hours = db.Column(db.Float, nullable=False, default=0.0)
+    approved_hours = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "work_date", name="uq_daily_hours_user_date"),
+    )
+
+    def __repr__(self):
+        return (f"<DailyHours user_id={self.user_id} date={self.work_date} "
+                f"scheduled={self.scheduled_hours} worked={self.worked_hours} "
+                f"approved={self.approved_hours}>")
+
+    def get_json(self):
+        return {
+            "user_id": self.user_id,
+            "date": self.work_date.isoformat(),
+            "scheduled_hours": round(self.scheduled_hours, 2),
+            "worked_hours": round(self.worked_hours, 2),
+            "approved_hours": round(self.approved_hours, 2),
+        }
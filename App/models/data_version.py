@@ -0,0 +1,23 @@
+# App/models/data_version.py
+from App.database import db
+
+class DataVersion(db.Model):
+    """Change counter per (scope, work_date).
+
+    Writers bump the counter for every date they touch (scope "shifts" for
+    roster-visible changes). Readers fold the counters over a date range into
+    a cheap token that changes whenever any date in the range was written.
+    """
+    __tablename__ = "data_versions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(40), nullable=False)
+    work_date = db.Column(db.Date, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        db.UniqueConstraint("scope", "work_date", name="uq_data_version_scope_date"),
+    )
+
+    def __repr__(self):
+        return f"<DataVersion {self.scope} {self.work_date} v{self.version}>"
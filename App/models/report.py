@@ -1,5 +1,7 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from flask import current_app, has_app_context
 from App.database import db
+from App.packing import pack, unpack
 
 class Report(db.Model):
     __tablename__ = "reports"
@@ -14,8 +16,17 @@ class Report(db.Model):
     period_start = db.Column(db.Date, nullable=False, index=True)
     period_end   = db.Column(db.Date, nullable=False, index=True)
 
-    # Storage for the computed results (totals, rows, etc.)
-    payload = db.Column(db.JSON, nullable=False, default={})
+    # Storage for the computed results (totals, rows, etc.), read and written
+    # through the `payload` property. New rows keep it packed (App/packing.py)
+    # in payload_packed; rows written before that still use the JSON column,
+    # until `flask report pack-payloads` converts them. Both are deferred: list
+    # queries never load them.
+    payload_json = db.deferred(db.Column("payload", db.JSON, nullable=False, default={}), group="payload")
+    payload_packed = db.deferred(db.Column(db.LargeBinary, nullable=True), group="payload")
+
+    # versions.report_source_token() of the data it was built from; the
+    # scheduler regenerates the report when the current token differs
+    source_token = db.Column(db.String(64), nullable=True)
 
     # Lifecycle
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -29,6 +40,8 @@ class Report(db.Model):
     __table_args__ = (
         # One report per type+period (adjust if you want multiple versions)
         db.UniqueConstraint("report_type", "period_start", "period_end", name="uq_report_type_period"),
+        # newest-first keyset pagination of the report index
+        db.Index("ix_reports_created", "created_at", "id"),
     )
 
     def __repr__(self):
@@ -37,15 +50,31 @@ class Report(db.Model):
             f"{self.period_start}..{self.period_end} by={self.generated_by_id}>"
         )
 
+    @property
+    def payload(self) -> dict:
+        packed = self.payload_packed
+        if packed is None:
+            return self.payload_json
+        cached = self.__dict__.get("_unpacked")
+        if cached is None or cached[0] is not packed:
+            cached = self.__dict__["_unpacked"] = (packed, unpack(packed))
+        return cached[1]
+
+    @payload.setter
+    def payload(self, value: dict):
+        codec = current_app.config.get("REPORT_PAYLOAD_CODEC", "zlib") if has_app_context() else "zlib"
+        self.payload_packed = pack(value or {}, codec)
+        self.payload_json = {}
+
     # ---- helpers ----
     @classmethod
     def weekly_key(cls, week_start: date):
-        """Convenience for weekly reports."""
-        week_end = week_start  # controller should pass end explicitly if needed
-        return ("weekly", week_start, week_end)
+        """(report_type, period_start, period_end) of the weekly report for the
+        week starting `week_start` (weekly_report always covers 7 days)."""
+        return ("weekly", week_start, week_start + timedelta(days=6))
 
-    def get_json(self) -> dict:
-        return {
+    def get_json(self, include_payload: bool = True) -> dict:
+        data = {
             "id": self.id,
             "report_type": self.report_type,
             "period_start": self.period_start.isoformat(),
@@ -53,5 +82,7 @@ class Report(db.Model):
             "generated_by_id": self.generated_by_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "payload": self.payload or {},
         }
+        if include_payload:
+            data["payload"] = self.payload or {}
+        return data
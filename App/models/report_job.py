@@ -0,0 +1,56 @@
+# App/models/report_job.py
+from datetime import datetime
+from App.database import db
+
+class ReportJob(db.Model):
+    """A queued report generation request.
+
+    Rows outlive the process that created them: any worker's job runner
+    claims queued jobs (status queued -> running with a conditional UPDATE,
+    so only one worker gets each), and a running job whose heartbeat goes
+    stale (its worker died) is put back in the queue.
+    """
+    __tablename__ = "report_jobs"
+
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # "weekly" or "period"
+    params = db.Column(db.JSON, nullable=False, default={})
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # percent
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    claimed_by = db.Column(db.String(80))
+
+    requested_by_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    report_id = db.Column(db.Integer, db.ForeignKey("reports.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # claim order and stale-job sweeps
+        db.Index("ix_report_jobs_status_id", "status", "id"),
+    )
+
+    def __repr__(self):
+        return f"<ReportJob id={self.id} {self.kind} {self.status} {self.progress}%>"
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params or {},
+            "status": self.status,
+            "progress": self.progress,
+            "attempts": self.attempts,
+            "error": self.error,
+            "report_id": self.report_id,
+            "requested_by_id": self.requested_by_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
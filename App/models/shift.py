@@ -15,8 +15,11 @@ class Shift(db.Model):
     user = db.relationship("User", backref=db.backref("shifts", lazy=True))
 
     __table_args__ = (
+        # also serves (user_id, work_date) lookups through its leading columns
         db.UniqueConstraint("user_id", "work_date", "start_time", "end_time",
                             name="uq_user_shift_window"),
+        # roster order (work_date, start_time, id) without a sort step
+        db.Index("ix_shifts_date_start", "work_date", "start_time"),
     )
 
     def __repr__(self):
@@ -29,14 +32,29 @@ class Shift(db.Model):
         dt_end = datetime.combine(self.work_date, self.end_time)
         return max((dt_end - dt_start).total_seconds() / 3600.0, 0)
 
-    def get_json(self):
+    # Column projection of get_json(): read paths select json_columns() as
+    # plain tuples (joined to User) and build the dicts with row_json(),
+    # skipping instance hydration.
+    @classmethod
+    def json_columns(cls):
+        from .user import User
+        return (cls.id, cls.user_id, User.username, cls.work_date,
+                cls.start_time, cls.end_time, cls.role, cls.location)
+
+    @staticmethod
+    def row_json(row):
+        shift_id, user_id, username, work_date, start, end, role, location = row
         return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "username": self.user.username if self.user else None,
-            "date": self.work_date.isoformat(),
-            "start": self.start_time.strftime("%H:%M"),
-            "end": self.end_time.strftime("%H:%M"),
-            "role": self.role,
-            "location": self.location,
-        }
\ No newline at end of file
+            "id": shift_id,
+            "user_id": user_id,
+            "username": username,
+            "date": work_date.isoformat(),
+            "start": f"{start.hour:02d}:{start.minute:02d}",
+            "end": f"{end.hour:02d}:{end.minute:02d}",
+            "role": role,
+            "location": location,
+        }
+
+    def get_json(self):
+        return self.row_json((self.id, self.user_id, self.user.username if self.user else None,
+                              self.work_date, self.start_time, self.end_time, self.role, self.location))
@@ -1,5 +1,5 @@
-from werkzeug.security import check_password_hash, generate_password_hash
 from App.database import db
+from App.hashing import hash_password, verify_password
 from datetime import datetime, date, time
 
 class User(db.Model):
@@ -24,10 +24,10 @@ class User(db.Model):
         }
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)  # default pbkdf2:sha256
+        self.password = hash_password(password)  # werkzeug default, off-worker when pooled
     
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
 
     def is_authenticated_admin(self):
         return self.isAdmin
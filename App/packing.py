@@ -0,0 +1,71 @@
+"""Compact binary encoding for JSON report payloads.
+
+Weekly payloads are mostly a list of per-shift dicts that all repeat the
+same keys. ``pack`` rewrites every list of same-keyed dicts as
+``{COLUMNS: [keys...], VALUES: [[column]...]}`` (column-major, so runs of
+the same username/date/role sit next to each other), dumps compact JSON and
+compresses it. The first two bytes name the codec: ``z1`` for zlib (always
+available), ``s1`` for zstd (needs the optional ``zstandard`` package on
+every worker that reads the rows). ``unpack`` returns exactly what a JSON
+column would have returned for the same payload.
+"""
+import json
+import zlib
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
+
+COLUMNS = "\x00columns"
+VALUES = "\x00values"
+CODECS = ("zlib", "zstd")
+
+
+def _columnize(obj):
+    if isinstance(obj, dict):
+        return {k: _columnize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if len(obj) > 1 and all(isinstance(item, dict) for item in obj):
+            keys = list(obj[0])
+            # keyless dicts have no columns to carry the row count
+            if keys and all(list(item) == keys for item in obj):
+                return {COLUMNS: keys,
+                        VALUES: [[_columnize(item[k]) for item in obj] for k in keys]}
+        return [_columnize(item) for item in obj]
+    return obj
+
+
+def _rowize(obj):
+    if isinstance(obj, dict):
+        if COLUMNS in obj and len(obj) == 2:
+            keys, columns = obj[COLUMNS], [[_rowize(v) for v in col] for col in obj[VALUES]]
+            return [dict(zip(keys, row)) for row in zip(*columns)]
+        return {k: _rowize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_rowize(item) for item in obj]
+    return obj
+
+
+def pack(payload, codec="zlib") -> bytes:
+    raw = json.dumps(_columnize(payload), separators=(",", ":"), ensure_ascii=False).encode()
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("REPORT_PAYLOAD_CODEC=zstd requires the 'zstandard' package.")
+        return b"s1" + zstandard.ZstdCompressor(level=10).compress(raw)
+    if codec != "zlib":
+        raise ValueError(f"Unknown payload codec {codec!r}; use one of {', '.join(CODECS)}")
+    return b"z1" + zlib.compress(raw, 6)
+
+
+def unpack(blob: bytes):
+    tag, body = bytes(blob[:2]), bytes(blob[2:])
+    if tag == b"z1":
+        raw = zlib.decompress(body)
+    elif tag == b"s1":
+        if zstandard is None:
+            raise RuntimeError("This report was packed with zstd; install 'zstandard' to read it.")
+        raw = zstandard.ZstdDecompressor().decompress(body)
+    else:
+        raise ValueError("Unrecognised packed payload header")
+    return _rowize(json.loads(raw))
@@ -0,0 +1,52 @@
+"""JSON encoding for the read endpoints and CLI output.
+
+``dumps`` writes the same bytes as the stdlib ``json.dumps`` with the given
+options, using ``orjson`` when it is installed (optional; several times
+faster on large lists) and the stdlib otherwise. Documents orjson would
+encode differently -- non-ASCII text (the stdlib escapes it), non-string
+keys, types only ``default`` knows -- are re-encoded with the stdlib, so the
+choice of encoder never shows in the output. Read paths pair it with the
+models' ``json_columns()``/``row_json()`` projections, which build the
+``get_json()`` dicts from plain column tuples instead of ORM instances.
+"""
+import json
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None
+
+
+def dumps(obj, sort_keys=False, indent=False, default=None, ensure_ascii=True) -> bytes:
+    """json.dumps(obj, ...) as bytes: compact separators, or 2-space indent.
+    Exponent floats (1e+16) and NaN are written as the stdlib writes them
+    only on the stdlib path; the app's values never take those forms."""
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            out = orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            out = None
+        if out is not None and (not ensure_ascii or out.isascii()):
+            return out
+    return json.dumps(obj, sort_keys=sort_keys, default=default, ensure_ascii=ensure_ascii,
+                      indent=2 if indent else None,
+                      separators=None if indent else (",", ":")).encode()
+
+
+def json_response(obj):
+    """Drop-in for jsonify(obj): the same body, encoded with dumps."""
+    provider = current_app.json
+    if not isinstance(provider, DefaultJSONProvider):
+        return provider.response(obj)
+    indent = (provider.compact is None and current_app.debug) or provider.compact is False
+    body = dumps(obj, sort_keys=provider.sort_keys, indent=indent,
+                 default=provider.default, ensure_ascii=provider.ensure_ascii)
+    return current_app.response_class(body + b"\n", mimetype=provider.mimetype)
@@ -0,0 +1,231 @@
+import threading
+import pytest
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import event
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import Attendance
+from App.controllers import (
+    create_user,
+    schedule_bulk,
+    clock_in,
+    clock_out,
+    clock_coalescer,
+    get_daily_hours,
+    get_pending_approvals,
+    set_attendance_approval,
+)
+from App.tests.utils import QueryCounter
+
+
+DAY = date(2024, 3, 4)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def shifts():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db',
+                      'ATTENDANCE_COALESCE_MS': 20})
+    create_db()
+    users = [create_user(f"storm{i}", "pass") for i in range(20)]
+    created = schedule_bulk([{"user_id": u.id, "date": DAY, "start": "09:00", "end": "17:00"}
+                             for u in users])["created"]
+    yield [(s["user_id"], s["id"]) for s in created]
+    db.drop_all()
+
+
+def _concurrently(fn, items):
+    app = current_app._get_current_object()
+    errors = []
+
+    def run(item):
+        with app.app_context():
+            try:
+                fn(*item)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(item,)) for item in items]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def test_concurrent_clock_ins_share_a_commit(shifts):
+    before = clock_coalescer().batches
+    when = datetime(2024, 3, 4, 9, 0)
+    assert _concurrently(lambda u, s: clock_in(u, s, when=when), shifts) == []
+    assert clock_coalescer().batches - before < len(shifts)
+
+    att = clock_in(*shifts[0], when=datetime(2024, 3, 4, 9, 30))
+    assert att.time_in == when  # already clocked in: unchanged
+
+
+def test_coalesced_clock_out_updates_rollup(shifts):
+    when = datetime(2024, 3, 4, 16, 0)
+    assert _concurrently(lambda u, s: clock_out(u, s, when=when), shifts) == []
+    hours = get_daily_hours(DAY, DAY)
+    assert len(hours) == len(shifts)
+    assert all(h.worked_hours == 7.0 for h in hours)
+
+
+def test_coalesced_errors_reach_the_caller(shifts):
+    user_id, shift_id = shifts[0]
+    with pytest.raises(ValueError, match="not found"):
+        clock_in(user_id, shift_id + 1000)
+    # a failed item doesn't break the queue for later callers
+    assert clock_out(user_id, shift_id).time_out == datetime(2024, 3, 4, 16, 0)
+
+
+def test_coalescing_off_by_default(shifts):
+    current_app.config["ATTENDANCE_COALESCE_MS"] = 0
+    try:
+        assert clock_coalescer() is None
+    finally:
+        current_app.config["ATTENDANCE_COALESCE_MS"] = 20
+
+
+@pytest.fixture
+def uncoalesced():
+    current_app.config["ATTENDANCE_COALESCE_MS"] = 0
+    yield
+    current_app.config["ATTENDANCE_COALESCE_MS"] = 20
+
+
+def _missing_attendance_shift(user_id, day):
+    shift = schedule_bulk([{"user_id": user_id, "date": day, "start": "09:00", "end": "17:00"}])["created"][0]
+    Attendance.query.filter_by(shift_id=shift["id"]).delete()
+    db.session.commit()
+    return shift["id"]
+
+
+def test_clock_in_is_one_statement_and_idempotent(shifts, uncoalesced):
+    user_id, _ = shifts[1]
+    first = datetime(2024, 3, 4, 9, 0)
+    shift_id = _missing_attendance_shift(user_id, date(2024, 3, 5))
+
+    with QueryCounter() as counter:
+        att = clock_in(user_id, shift_id, when=first)
+    assert counter.count == 1  # upsert creates the missing row
+    assert att.time_in == first
+
+    assert clock_in(user_id, shift_id, when=datetime(2024, 3, 5, 9, 5)).time_in == first
+    with pytest.raises(ValueError, match="Shift not found"):
+        clock_in(shifts[2][0], shift_id)
+
+
+def test_clock_out_is_conditional(shifts, uncoalesced):
+    user_id, _ = shifts[3]
+    shift_id = _missing_attendance_shift(user_id, date(2024, 3, 6))
+    with pytest.raises(ValueError, match="not found"):
+        clock_out(user_id, shift_id)
+    clock_in(user_id, shift_id, when=datetime(2024, 3, 6, 9, 0))
+    out = datetime(2024, 3, 6, 17, 0)
+    assert clock_out(user_id, shift_id, when=out).time_out == out
+    assert clock_out(user_id, shift_id, when=datetime(2024, 3, 6, 18, 0)).time_out == out
+    assert get_daily_hours(date(2024, 3, 6), date(2024, 3, 6), user_id=user_id)[0].worked_hours == 8.0
+
+
+def test_clock_writes_touch_no_shared_counter_row(shifts, uncoalesced):
+    user_id, _ = shifts[5]
+    shift_id = _missing_attendance_shift(user_id, date(2024, 3, 8))
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        clock_in(user_id, shift_id, when=datetime(2024, 3, 8, 9, 0))
+        clock_out(user_id, shift_id, when=datetime(2024, 3, 8, 17, 0))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert statements and not any("data_versions" in s for s in statements)
+
+
+def test_coalesced_clock_in_creates_missing_row(shifts):
+    user_id, _ = shifts[4]
+    shift_id = _missing_attendance_shift(user_id, date(2024, 3, 7))
+    assert clock_in(user_id, shift_id, when=datetime(2024, 3, 7, 9, 0)).shift_id == shift_id
+
+
+@pytest.fixture(scope="module")
+def approval_week(shifts):
+    """Two worked days (Mar 11-12) for the first five users, at two locations."""
+    current_app.config["ATTENDANCE_COALESCE_MS"] = 0
+    rows = [{"user_id": u, "date": date(2024, 3, day), "start": "09:00", "end": "17:00",
+             "location": "front" if i % 2 else "back"}
+            for i, (u, _) in enumerate(shifts[:5]) for day in (11, 12)]
+    created = schedule_bulk(rows)["created"]
+    for s in created:
+        clock_in(s["user_id"], s["id"], when=datetime.fromisoformat(f"{s['date']}T09:00"))
+        clock_out(s["user_id"], s["id"], when=datetime.fromisoformat(f"{s['date']}T15:00"))
+    current_app.config["ATTENDANCE_COALESCE_MS"] = 20
+    return created
+
+
+def _approved_hours(day):
+    return sum(h.approved_hours for h in get_daily_hours(day, day))
+
+
+def test_bulk_approval_is_one_update(shifts, approval_week):
+    with QueryCounter() as counter:
+        result = set_attendance_approval(True, start_date=date(2024, 3, 11), end_date=date(2024, 3, 11),
+                                         location="front")
+    ids = {a.id for a in Attendance.query.filter(
+        Attendance.shift_id.in_([s["id"] for s in approval_week
+                                 if s["date"] == "2024-03-11" and s["location"] == "front"]))}
+    assert result == {"approved": True, "count": 2, "ids": sorted(ids)}
+    # one UPDATE .. RETURNING; the rest is per-call rollup and report bookkeeping
+    assert counter.count <= 8
+    assert _approved_hours(date(2024, 3, 11)) == 12.0
+    assert set_attendance_approval(True, start_date=date(2024, 3, 11), end_date=date(2024, 3, 11),
+                                   location="front")["count"] == 0
+
+    everyone = set_attendance_approval(True, user_ids=[u for u, _ in shifts[:5]],
+                                       start_date=date(2024, 3, 11), end_date=date(2024, 3, 12))
+    assert everyone["count"] == 8
+    assert _approved_hours(date(2024, 3, 12)) == 30.0
+
+
+def test_bulk_unapprove_by_pairs(shifts, approval_week):
+    pairs = [(s["user_id"], s["id"]) for s in approval_week[:3]] + [(shifts[9][0], approval_week[0]["id"])]
+    result = set_attendance_approval(False, pairs=pairs)
+    assert result["count"] == 3  # the mismatched pair matches nothing
+    assert all(not a.approved for a in Attendance.query.filter(Attendance.id.in_(result["ids"])))
+    assert set_attendance_approval(False, pairs=[])["count"] == 0
+    with pytest.raises(ValueError, match="Provide"):
+        set_attendance_approval(True, location="front")
+
+
+def test_bulk_approval_api(shifts, approval_week):
+    create_user("boss", "bosspass", isAdmin=True)
+    client = current_app.test_client()
+    token = client.post('/api/login', json={"username": "boss", "password": "bosspass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = approval_week[0]
+    res = client.post('/api/attendance/approve/bulk', headers=headers,
+                      json={"pairs": [{"user_id": first["user_id"], "shift_id": first["id"]}]})
+    assert res.status_code == 200 and res.json["count"] == 1
+    res = client.post('/api/attendance/unapprove/bulk', headers=headers,
+                      json={"start_date": "2024-03-11", "end_date": "2024-03-12"})
+    assert res.json["count"] == 8 and not res.json["approved"]
+    assert _approved_hours(date(2024, 3, 11)) == 0.0
+    assert client.post('/api/attendance/approve/bulk', headers=headers, json={}).status_code == 400
+    assert client.post('/api/attendance/approve/bulk', headers=headers,
+                       json={"pairs": [{"user_id": 1}]}).status_code == 400
+
+    token = client.post('/api/login', json={"username": "storm0", "password": "pass"}).json["access_token"]
+    assert client.post('/api/attendance/approve/bulk', json={"user_ids": [1]},
+                       headers={"Authorization": f"Bearer {token}"}).status_code == 403
+
+
+def test_null_approval_counts_as_pending(shifts, approval_week):
+    day = [s["id"] for s in approval_week if s["date"] == "2024-03-12"]
+    db.session.execute(db.update(Attendance).where(Attendance.shift_id.in_(day)).values(approved=None))
+    db.session.commit()
+    pending = {a.id for a in get_pending_approvals() if a.shift_id in day}
+    assert len(pending) == len(day)
+    result = set_attendance_approval(True, start_date=date(2024, 3, 12), end_date=date(2024, 3, 12))
+    assert set(result["ids"]) == pending
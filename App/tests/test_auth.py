@@ -0,0 +1,72 @@
+import pytest
+from flask import current_app
+from flask_jwt_extended import create_access_token
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import User
+from App.controllers import create_user, update_user, login, load_user_identity
+from App.hashing import shutdown_pool
+from App.tests.utils import QueryCounter
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    create_user("dana", "danapass", isAdmin=True)
+    yield app.test_client()
+    db.drop_all()
+
+
+@pytest.fixture
+def headers(client):
+    # by id, since tests below rename dana
+    return {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+
+
+def _identify(client, headers):
+    # each request in its own app context, as in production, so the
+    # per-request memo on g starts empty
+    with client.application.app_context():
+        return client.get('/api/identify', headers=headers)
+
+
+def test_identity_is_loaded_once_per_request(client, headers):
+    with QueryCounter() as queries:
+        res = _identify(client, headers)
+    assert res.json["message"] == "username: dana, id : 1"
+    assert queries.count == 1
+    with client.application.app_context(), QueryCounter() as queries:
+        assert load_user_identity(1) is load_user_identity(1)
+    assert queries.count == 1
+
+
+def test_update_user_invalidates_identity(client, headers):
+    _identify(client, headers)
+    update_user(1, "dana2")
+    res = _identify(client, headers)
+    assert res.json["message"] == "username: dana2, id : 1"
+
+
+def test_edit_from_another_worker_applies_on_next_request(client, headers):
+    with client.application.app_context():
+        assert load_user_identity(1).isAdmin
+    # another worker demotes the user; nothing here is told about it
+    db.session.execute(db.update(User).where(User.id == 1).values(username="dana3", isAdmin=False))
+    db.session.commit()
+    res = _identify(client, headers)
+    assert res.json["message"] == "username: dana3, id : 1"
+    with client.application.app_context():
+        assert not load_user_identity(1).isAdmin
+
+
+def test_pooled_hashing_keeps_login_api():
+    current_app.config["PASSWORD_POOL_SIZE"] = 1
+    try:
+        create_user("erin", "erinpass")
+        assert login("erin", "erinpass") is not None
+        assert login("erin", "wrong") is None
+    finally:
+        current_app.config["PASSWORD_POOL_SIZE"] = 0
+        shutdown_pool()
@@ -0,0 +1,32 @@
+import pytest
+from datetime import date
+
+from App.main import create_app
+from App.database import db, create_db
+from App import bench
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+def test_seed_generates_users_shifts_and_attendance():
+    counts = bench.seed(users=5, weeks=2, start=date(2024, 1, 1))
+    assert counts["users"] == 5
+    assert counts["shifts"] == 5 * 2 * 5
+    assert 0 < counts["attendance_clocked"] <= counts["shifts"]
+    # re-seeding reuses the same synthetic users
+    assert bench.seed(users=5, weeks=1, start=date(2024, 1, 1))["users"] == 0
+
+
+def test_run_reports_latency_queries_and_memory():
+    result = bench.run(repeat=2, range_weeks=[1])
+    assert result["dataset"]["shifts"] >= 50
+    weekly = result["results"]["weekly_report"]
+    assert set(weekly) == {"runs", "p50_ms", "p95_ms", "queries", "peak_kib"}
+    assert weekly["queries"] == 1
+    assert "schedule_week" in result["results"]
@@ -0,0 +1,221 @@
+import time
+import pytest
+from datetime import date, datetime, timedelta, time as dtime
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import Attendance, Report, ReportJob
+from App.tests.utils import QueryCounter
+from App.controllers import (
+    create_user,
+    schedule_shift,
+    enqueue_report_job,
+    get_report_job,
+    run_pending_jobs,
+    recover_stale_jobs,
+    job_runner,
+    stop_job_runner,
+    get_report_by_id,
+    clock_in,
+    clock_out,
+    approve_attendance,
+    schedule_closed_reports,
+    stale_periods,
+    closed_periods,
+    in_off_peak,
+    attendance_fingerprint,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db',
+                      'REPORT_JOB_WORKERS': 0})
+    create_db()
+    user = create_user("jo", "jopass")
+    schedule_shift(user.id, date(2024, 1, 2), dtime(9, 0), dtime(17, 0))
+    yield app.test_client()
+    db.drop_all()
+
+
+@pytest.fixture
+def headers(client):
+    token = client.post('/api/login', json={"username": "jo", "password": "jopass"}).json["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_generate_returns_job_and_worker_writes_report(client, headers):
+    res = client.post('/reports/generate', json={"start_date": "2024-01-01"}, headers=headers)
+    assert res.status_code == 202
+    job_id = res.json["job"]["id"]
+    assert client.get(f'/reports/jobs/{job_id}', headers=headers).json["status"] == "queued"
+
+    assert run_pending_jobs() == 1
+    job = client.get(f'/reports/jobs/{job_id}', headers=headers).json
+    assert (job["status"], job["progress"], job["attempts"]) == ("done", 100, 1)
+    report = client.get(f'/api/reports/{job["report_id"]}', headers=headers).json
+    assert (report["period_start"], report["period_end"]) == ("2024-01-01", "2024-01-07")
+    assert report["payload"]["shifts"][0]["scheduled_hours"] == 8.0
+
+
+def test_period_job_and_validation(client, headers):
+    res = client.post('/api/reports/period', headers=headers,
+                      json={"start_date": "2024-01-01", "end_date": "2024-01-31", "bucket": "month"})
+    assert res.status_code == 202
+    run_pending_jobs()
+    job = get_report_job(res.json["job"]["id"])
+    assert job.status == ReportJob.DONE
+    assert get_report_by_id(job.report_id).report_type == "by_month"
+    assert client.post('/api/reports/period', headers=headers,
+                       json={"start_date": "2024-01-01", "end_date": "2024-01-31", "bucket": "year"}).status_code == 400
+    assert client.get('/reports/jobs/999', headers=headers).status_code == 404
+
+
+def test_weekly_job_rejects_other_end_dates(client, headers):
+    res = client.post('/reports/generate', headers=headers,
+                      json={"start_date": "2024-01-01", "end_date": "2024-01-31"})
+    assert res.status_code == 400
+    assert "period report" in res.json["error"]
+    res = client.post('/reports/generate', headers=headers,
+                      json={"start_date": "2024-01-01", "end_date": "2024-01-07"})
+    assert res.status_code == 202
+    run_pending_jobs()
+
+
+def test_stale_running_jobs_are_requeued_then_failed(client):
+    current_app.config["REPORT_JOB_MAX_ATTEMPTS"] = 2
+    job = enqueue_report_job("weekly", date(2024, 1, 8))
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    for attempts, expected in ((1, ReportJob.QUEUED), (2, ReportJob.FAILED)):
+        job.status, job.attempts, job.heartbeat_at = ReportJob.RUNNING, attempts, long_ago
+        db.session.commit()
+        assert recover_stale_jobs() == 1
+        db.session.refresh(job)
+        assert job.status == expected
+    assert "Worker stopped" in job.error
+    assert recover_stale_jobs() == 0
+
+
+def test_long_job_heartbeats_while_it_runs(client, monkeypatch):
+    from App.controllers import jobs
+    current_app.config["REPORT_JOB_STALE_SECONDS"] = 0.3
+    requeued = []
+    build = jobs.generate_weekly_report
+
+    def slow_report(*args, **kwargs):
+        time.sleep(0.6)
+        requeued.append(recover_stale_jobs())
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "generate_weekly_report", slow_report)
+    try:
+        job = enqueue_report_job("weekly", date(2024, 1, 22))
+        assert run_pending_jobs() == 1
+    finally:
+        current_app.config.pop("REPORT_JOB_STALE_SECONDS")
+    assert requeued == [0]
+    db.session.expire_all()
+    job = get_report_job(job.id)
+    assert (job.status, job.attempts) == (ReportJob.DONE, 1)
+
+
+def test_superseded_runner_does_not_overwrite_job(client, monkeypatch):
+    from App.controllers import jobs
+    job = enqueue_report_job("weekly", date(2024, 1, 29))
+    owner = jobs._claim(job.id)
+    assert owner and jobs._claim(job.id) is None
+    build = jobs.generate_weekly_report
+
+    def taken_over(*args, **kwargs):
+        # the job went stale and another worker re-claimed it meanwhile
+        db.session.execute(db.update(ReportJob).where(ReportJob.id == job.id)
+                           .values(claimed_by="other-worker", attempts=2))
+        db.session.commit()
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "generate_weekly_report", taken_over)
+    jobs._run_claimed(job.id, owner)
+    db.session.expire_all()
+    job = get_report_job(job.id)
+    assert (job.status, job.claimed_by, job.report_id) == (ReportJob.RUNNING, "other-worker", None)
+    job.status = ReportJob.DONE
+    db.session.commit()
+
+
+def test_background_runner_picks_up_jobs(client):
+    current_app.config.update(REPORT_JOB_WORKERS=1, REPORT_JOB_POLL=0.05)
+    try:
+        job = enqueue_report_job("weekly", date(2024, 1, 15))
+        assert job_runner().alive()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            if get_report_job(job.id).status == ReportJob.DONE:
+                break
+            time.sleep(0.05)
+        assert get_report_job(job.id).status == ReportJob.DONE
+    finally:
+        current_app.config["REPORT_JOB_WORKERS"] = 0
+        stop_job_runner()
+
+
+def test_scheduler_queues_missing_and_stale_closed_periods(client):
+    current_app.config.update(REPORT_SCHEDULE_WEEKS=2, REPORT_SCHEDULE_MONTHS=1)
+    today = date(2025, 3, 5)  # closed: weeks of Feb 17 and Feb 24, February
+    shift = schedule_shift(1, date(2025, 2, 25), dtime(9, 0), dtime(17, 0))
+
+    assert len(schedule_closed_reports(today)) == 3
+    assert schedule_closed_reports(today) == []  # already queued
+    assert run_pending_jobs() == 3
+    assert schedule_closed_reports(today) == []  # nothing changed since
+
+    # a clock-in alone (no hours yet) already changes what the reports show
+    clock_in(1, shift.id, when=datetime(2025, 2, 25, 9, 0))
+    assert [(p[0], p[1]) for p in stale_periods(closed_periods(today))] == [
+        ("weekly", date(2025, 2, 24)), ("period", date(2025, 2, 1))]
+    clock_out(1, shift.id, when=datetime(2025, 2, 25, 17, 0))
+    assert len(stale_periods(closed_periods(today))) == 2
+
+    # a late approval re-queues the stored reports covering that day
+    approve_attendance(1, shift.id)
+    queued = ReportJob.query.filter_by(status=ReportJob.QUEUED).all()
+    assert sorted((j.kind, j.params["start_date"]) for j in queued) == [
+        ("period", "2025-02-01"), ("weekly", "2025-02-24")]
+    run_pending_jobs()
+    assert schedule_closed_reports(today) == []
+    month = Report.query.filter_by(report_type="by_month", period_start=date(2025, 2, 1)).one()
+    assert month.payload["totals"]["approved_hours"] == 8.0
+
+
+def test_off_peak_window():
+    current_app.config["REPORT_OFF_PEAK_HOURS"] = "22-4"
+    assert in_off_peak(datetime(2025, 1, 1, 23, 0)) and in_off_peak(datetime(2025, 1, 1, 3, 59))
+    assert not in_off_peak(datetime(2025, 1, 1, 12, 0))
+    current_app.config["REPORT_OFF_PEAK_HOURS"] = "1-5"
+    assert in_off_peak(datetime(2025, 1, 1, 1, 0)) and not in_off_peak(datetime(2025, 1, 1, 5, 0))
+
+
+def test_attendance_fingerprint_is_one_aggregate_query(client):
+    shift = schedule_shift(1, date(2025, 4, 8), dtime(9, 0), dtime(17, 0))
+    span = (date(2025, 4, 7), date(2025, 4, 13))
+    seen = []
+    def token():
+        with QueryCounter() as queries:
+            seen.append(attendance_fingerprint(*span))
+        assert queries.count == 1
+
+    token()
+    clock_in(1, shift.id, when=datetime(2025, 4, 8, 9, 0))
+    token()
+    clock_out(1, shift.id, when=datetime(2025, 4, 8, 17, 0))
+    token()
+    att = Attendance.query.filter_by(shift_id=shift.id).one()
+    att.time_out = datetime(2025, 4, 8, 16, 59, 59, 500000)  # a sub-second correction
+    db.session.commit()
+    token()
+    approve_attendance(1, shift.id)
+    token()
+    assert len(set(seen)) == len(seen)
+    token()
+    assert seen[-1] == seen[-2]
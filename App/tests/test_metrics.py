@@ -0,0 +1,69 @@
+import json
+import os
+import re
+import pytest
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.controllers import create_user
+from App import metrics
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    create_user("mia", "miapass")
+    yield app.test_client()
+    db.drop_all()
+
+
+def _sample(text, name, **labels):
+    for line in text.splitlines():
+        if not line.startswith(name + "{"):
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', line[len(name):line.rindex("}")]))
+        if all(found.get(k) == v for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_records_latency_and_sql_per_endpoint(client):
+    token = client.post('/api/login', json={"username": "mia", "password": "miapass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    metrics.reset()
+    client.get('/health')
+    client.get('/api/users', headers=headers)
+    client.get('/api/users', headers=headers)
+    text = client.get('/metrics').get_data(as_text=True)
+
+    users = dict(blueprint="user_views", endpoint="user_views.get_users_action")
+    assert _sample(text, "shiftmate_http_requests_total", status="200", **users) == 2
+    assert _sample(text, "shiftmate_http_request_duration_seconds_count", **users) == 2
+    assert _sample(text, "shiftmate_http_request_duration_seconds_bucket", le="+Inf", **users) == 2
+    assert _sample(text, "shiftmate_db_statements_total", **users) >= 2
+    assert _sample(text, "shiftmate_db_duration_seconds_total", **users) > 0
+    assert _sample(text, "shiftmate_db_statements_total", endpoint="index_views.health_check") == 0
+
+
+def test_metrics_sums_worker_files(client, tmp_path):
+    metrics.reset()
+    current_app.config["METRICS_DIR"] = str(tmp_path)
+    try:
+        client.get('/health')
+        other = {
+            "latency": [[["index_views", "index_views.health_check", "GET"],
+                         [3] + [0] * len(metrics.BUCKETS) + [0.003]]],
+            "requests": [[["index_views", "index_views.health_check", "GET", "200"], 3]],
+            "db": [[["index_views", "index_views.health_check"], [0, 0.0]]],
+        }
+        (tmp_path / "worker-1.json").write_text(json.dumps(other))
+        text = client.get('/metrics').get_data(as_text=True)
+        assert os.path.exists(tmp_path / f"worker-{os.getpid()}.json")
+    finally:
+        current_app.config["METRICS_DIR"] = None
+
+    health = dict(endpoint="index_views.health_check", method="GET")
+    assert _sample(text, "shiftmate_http_requests_total", status="200", **health) == 4
+    assert _sample(text, "shiftmate_http_request_duration_seconds_bucket", le="0.005", **health) >= 3
@@ -0,0 +1,100 @@
+import os
+import pytest
+from flask_migrate import stamp, upgrade
+
+from App.main import create_app
+from App.database import db, create_db, get_migrate
+from App.models import Report
+
+'''
+    Migration tests
+    `flask db upgrade` must bring a database created before a column was
+    added up to the current models, and be a no-op on a fresh one.
+'''
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "migrations")
+
+
+@pytest.fixture(autouse=True, scope="module")
+def app():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    get_migrate(app)
+    create_db()
+    yield app
+    db.drop_all()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+
+
+def _columns(table):
+    return {c["name"] for c in db.inspect(db.engine).get_columns(table)}
+
+
+def _drop_column(table, column):
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+
+def test_upgrade_is_a_no_op_on_a_fresh_database():
+    before = _columns("reports")
+    upgrade(directory=MIGRATIONS)
+    assert _columns("reports") == before
+
+
+@pytest.mark.parametrize("column", ["payload_packed", "source_token"])
+def test_upgrade_adds_missing_report_columns(column):
+    stamp(directory=MIGRATIONS, revision="base")  # a database from before the migration
+    _drop_column("reports", column)
+    assert column not in _columns("reports")
+    upgrade(directory=MIGRATIONS)
+    assert column in _columns("reports")
+    assert Report.query.count() == 0
+
+
+def test_upgrade_rebuilds_pending_approval_index():
+    stamp(directory=MIGRATIONS, revision="f9fa3b98cae9")
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_attendance_pending_approval")
+        conn.exec_driver_sql("CREATE INDEX ix_attendance_pending_approval ON attendance (user_id) "
+                             "WHERE approved = 0 AND time_out IS NOT NULL")
+    upgrade(directory=MIGRATIONS)
+    with db.engine.connect() as conn:
+        sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master "
+                                   "WHERE name = 'ix_attendance_pending_approval'").scalar()
+    assert "coalesce(approved, 0) = 0" in sql
+
+
+def _indexes(table):
+    return {ix["name"] for ix in db.inspect(db.engine).get_indexes(table)}
+
+
+@pytest.mark.parametrize("table, index", [
+    ("shifts", "ix_shifts_date_start"),
+    ("attendance", "ix_attendance_clocked_in"),
+    ("reports", "ix_reports_created"),
+])
+def test_upgrade_adds_missing_query_indexes(table, index):
+    stamp(directory=MIGRATIONS, revision="7934dc91c51a")
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    upgrade(directory=MIGRATIONS)
+    assert index in _indexes(table)
+
+
+@pytest.mark.parametrize("table, before", [
+    ("daily_hours", "63c12ad4a0c7"),
+    ("data_versions", "87f80f82b23b"),
+    ("report_jobs", "b887a353d556"),
+])
+def test_upgrade_creates_missing_tables(table, before):
+    stamp(directory=MIGRATIONS, revision=before)
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {table}")
+    upgrade(directory=MIGRATIONS)
+    model = db.metadata.tables[table]
+    assert _columns(table) == {c.name for c in model.columns}
+    assert _indexes(table) == {ix.name for ix in model.indexes}
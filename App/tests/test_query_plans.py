@@ -0,0 +1,119 @@
+import re
+import pytest
+from datetime import date, datetime, time as dtime
+from sqlalchemy import event
+
+from App.main import create_app
+from App.database import db, create_db
+from App.controllers import (
+    create_user,
+    schedule_shift,
+    schedule_bulk,
+    get_roster,
+    get_roster_page,
+    weekly_report,
+    get_shift_summary,
+    get_daily_hours,
+    clock_in,
+    clock_out,
+    approve_attendance,
+    get_pending_approvals,
+    get_clocked_in,
+    get_attendance_for_user,
+    get_attendance_for_shift,
+    generate_weekly_report,
+    list_reports,
+    period_report,
+    check_shift_conflicts,
+    coverage_timeline,
+    set_attendance_approval,
+    report_source_token,
+)
+
+'''
+    Query plan regression tests
+    Every SELECT/INSERT/UPDATE/DELETE a controller sends is re-run under
+    EXPLAIN QUERY PLAN; a bare "SCAN <table>" means no index was usable.
+'''
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+WEEK = (date(2024, 1, 1), date(2024, 1, 7))
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    users = [create_user(f"plan{i}", "pass") for i in range(4)]
+    for day in range(1, 15):
+        for u in users:
+            schedule_shift(u.id, date(2024, 1, day), dtime(9, 0), dtime(17, 0), role="floor", location="front")
+    clock_in(1, 1, when=datetime(2024, 1, 1, 9, 0))
+    clock_out(1, 1, when=datetime(2024, 1, 1, 17, 0))
+    for week in range(2):
+        generate_weekly_report(date(2024, 1, 1 + 7 * week), date(2024, 1, 7 + 7 * week))
+    clock_in(2, 2, when=datetime(2024, 1, 1, 9, 0))
+    yield app.test_client()
+    db.drop_all()
+
+
+def _capture(fn):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    db.session.expunge_all()
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    return statements
+
+
+def _plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [r[-1] for r in rows]
+
+
+CASES = {
+    "roster": lambda c: get_roster(*WEEK),
+    "roster_page": lambda c: get_roster_page(
+        *WEEK, limit=5, after=get_roster_page(*WEEK, limit=5)["next_cursor"]),
+    "weekly_report": lambda c: weekly_report(WEEK[0]),
+    "summary_by_day": lambda c: get_shift_summary(*WEEK, group_by="day"),
+    "summary_for_user": lambda c: get_shift_summary(user_id=2, group_by="user"),
+    "daily_hours": lambda c: get_daily_hours(*WEEK, user_id=1),
+    "user_shifts_view": lambda c: c.get('/api/users/3/shifts?start_date=2024-01-02&end_date=2024-01-05'),
+    "bulk_existing_windows": lambda c: schedule_bulk(
+        [{"user_id": 3, "date": "2024-01-03", "start": "09:00", "end": "17:00"}]),
+    "shift_conflicts": lambda c: check_shift_conflicts(3, date(2024, 1, 4), dtime(18, 0), dtime(20, 0)),
+    "coverage": lambda c: coverage_timeline(*WEEK, actual=True),
+    "clock_in": lambda c: clock_in(3, 3),
+    "clock_in_again": lambda c: clock_in(3, 3),
+    "clock_out": lambda c: clock_out(3, 3),
+    "approve": lambda c: approve_attendance(1, 1),
+    "bulk_approve_range": lambda c: set_attendance_approval(True, start_date=WEEK[0], end_date=WEEK[1],
+                                                            location="front"),
+    "bulk_approve_users": lambda c: set_attendance_approval(True, user_ids=[2, 3]),
+    "bulk_unapprove_pairs": lambda c: set_attendance_approval(False, pairs=[(1, 1), (2, 2)]),
+    "pending_approvals": lambda c: get_pending_approvals(),
+    "clocked_in": lambda c: get_clocked_in(),
+    "attendance_for_user": lambda c: get_attendance_for_user(1),
+    "attendance_for_shift": lambda c: get_attendance_for_shift(1),
+    "report_source_token": lambda c: report_source_token(*WEEK),
+    "period_report": lambda c: period_report(WEEK[0], date(2024, 1, 14), "week"),
+    "report_index": lambda c: list_reports(limit=1, after=list_reports(limit=1)["next_cursor"]),
+}
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_controller_queries_use_indexes(case, client):
+    statements = _capture(lambda: CASES[case](client))
+    assert statements, f"{case} issued no queries"
+    for statement, parameters in statements:
+        plan = _plan(statement, parameters)
+        scans = [line for line in plan if FULL_SCAN.match(line)]
+        assert not scans, f"{case}: full scan in\n{statement}\n" + "\n".join(plan)
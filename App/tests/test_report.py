@@ -0,0 +1,295 @@
+import csv
+import io
+import json
+import pytest
+from datetime import date, datetime, timedelta, time as dtime
+from sqlalchemy import event
+
+from App.main import create_app
+from App.database import db, create_db
+from App.controllers import (
+    create_user,
+    schedule_shift,
+    clock_in,
+    clock_out,
+    approve_attendance,
+    weekly_report,
+    get_daily_hours,
+    get_hours_totals,
+    rebuild_daily_hours,
+    stream_export,
+    generate_weekly_report,
+    list_reports,
+    get_report_by_id,
+    pack_report_payloads,
+    period_report,
+    generate_period_report,
+    compute_payroll,
+)
+from App.models import Report
+from App.controllers import payroll
+from App.packing import pack, unpack
+from App.tests.utils import QueryCounter
+
+
+WEEK = date(2024, 1, 1)  # Monday
+
+
+@pytest.fixture(autouse=True, scope="module")
+def seeded_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    alice = create_user("alice", "alicepass")
+    carl = create_user("carl", "carlpass")
+    for offset in range(5):
+        day = date(2024, 1, 1 + offset)
+        schedule_shift(alice.id, day, dtime(9, 0), dtime(17, 0), role="cashier", location="front")
+        schedule_shift(carl.id, day, dtime(12, 0), dtime(16, 30), role="stock", location="back")
+    schedule_shift(alice.id, date(2024, 1, 8), dtime(9, 0), dtime(17, 0))
+    clock_in(alice.id, 1, when=datetime(2024, 1, 1, 9, 0))
+    clock_out(alice.id, 1, when=datetime(2024, 1, 1, 16, 45))
+    yield app.test_client()
+    db.drop_all()
+
+
+def test_weekly_report_totals():
+    report = weekly_report(WEEK)
+    assert report['week_start'] == "2024-01-01"
+    assert report['week_end'] == "2024-01-07"
+    assert len(report['shifts']) == 10
+    assert report['totals_per_user'][1] == {
+        'username': "alice", 'scheduled_hours': 40.0, 'worked_hours': 7.75
+    }
+    assert report['totals_per_user'][2] == {
+        'username': "carl", 'scheduled_hours': 22.5, 'worked_hours': 0.0
+    }
+
+
+def test_weekly_report_shift_rows():
+    first = weekly_report(WEEK)['shifts'][0]
+    assert first == {
+        'id': 1, 'user_id': 1, 'username': "alice", 'date': "2024-01-01",
+        'start': "09:00", 'end': "17:00", 'role': "cashier", 'location': "front",
+        'scheduled_hours': 8.0, 'worked_hours': 7.75,
+        'time_in': "2024-01-01T09:00:00", 'time_out': "2024-01-01T16:45:00",
+    }
+
+
+def test_weekly_report_query_count_is_constant():
+    db.session.expunge_all()
+    with QueryCounter() as queries:
+        weekly_report(WEEK)
+    assert queries.count == 1
+
+
+def _rollup_snapshot():
+    return [r.get_json() for r in get_daily_hours()]
+
+
+def test_rollup_tracks_clock_and_approval():
+    day = get_daily_hours(date(2024, 1, 1), date(2024, 1, 1), user_id=1)[0]
+    assert (day.scheduled_hours, day.worked_hours, day.approved_hours) == (8.0, 7.75, 0.0)
+
+    approve_attendance(1, 1)
+    day = get_daily_hours(date(2024, 1, 1), date(2024, 1, 1), user_id=1)[0]
+    assert day.approved_hours == 7.75
+
+    totals = get_hours_totals(date(2024, 1, 1), date(2024, 1, 7))
+    assert totals == {'scheduled_hours': 62.5, 'worked_hours': 7.75,
+                      'approved_hours': 7.75, 'unique_users': 2}
+
+
+def test_rebuild_rollups_matches_incremental():
+    incremental = _rollup_snapshot()
+    assert rebuild_daily_hours() == len(incremental)
+    assert _rollup_snapshot() == incremental
+
+
+def test_export_streams_csv_and_ndjson(seeded_db):
+    token = seeded_db.post('/api/login', json={"username": "alice", "password": "alicepass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    res = seeded_db.get('/reports/export?start_date=2024-01-01&end_date=2024-01-08', headers=headers)
+    assert res.status_code == 200 and res.is_streamed
+    lines = res.get_data(as_text=True).splitlines()
+    assert lines[0].startswith("shift_id,user_id,username,work_date")
+    assert len(lines) == 1 + 11
+    assert lines[1].split(",")[-4:] == ["2024-01-01T09:00:00", "2024-01-01T16:45:00", "True", "7.75"]
+
+    res = seeded_db.get('/reports/export?start_date=2024-01-01&end_date=2024-01-07&format=ndjson&user_id=2',
+                        headers=headers)
+    rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert len(rows) == 5 and {r["username"] for r in rows} == {"carl"}
+    assert rows[0]["scheduled_hours"] == 4.5 and rows[0]["time_in"] is None
+
+    assert seeded_db.get('/reports/export?start_date=2024-01-01&end_date=2024-01-07&format=xml',
+                         headers=headers).status_code == 400
+
+
+def test_export_chunks_rows(seeded_db):
+    chunks = list(stream_export(date(2024, 1, 1), date(2024, 1, 7), "ndjson", chunk=4))
+    assert [c.count("\n") for c in chunks] == [4, 4, 2]
+
+
+def test_report_index_defers_payload_and_paginates(seeded_db):
+    for week in range(3):
+        start = date(2024, 1, 1) + timedelta(weeks=week)
+        generate_weekly_report(start, start + timedelta(days=6))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        first = list_reports(limit=2)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert len(statements) == 1
+    assert "payload" not in statements[0]
+    assert [r["period_start"] for r in first["reports"]] == ["2024-01-15", "2024-01-08"]
+    assert "payload" not in first["reports"][0]
+
+    rest = list_reports(limit=2, after=first["next_cursor"])
+    assert [r["period_start"] for r in rest["reports"]] == ["2024-01-01"]
+    assert rest["next_cursor"] is None
+    with pytest.raises(ValueError):
+        list_reports(after="garbage")
+
+    token = seeded_db.post('/api/login', json={"username": "alice", "password": "alicepass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    res = seeded_db.get(f'/api/reports/{first["reports"][0]["id"]}', headers=headers)
+    assert res.json["payload"]["week_start"] == "2024-01-15"
+    assert seeded_db.get('/api/reports?after=garbage', headers=headers).status_code == 400
+
+
+def test_report_payload_is_packed_and_transparent(seeded_db):
+    rpt = generate_weekly_report(WEEK, WEEK + timedelta(days=6))
+    expected = json.loads(json.dumps(weekly_report(WEEK)))
+    assert rpt.payload_packed[:2] == b"z1"
+    assert len(rpt.payload_packed) < len(json.dumps(expected)) / 2
+    db.session.expire_all()
+    assert get_report_by_id(rpt.id).get_json()["payload"] == expected
+    assert unpack(pack(expected, "zlib")) == expected
+
+
+@pytest.mark.parametrize("payload", [
+    {"a": [{}, {}]},
+    {"a": [{"x": 1}, {"y": 2}], "b": [[{"k": None}, {"k": [{}, {}, {}]}]], "c": []},
+])
+def test_pack_round_trips_edge_shapes(payload):
+    assert unpack(pack(payload)) == payload
+
+
+def test_pack_report_payloads_converts_legacy_rows(seeded_db):
+    legacy = Report(report_type="legacy", period_start=WEEK, period_end=WEEK)
+    legacy.payload_json = {"shifts": [{"id": 1, "date": "2024-01-01"}, {"id": 2, "date": "2024-01-02"}]}
+    db.session.add(legacy)
+    db.session.commit()
+    assert get_report_by_id(legacy.id).payload_packed is None
+
+    assert pack_report_payloads() == 1
+    db.session.expire_all()
+    rpt = get_report_by_id(legacy.id)
+    assert rpt.payload_packed is not None and rpt.payload_json == {}
+    assert rpt.payload == {"shifts": [{"id": 1, "date": "2024-01-01"}, {"id": 2, "date": "2024-01-02"}]}
+
+
+def test_period_report_buckets_in_one_query(seeded_db):
+    with QueryCounter() as counter:
+        weeks = period_report(date(2024, 1, 1), date(2024, 1, 31), "week")
+    assert counter.count == 1
+    assert [(b["start"], b["end"]) for b in weeks["buckets"]][-1] == ("2024-01-29", "2024-01-31")
+    assert [b["scheduled_hours"] for b in weeks["buckets"]] == [62.5, 8.0, 0.0, 0.0, 0.0]
+    assert weeks["totals"]["scheduled_hours"] == 70.5 and weeks["totals"]["unique_users"] == 2
+    assert weeks["buckets"][0]["totals_per_user"][1]["worked_hours"] == 7.75
+
+    pay = period_report(date(2023, 12, 25), date(2024, 1, 10), "pay_period")
+    assert [(b["start"], b["end"]) for b in pay["buckets"]] == [
+        ("2023-12-25", "2023-12-31"), ("2024-01-01", "2024-01-10")]
+    months = period_report(date(2023, 12, 15), date(2024, 2, 29), "month")
+    assert [b["end"] for b in months["buckets"]] == ["2023-12-31", "2024-01-31", "2024-02-29"]
+    assert months["totals"] == weeks["totals"]
+    with pytest.raises(ValueError):
+        period_report(date(2024, 1, 1), date(2024, 1, 31), "fortnight")
+
+
+def test_period_reports_persist_by_type_and_period(seeded_db):
+    first = generate_period_report(date(2024, 1, 1), date(2024, 1, 31), "month")
+    again = generate_period_report(date(2024, 1, 1), date(2024, 1, 31), "month")
+    assert first.id == again.id and again.report_type == "by_month"
+    assert again.get_json()["payload"]["buckets"][0]["scheduled_hours"] == 70.5
+    assert Report.weekly_key(WEEK) == ("weekly", WEEK, date(2024, 1, 7))
+    assert generate_weekly_report(WEEK).period_end == date(2024, 1, 7)
+    with pytest.raises(ValueError):
+        generate_weekly_report(WEEK, date(2024, 1, 31))
+
+
+def test_report_api_conditional_get(seeded_db):
+    rpt = generate_weekly_report(date(2024, 1, 1))
+    token = seeded_db.post('/api/login', json={"username": "alice", "password": "alicepass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f'/api/reports/{rpt.id}'
+    res = seeded_db.get(url, headers=headers)
+    assert res.headers["Last-Modified"]
+    etag = res.headers["ETag"]
+    listing = seeded_db.get('/api/reports', headers=headers).headers["ETag"]
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        again = seeded_db.get(url, headers={**headers, "If-None-Match": etag})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert again.status_code == 304
+    assert not any("payload" in s for s in statements)
+    assert seeded_db.get(url, headers={**headers, "If-Modified-Since": res.headers["Last-Modified"]}).status_code == 304
+    assert seeded_db.get('/api/reports', headers={**headers, "If-None-Match": listing}).status_code == 304
+
+    schedule_shift(2, date(2024, 1, 6), dtime(10, 0), dtime(14, 0))
+    generate_weekly_report(date(2024, 1, 1))
+    assert seeded_db.get(url, headers={**headers, "If-None-Match": etag}).status_code == 200
+    assert seeded_db.get('/api/reports', headers={**headers, "If-None-Match": listing}).status_code == 200
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_payroll_overtime_and_attendance_rate(use_numpy):
+    if use_numpy and payroll.numpy is None:
+        pytest.skip("numpy not installed")
+    rows = []
+    for day in range(5):  # 10h a day: 2h daily overtime each day, 40h left
+        d = WEEK + timedelta(days=day)
+        rows.append((1, "ten", d, dtime(8, 0), 10.0, True))
+    for day in range(6):  # 7.5h a day: 45h, 5h weekly overtime
+        d = WEEK + timedelta(days=day)
+        rows.append((2, "six", d, dtime(9, 0), 7.5, True))
+    rows.append((2, "six", WEEK + timedelta(days=6), dtime(9, 0), None, False))  # missed
+    rows.append((3, "new", WEEK + timedelta(days=6), dtime(20, 0), None, False))  # not started
+    rows.append((4, "open", WEEK + timedelta(days=5), dtime(9, 0), None, True))  # no clock-out yet
+    result = compute_payroll(rows, WEEK, WEEK + timedelta(days=6),
+                             as_of=datetime(2024, 1, 7, 19, 0), use_numpy=use_numpy)
+
+    ten, six, new, still_in = (result["per_user"][u] for u in (1, 2, 3, 4))
+    assert (ten["regular_hours"], ten["daily_overtime_hours"], ten["weekly_overtime_hours"]) == (40.0, 10.0, 0.0)
+    assert (six["regular_hours"], six["daily_overtime_hours"], six["weekly_overtime_hours"]) == (40.0, 0.0, 5.0)
+    assert (six["shifts"], six["attended_shifts"], six["attendance_rate"]) == (7, 6, round(6 / 7, 4))
+    assert (new["scheduled_shifts"], new["shifts"], new["attendance_rate"]) == (1, 0, None)
+    assert (still_in["attendance_rate"], still_in["worked_hours"]) == (1.0, 0.0)
+    assert list(result["per_user"]) == [1, 2, 3, 4]
+    assert result["totals"]["overtime_hours"] == 15.0
+    assert result["totals"]["worked_hours"] == 95.0
+
+
+def test_report_download_uses_payroll_totals(seeded_db):
+    rpt = generate_weekly_report(WEEK)
+    totals = rpt.payload["payroll"]["totals"]
+    assert totals["worked_hours"] == 7.75 and totals["scheduled_shifts"] == len(rpt.payload["shifts"])
+    token = seeded_db.post('/api/login', json={"username": "alice", "password": "alicepass"}).json["access_token"]
+    res = seeded_db.get(f'/reports/download/{rpt.id}?format=csv', headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 200
+    header, row = list(csv.reader(io.StringIO(res.data.decode())))
+    assert row[:2] == ["2024-01-01", "2024-01-07"]
+    assert row[2:] == [str(len(rpt.payload["shifts"])), "7.75", str(totals["attendance_rate"]), "0.0"]
@@ -0,0 +1,91 @@
+import json
+import pytest
+from datetime import date, datetime, time as dtime
+from flask import jsonify
+
+from App import serializers
+from App.main import create_app
+from App.database import db, create_db
+from App.controllers import create_user, schedule_shift, clock_in, clock_out, approve_attendance
+from App.models import Attendance, Shift
+from App.serializers import dumps, json_response
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    create_user("admin", "adminpass")
+    zoe = create_user("zoë", "pass")
+    for day in range(1, 4):
+        s = schedule_shift(zoe.id, date(2024, 1, day), dtime(9, 30), dtime(17, 15), role="café", location=None)
+        schedule_shift(zoe.id, date(2024, 1, day), dtime(18, 0), dtime(20, 0))
+        clock_in(zoe.id, s.id, when=datetime(2024, 1, day, 9, 31, 7))
+        if day < 3:
+            clock_out(zoe.id, s.id, when=datetime(2024, 1, day, 17, 2))
+    approve_attendance(zoe.id, 1)
+    yield app.test_client()
+    db.drop_all()
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        if serializers.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(serializers, "orjson", None)
+    return request.param
+
+
+SAMPLE = {"b": [1, 2.5, 8.0, None, True], "a": {"ü": "naïve", "k": []}, "c": date(2024, 1, 2),
+          "d": datetime(2024, 1, 2, 9, 0), "e": {}, "f": "plain"}
+
+
+def test_dumps_matches_stdlib(encoder):
+    for sort_keys in (False, True):
+        for indent in (False, True):
+            expected = json.dumps(SAMPLE, sort_keys=sort_keys, default=str,
+                                  indent=2 if indent else None,
+                                  separators=None if indent else (",", ":"))
+            assert dumps(SAMPLE, sort_keys=sort_keys, indent=indent, default=str).decode() == expected
+    ascii_only = {"x": [1, "y"], "z": 0.25}
+    assert dumps(ascii_only) == json.dumps(ascii_only, separators=(",", ":")).encode()
+
+
+def test_projections_match_get_json():
+    shifts = Shift.query.order_by(Shift.id).all()
+    rows = db.session.execute(db.select(*Shift.json_columns())
+                              .join(Shift.user).order_by(Shift.id)).all()
+    assert [Shift.row_json(r) for r in rows] == [s.get_json() for s in shifts]
+    atts = Attendance.query.order_by(Attendance.id).all()
+    rows = db.session.execute(db.select(*Attendance.json_columns()).order_by(Attendance.id)).all()
+    assert [Attendance.row_json(r) for r in rows] == [a.get_json() for a in atts]
+
+
+def test_json_response_is_byte_identical_to_jsonify(client, encoder):
+    payload = {"shifts": [s.get_json() for s in Shift.query.all()], "count": 6, "name": "zoë"}
+    with client.application.test_request_context():
+        assert json_response(payload).get_data() == jsonify(payload).get_data()
+
+
+def test_read_endpoints_are_byte_identical(client, encoder):
+    token = client.post('/api/login', json={"username": "admin", "password": "adminpass"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with client.application.test_request_context():
+        roster = jsonify({"start_date": "2024-01-01", "end_date": "2024-01-03",
+                          "shifts": [s.get_json() for s in Shift.query.order_by(Shift.work_date, Shift.start_time, Shift.id)],
+                          "count": 6}).get_data()
+        user = jsonify({"user_id": 2, "username": "zoë",
+                        "shifts": [s.get_json() for s in Shift.query.filter_by(user_id=2)
+                                   .order_by(Shift.work_date, Shift.start_time, Shift.id)],
+                        "count": 6}).get_data()
+        pending = jsonify([a.get_json() for a in Attendance.query.filter(
+            Attendance.approved == db.false(), Attendance.time_out.isnot(None))]).get_data()
+        by_user = jsonify([a.get_json() for a in Attendance.query.filter_by(user_id=2)]).get_data()
+
+    assert client.get('/api/roster?start_date=2024-01-01&end_date=2024-01-03').data == roster
+    assert client.get('/api/users/2/shifts').data == user
+    assert client.get('/api/attendance?status=pending', headers=headers).data == pending
+    assert client.get('/api/attendance?user_id=2', headers=headers).data == by_user
+    assert client.get('/api/attendance?status=nope', headers=headers).status_code == 400
@@ -0,0 +1,366 @@
+import pytest
+from datetime import date, datetime, timedelta, time as dtime
+
+from App.main import create_app
+from App.database import db, create_db, hours_between, epoch_ms
+from sqlalchemy.dialects import postgresql
+from App.controllers import (
+    create_user,
+    schedule_shift,
+    get_roster,
+    get_roster_page,
+    schedule_bulk,
+    schedule_week,
+    get_daily_hours,
+    roster_cache,
+    update_user,
+    get_shift_summary,
+    ShiftConflictError,
+    coverage_timeline,
+    clock_in,
+    clock_out,
+)
+from App.models import Attendance, Shift, User
+from App.views.admin import AdminView
+from App.intervals import IntervalIndex
+from App.tests.utils import QueryCounter
+
+
+@pytest.fixture(autouse=True, scope="module")
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db'})
+    create_db()
+    users = [create_user(f"staff{i}", "pass") for i in range(3)]
+    for day in range(1, 8):
+        for u in users:
+            schedule_shift(u.id, date(2024, 1, day), dtime(9, 0), dtime(13, 0), role="floor")
+            schedule_shift(u.id, date(2024, 1, day), dtime(14, 0), dtime(18, 0), role="floor")
+    yield app.test_client()
+    db.drop_all()
+
+
+def _all_pages(limit):
+    pages, after = [], None
+    while True:
+        page = get_roster_page(date(2024, 1, 1), date(2024, 1, 7), limit=limit, after=after)
+        pages.append(page["shifts"])
+        after = page["next_cursor"]
+        if not after:
+            return pages
+
+
+def test_roster_pages_cover_full_roster_in_order():
+    full = get_roster(date(2024, 1, 1), date(2024, 1, 7))
+    pages = _all_pages(limit=5)
+    assert len(full) == 42
+    assert [len(p) for p in pages] == [5] * 8 + [2]
+    assert [s for p in pages for s in p] == full
+
+
+def test_roster_page_uses_fixed_query_count():
+    db.session.expunge_all()
+    first = get_roster_page(date(2024, 1, 1), date(2024, 1, 7), limit=10)
+    db.session.expunge_all()
+    with QueryCounter() as queries:
+        page = get_roster_page(date(2024, 1, 1), date(2024, 1, 7), limit=10,
+                               after=first["next_cursor"])
+    assert queries.count == 2  # version check + page
+    assert all(s["username"] for s in page["shifts"])
+
+
+def test_roster_cache_hits_until_dates_change():
+    cache = roster_cache()
+    start, end = date(2024, 1, 2), date(2024, 1, 3)
+    get_roster(start, end)
+    hits = cache.hits
+    with QueryCounter() as queries:
+        again = get_roster(start, end)
+    assert queries.count == 1  # version check only
+    assert cache.hits == hits + 1
+
+    # a write outside the range leaves the entry valid
+    schedule_shift(1, date(2024, 1, 20), dtime(9, 0), dtime(10, 0))
+    get_roster(start, end)
+    assert cache.hits == hits + 2
+
+    schedule_shift(1, date(2024, 1, 3), dtime(19, 0), dtime(21, 0))
+    misses = cache.misses
+    fresh = get_roster(start, end)
+    assert cache.misses == misses + 1
+    assert len(fresh) == len(again) + 1
+
+
+def test_rename_invalidates_cached_roster():
+    get_roster(date(2024, 1, 4), date(2024, 1, 4))
+    update_user(1, "renamed")
+    names = {s["username"] for s in get_roster(date(2024, 1, 4), date(2024, 1, 4)) if s["user_id"] == 1}
+    assert names == {"renamed"}
+
+
+class _RenameForm:
+    """Stands in for the Flask-Admin edit form: sets the new username."""
+    def __init__(self, username):
+        self.username = username
+
+    def populate_obj(self, obj):
+        obj.username = self.username
+
+
+def _admin_rename(client, user_id, username):
+    view = next(v for v in client.application.extensions["admin"][0]._views if isinstance(v, AdminView))
+    assert view.update_model(_RenameForm(username), db.session.get(User, user_id))
+
+
+def test_admin_rename_invalidates_cached_roster(client):
+    get_roster(date(2024, 1, 4), date(2024, 1, 4))
+    _admin_rename(client, 2, "admin-renamed")
+    names = {s["username"] for s in get_roster(date(2024, 1, 4), date(2024, 1, 4)) if s["user_id"] == 2}
+    assert names == {"admin-renamed"}
+
+
+def test_roster_page_rejects_bad_cursor():
+    with pytest.raises(ValueError):
+        get_roster_page(date(2024, 1, 1), date(2024, 1, 7), after="not-a-cursor")
+
+
+def test_roster_api_paginates_on_request(client):
+    res = client.get('/api/roster?start_date=2024-01-01&end_date=2024-01-01&limit=4')
+    assert res.status_code == 200
+    assert res.json["count"] == 4
+    nxt = client.get(f'/api/roster?start_date=2024-01-01&end_date=2024-01-01'
+                     f'&limit=4&after={res.json["next_cursor"]}')
+    assert nxt.json["count"] == 2
+    assert nxt.json["next_cursor"] is None
+
+
+def test_roster_api_answers_304_until_dates_change(client):
+    url = '/api/roster?start_date=2024-01-05&end_date=2024-01-05'
+    res = client.get(url)
+    etag = res.headers["ETag"]
+    with QueryCounter() as queries:
+        again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert queries.count == 1  # version check only
+    assert client.get(url + '&limit=2', headers={"If-None-Match": etag}).status_code == 200
+
+    schedule_shift(2, date(2024, 1, 5), dtime(19, 0), dtime(21, 0))
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json["count"] == res.json["count"] + 1
+
+
+def test_roster_api_etag_changes_on_admin_rename(client):
+    url = '/api/roster?start_date=2024-01-06&end_date=2024-01-06'
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    _admin_rename(client, 3, "etag-renamed")
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert {s["username"] for s in fresh.json["shifts"] if s["user_id"] == 3} == {"etag-renamed"}
+
+
+def test_unbounded_roster_cache_entry_does_not_break_writes(client):
+    assert client.get('/api/roster').status_code == 200
+    assert client.get('/api/roster?start_date=2024-01-01').status_code == 200
+    res = client.post('/api/shifts', json={"user_id": 1, "work_date": "2024-02-01",
+                                           "start_time": "09:00", "end_time": "10:00"})
+    assert res.status_code == 201
+
+
+def test_user_shifts_api_etag_tracks_rename(client):
+    url = '/api/users/3/shifts?start_date=2024-01-01&end_date=2024-01-07'
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    update_user(3, "staff2-renamed")
+    res = client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.json["username"] == "staff2-renamed"
+
+
+def test_schedule_bulk_creates_and_skips_in_one_transaction():
+    rows = [
+        {"user_id": 1, "date": "2024-02-05", "start": "09:00", "end": "17:00", "role": "floor"},
+        {"user_id": 2, "date": "2024-02-05", "start": "09:00", "end": "17:00"},
+        {"user_id": 1, "date": "2024-01-01", "start": "09:00", "end": "13:00", "location": "back"},
+    ]
+    with QueryCounter() as queries:
+        result = schedule_bulk(rows)
+    assert len(result["created"]) == 2
+    assert result["skipped"][0]["location"] == "back"
+    assert queries.count <= 13
+
+    created_ids = [s["id"] for s in result["created"]]
+    assert Attendance.query.filter(Attendance.shift_id.in_(created_ids)).count() == 2
+    assert get_daily_hours(date(2024, 2, 5), date(2024, 2, 5), user_id=1)[0].scheduled_hours == 8.0
+
+
+def test_schedule_bulk_rejects_unknown_user_and_duplicates():
+    with pytest.raises(ValueError):
+        schedule_bulk([{"user_id": 999, "date": "2024-02-06", "start": "09:00", "end": "17:00"}])
+    with pytest.raises(ValueError):
+        schedule_bulk([{"user_id": 1, "date": "2024-02-05", "start": "09:00", "end": "17:00",
+                        "role": "changed"}], skip_existing=False)
+    assert not db.session.dirty
+    assert Shift.query.filter_by(user_id=1, work_date=date(2024, 2, 5)).one().role != "changed"
+
+
+def test_schedule_week_reports_created_and_skipped():
+    windows = {i: ("09:00", "17:00") for i in range(5)}
+    first = schedule_week(3, date(2024, 2, 5), windows)
+    again = schedule_week(3, date(2024, 2, 5), {str(k): v for k, v in windows.items()})
+    assert (len(first["created"]), len(first["skipped"])) == (5, 0)
+    assert (len(again["created"]), len(again["skipped"])) == (0, 5)
+
+
+def test_interval_index_finds_overlaps_only():
+    index = IntervalIndex()
+    for start, end in [(9, 12), (13, 15), (15, 17), (20, 22)]:
+        index.add("k", start, end, f"{start}-{end}")
+    assert index.overlapping("k", 12, 13) == []  # touching is fine
+    assert [v for *_, v in index.overlapping("k", 11, 16)] == ["9-12", "13-15", "15-17"]
+    assert [v for *_, v in index.overlapping("k", 18, 23)] == ["20-22"]
+    assert index.overlapping("other", 0, 24) == []
+
+
+def test_schedule_shift_rejects_overlaps():
+    with pytest.raises(ShiftConflictError) as err:
+        schedule_shift(1, date(2024, 1, 2), dtime(12, 0), dtime(15, 0))
+    assert [(o["start"], o["end"]) for o in err.value.conflicts[0]["overlaps"]] == \
+        [("09:00", "13:00"), ("14:00", "18:00")]
+    schedule_shift(1, date(2024, 3, 12), dtime(10, 0), dtime(12, 0))
+    assert schedule_shift(1, date(2024, 3, 12), dtime(12, 0), dtime(14, 0)).id  # touching is fine
+    same = Shift.query.filter_by(user_id=1, work_date=date(2024, 1, 2), start_time=dtime(9, 0)).one()
+    assert schedule_shift(1, date(2024, 1, 2), dtime(9, 0), dtime(13, 0)).id == same.id
+
+
+def test_schedule_bulk_rejects_or_reports_overlaps():
+    rows = [
+        {"user_id": 2, "date": "2024-03-04", "start": "09:00", "end": "12:00"},
+        {"user_id": 2, "date": "2024-03-04", "start": "11:00", "end": "13:00"},  # earlier row
+        {"user_id": 2, "date": "2024-01-02", "start": "12:00", "end": "13:30"},  # existing shift
+        {"user_id": 3, "date": "2024-03-04", "start": "11:00", "end": "13:00"},  # other user
+    ]
+    before = Shift.query.count()
+    with pytest.raises(ShiftConflictError) as err:
+        schedule_bulk(rows)
+    assert len(err.value.conflicts) == 2
+    assert Shift.query.count() == before
+
+    result = schedule_bulk(rows, skip_conflicts=True)
+    assert len(result["created"]) == 2
+    assert [(c["date"], c["overlaps"][0]["id"]) for c in result["conflicts"]] == \
+        [("2024-03-04", None), ("2024-01-02", Shift.query.filter_by(
+            user_id=2, work_date=date(2024, 1, 2), start_time=dtime(9, 0)).one().id)]
+
+
+def test_update_shift_api_rejects_overlap(client):
+    shift = Shift.query.filter_by(user_id=2, work_date=date(2024, 1, 3), start_time=dtime(14, 0)).one()
+    res = client.put(f'/api/shifts/{shift.id}', json={"start_time": "12:00"})
+    assert res.status_code == 409
+    assert res.json["conflicts"][0]["overlaps"][0]["start"] == "09:00"
+    assert db.session.get(Shift, shift.id).start_time == dtime(14, 0)
+    assert client.put(f'/api/shifts/{shift.id}', json={"start_time": "13:00"}).status_code == 200
+
+
+def test_admin_shift_api_returns_conflicts(client):
+    res = client.post('/api/admin/shifts', json={"user_id": 3, "date": "2024-01-04",
+                                                 "start": "12:00", "end": "15:00"})
+    assert res.status_code == 409
+    assert [o["start"] for o in res.json["conflicts"][0]["overlaps"]] == ["09:00", "14:00"]
+    assert client.post('/api/admin/shifts', json={"user_id": 3, "date": "2024-03-20",
+                                                  "start": "12:00", "end": "15:00"}).status_code == 201
+
+
+def test_admin_batch_api_returns_or_skips_conflicts(client):
+    body = {"shifts": [{"user_id": 3, "date": "2024-01-04", "start": "12:00", "end": "15:00"},
+                       {"user_id": 3, "date": "2024-03-21", "start": "09:00", "end": "10:00"}]}
+    before = Shift.query.count()
+    res = client.post('/api/admin/shifts/batch', json=body)
+    assert res.status_code == 409
+    assert res.json["conflicts"][0]["date"] == "2024-01-04"
+    assert Shift.query.count() == before
+
+    res = client.post('/api/admin/shifts/batch', json={**body, "skip_conflicts": True})
+    assert res.status_code == 201
+    assert len(res.json["created"]) == 1 and len(res.json["conflicts"]) == 1
+
+
+def test_admin_week_api_returns_result_or_conflicts(client):
+    body = {"user_id": 3, "week_start": "2024-04-01",
+            "daily_windows": {"0": ["09:00", "12:00"], "2": ["09:00", "12:00"]}}
+    res = client.post('/api/admin/shifts/bulk', json=body)
+    assert res.status_code == 201
+    assert [s["date"] for s in res.json["created"]] == ["2024-04-01", "2024-04-03"]
+
+    body["daily_windows"] = {"0": ["11:00", "13:00"], "4": ["09:00", "12:00"]}
+    res = client.post('/api/admin/shifts/bulk', json=body)
+    assert res.status_code == 409
+    assert res.json["conflicts"][0]["date"] == "2024-04-01"
+    res = client.post('/api/admin/shifts/bulk', json={**body, "skip_conflicts": True})
+    assert res.status_code == 201
+    assert len(res.json["created"]) == 1 and len(res.json["conflicts"]) == 1
+
+
+def test_coverage_matches_brute_force_count():
+    cov = coverage_timeline(date(2024, 1, 1), date(2024, 1, 7), slot_minutes=30)
+    assert cov["slots"] == 7 * 48
+    origin = datetime(2024, 1, 1)
+    shifts = Shift.query.filter(Shift.work_date.between(date(2024, 1, 1), date(2024, 1, 7))).all()
+    for group in cov["groups"]:
+        mine = [s for s in shifts if (s.location, s.role) == (group["location"], group["role"])]
+        expected = [sum(datetime.combine(s.work_date, s.start_time) <= origin + timedelta(minutes=30 * i)
+                        < datetime.combine(s.work_date, s.end_time) for s in mine)
+                    for i in range(cov["slots"])]
+        assert group["scheduled"] == expected
+    assert sum(len(g["scheduled"]) for g in cov["groups"]) == cov["slots"] * len(cov["groups"])
+
+
+def test_coverage_compares_actual_attendance(client):
+    first = schedule_shift(1, date(2024, 4, 1), dtime(9, 0), dtime(12, 0), location="dock")
+    schedule_shift(2, date(2024, 4, 1), dtime(9, 0), dtime(12, 0), location="dock")
+    clock_in(1, first.id, when=datetime(2024, 4, 1, 9, 10))
+    clock_out(1, first.id, when=datetime(2024, 4, 1, 12, 0))
+
+    res = client.get('/api/shifts/coverage?start_date=2024-04-01&end_date=2024-04-01'
+                     '&slot=60&location=dock&compare=actual')
+    assert res.status_code == 200
+    [group] = res.json["groups"]
+    assert group["scheduled"][8:13] == [0, 2, 2, 2, 0]
+    assert group["actual"][8:13] == [0, 0, 1, 1, 0]  # counted from the 10:00 slot
+    assert group["understaffed"] == [{"start": "2024-04-01T09:00:00", "end": "2024-04-01T12:00:00", "short": 2}]
+    assert client.get('/api/shifts/coverage?start_date=2024-04-01&end_date=2024-04-01&slot=7').status_code == 400
+
+
+def test_shift_summary_matches_python_totals():
+    shifts = Shift.query.filter(Shift.work_date.between(date(2024, 1, 1), date(2024, 1, 7))).all()
+    summary = get_shift_summary(date(2024, 1, 1), date(2024, 1, 7))
+    assert summary["total_shifts"] == len(shifts)
+    assert summary["total_hours"] == round(sum(s.duration_hours() for s in shifts), 2)
+    assert summary["unique_users"] == len({s.user_id for s in shifts})
+    assert summary["shifts_by_role"]["floor"] == sum(1 for s in shifts if s.role == "floor")
+    assert "groups" not in summary
+
+
+def test_shift_summary_groups():
+    by_day = get_shift_summary(date(2024, 1, 1), date(2024, 1, 2), group_by="day")["groups"]
+    assert [g["date"] for g in by_day] == ["2024-01-01", "2024-01-02"]
+    assert by_day[1] == {"date": "2024-01-02", "shifts": 6, "users": 3, "hours": 24.0}
+
+    by_user = get_shift_summary(date(2024, 1, 2), date(2024, 1, 2), group_by="user")["groups"]
+    assert [g["shifts"] for g in by_user] == [2, 2, 2]
+
+    by_lr = get_shift_summary(date(2024, 1, 2), date(2024, 1, 2), group_by="location_role")["groups"]
+    assert by_lr == [{"location": None, "role": "floor", "shifts": 6, "hours": 24.0}]
+
+
+def test_shift_summary_rejects_unknown_group(client):
+    assert client.get('/api/shifts/summary?group_by=week').status_code == 400
+
+
+def test_hours_between_compiles_for_postgres():
+    sql = str(hours_between(Shift.start_time, Shift.end_time).compile(dialect=postgresql.dialect()))
+    assert sql == "GREATEST(EXTRACT(EPOCH FROM (shifts.end_time - shifts.start_time)) / 3600.0, 0)"
+
+
+def test_epoch_ms_compiles_for_postgres():
+    sql = str(epoch_ms(Attendance.time_in).compile(dialect=postgresql.dialect()))
+    assert sql == "CAST(round(EXTRACT(EPOCH FROM attendance.time_in) * 1000) AS BIGINT)"
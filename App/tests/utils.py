@@ -0,0 +1,20 @@
+from sqlalchemy import event
+
+from App.database import db
+
+
+class QueryCounter:
+    """Context manager counting the SQL statements sent to the engine."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self)
@@ -4,6 +4,7 @@ from flask_admin import Admin
 from flask import flash, redirect, url_for, request
 from App.database import db
 from App.models import User
+from App.controllers import invalidate_user
 
 class AdminView(ModelView):
 
@@ -16,6 +17,15 @@ class AdminView(ModelView):
         flash("Login to access admin")
         return redirect(url_for('index_page', next=request.url))
 
+    # rosters carry usernames, so invalidate them on edits (before the
+    # commit, so the shift version bumps go with it)
+    def on_model_change(self, form, model, is_created):
+        if not is_created:
+            invalidate_user(model.id)
+
+    def on_model_delete(self, model):
+        invalidate_user(model.id)
+
 def setup_admin(app):
     admin = Admin(app, name='FlaskMVC', template_mode='bootstrap3')
     admin.add_view(AdminView(User, db.session))
\ No newline at end of file
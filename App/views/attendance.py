@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from datetime import date
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, current_user
 
@@ -10,10 +12,11 @@ from App.controllers import (
     approve_attendance,
     unapprove_attendance,
     get_attendance,
-    get_attendance_for_user,
-    get_attendance_for_shift,
     attendance_to_json,
+    list_attendance_json,
+    set_attendance_approval,
 )
+from App.serializers import json_response
 
 attendance_views = Blueprint("attendance_views", __name__, url_prefix="/api/attendance")
 
@@ -24,27 +27,51 @@ def _admin_required():
         return jsonify(error="Admins only"), 403
     return None
 
+def _approval_selection(data):
+    """Keyword arguments for set_attendance_approval from a bulk request body."""
+    pairs = data.get("pairs")
+    if pairs is not None:
+        pairs = [(p["user_id"], p["shift_id"]) if isinstance(p, dict) else tuple(p) for p in pairs]
+    return {
+        "pairs": pairs,
+        "start_date": date.fromisoformat(data["start_date"]) if data.get("start_date") else None,
+        "end_date": date.fromisoformat(data["end_date"]) if data.get("end_date") else None,
+        "location": data.get("location"),
+        "user_ids": data.get("user_ids"),
+    }
+
+
+def _bulk_approval(approved: bool):
+    guard = _admin_required()
+    if guard:
+        return guard
+    data = request.get_json(silent=True) or {}
+    try:
+        result = set_attendance_approval(approved, **_approval_selection(data))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error=str(e) if isinstance(e, ValueError) else "invalid pairs"), 400
+    return jsonify(result), 200
+
 # --- routes ---
 
 @attendance_views.route("", methods=["GET"])
 @jwt_required()
 def list_attendance():
     """
-    GET /api/attendance?user_id=<id>&shift_id=<id>
+    GET /api/attendance?user_id=<id>&shift_id=<id>&status=<pending|clocked_in>
+    - If status given -> records awaiting approval / currently clocked in
+      (optionally only for user_id)
     - If user_id given -> list that user's attendance records
     - If shift_id given -> list all attendance on that shift
-    - If both missing -> 400
+    - If all missing -> 400
     """
-    user_id = request.args.get("user_id", type=int)
-    shift_id = request.args.get("shift_id", type=int)
-
-    if user_id:
-        items = get_attendance_for_user(user_id)
-        return jsonify([attendance_to_json(a) for a in items]), 200
-    if shift_id:
-        items = get_attendance_for_shift(shift_id)
-        return jsonify([attendance_to_json(a) for a in items]), 200
-    return jsonify(error="Provide user_id or shift_id"), 400
+    try:
+        items = list_attendance_json(user_id=request.args.get("user_id", type=int),
+                                     shift_id=request.args.get("shift_id", type=int),
+                                     status=request.args.get("status"))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return json_response(items), 200
 
 
 @attendance_views.route("/<int:attendance_id>", methods=["GET"])
@@ -164,3 +191,27 @@ def unapprove():
         return jsonify(attendance_to_json(att)), 200
     except ValueError as e:
         return jsonify(error=str(e)), 400
+
+
+@attendance_views.route("/approve/bulk", methods=["POST"])
+@jwt_required()
+def approve_bulk():
+    """
+    POST /api/attendance/approve/bulk
+    { "pairs": [{"user_id": 1, "shift_id": 10}, [2, 11]] }
+    or a filter: { "start_date": "2024-01-01", "end_date": "2024-01-07",
+                   "location": "front"?, "user_ids": [1, 2]? }
+    One UPDATE; returns { "approved": true, "count": n, "ids": [...] }
+    with the ids of the records that changed. Admins only.
+    """
+    return _bulk_approval(True)
+
+
+@attendance_views.route("/unapprove/bulk", methods=["POST"])
+@jwt_required()
+def unapprove_bulk():
+    """
+    POST /api/attendance/unapprove/bulk
+    Same body and response as /approve/bulk. Admins only.
+    """
+    return _bulk_approval(False)
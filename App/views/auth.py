@@ -6,6 +6,7 @@ from App.controllers.user import get_all_users
 
 from.index import index_views
 from App.models import User
+from App.hashing import HashingPoolBusy
 
 from App.controllers import (
     login,
@@ -34,7 +35,11 @@ def identify_page():
 @auth_views.route('/login', methods=['POST'])
 def login_action():
     data = request.form
-    token = login(data['username'], data['password'])
+    try:
+        token = login(data['username'], data['password'])
+    except HashingPoolBusy:
+        flash('Server is busy, please try again in a moment')
+        return redirect(url_for('index_views.login_page'))
     response = None
     if not token:
         flash('Invalid username or password given'), 401
@@ -98,7 +103,10 @@ API Routes
 @auth_views.route('/api/login', methods=['POST'])
 def user_login_api():
   data = request.json
-  token = login(data['username'], data['password'])
+  try:
+    token = login(data['username'], data['password'])
+  except HashingPoolBusy as e:
+    return jsonify(message=str(e)), 503
   if not token:
     return jsonify(message='bad username or password given'), 401
   response = jsonify(access_token=token) 
@@ -1,4 +1,5 @@
-from flask import Blueprint, redirect, render_template, request, send_from_directory, jsonify, url_for
+from flask import Blueprint, redirect, render_template, request, send_from_directory, jsonify, url_for, Response
+from App import metrics
 from App.controllers import create_user, initialize
 
 index_views = Blueprint('index_views', __name__, template_folder='../templates')
@@ -26,4 +27,8 @@ def contact_page():
 
 @index_views.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status':'healthy'})
\ No newline at end of file
+    return jsonify({'status':'healthy'})
+
+@index_views.route('/metrics', methods=['GET'])
+def metrics_page():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, request, send_file, flash, redirect, url_for
-from flask_jwt_extended import jwt_required
-from App.controllers.report import get_all_reports, get_report_by_id, generate_weekly_report
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, send_file, flash, redirect, url_for, Response, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, current_user
+from App.controllers.report import get_latest_report, get_report_by_id, list_reports, stream_export, report_validators
+from App.controllers.versions import REPORTS_SCOPE, range_etag
+from App.controllers.jobs import enqueue_report_job, get_report_job
+from App.conditional import not_modified, with_validators
+from datetime import date, datetime, timedelta
 import io
 import csv
 
@@ -12,23 +15,131 @@ report_views = Blueprint('report_views', __name__, template_folder='../templates
 @report_views.route('/reports', methods=['GET'])
 @jwt_required()
 def view_reports():
-    reports = get_all_reports()
-    latest_report = reports[0] if reports else None
+    latest_report = get_latest_report()
     return render_template('reports.html', report=latest_report)
 
 
+@report_views.route('/api/reports', methods=['GET'])
+@jwt_required()
+def list_reports_api():
+    """
+    GET /api/reports?limit=20&after=<cursor>&type=weekly
+    Report metadata only, newest first; follow next_cursor for older pages.
+    """
+    etag = range_etag(REPORTS_SCOPE, None, None, "list", sorted(request.args.items()))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        page = list_reports(limit=request.args.get('limit', type=int),
+                            after=request.args.get('after'),
+                            report_type=request.args.get('type'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return with_validators(jsonify(page), etag), 200
+
+
+@report_views.route('/api/reports/<int:report_id>', methods=['GET'])
+@jwt_required()
+def get_report_api(report_id):
+    validators = report_validators(report_id)
+    if not validators:
+        return jsonify(error="Report not found"), 404
+    cached = not_modified(*validators)
+    if cached:
+        return cached
+    report = get_report_by_id(report_id)
+    return with_validators(jsonify(report.get_json()), *validators), 200
+
+
 @report_views.route('/reports/generate', methods=['POST'])
 @jwt_required()
 def generate_report():
-  
-    end_date = datetime.utcnow().date()
-    start_date = end_date - timedelta(days=7)
-
-    new_report = generate_weekly_report(start_date, end_date)
-    flash("Weekly report generated successfully!", "success")
+    """
+    Queues report generation and returns straight away.
+    Form or JSON fields (all optional): start_date, end_date, bucket=day|week|pay_period|month.
+    Without a bucket: the weekly report for the week starting start_date
+    (default: last full Monday-Sunday week; end_date, if sent, must be
+    start_date + 6). With one: a period report.
+    JSON requests get 202 {"job": {...}}; poll GET /reports/jobs/<id>.
+    """
+    data = request.get_json(silent=True) if request.is_json else request.form
+    data = data or {}
+    bucket = data.get('bucket')
+    try:
+        start_date = _as_date(data.get('start_date'))
+        end_date = _as_date(data.get('end_date'))
+        if bucket:
+            job = enqueue_report_job("period", start_date, end_date, bucket,
+                                     requested_by_id=current_user.id)
+        else:
+            if start_date is None:
+                today = datetime.utcnow().date()
+                start_date = today - timedelta(days=today.weekday() + 7)
+            job = enqueue_report_job("weekly", start_date, end_date, requested_by_id=current_user.id)
+    except ValueError as e:
+        if request.is_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), "error")
+        return redirect(url_for('report_views.view_reports'))
+    if request.is_json:
+        return jsonify(job=job.get_json()), 202
+    flash(f"Report queued (job {job.id}).", "success")
     return redirect(url_for('report_views.view_reports'))
 
 
+@report_views.route('/api/reports/period', methods=['POST'])
+@jwt_required()
+def generate_period_report_api():
+    """
+    POST /api/reports/period
+    { "start_date": "2024-01-01", "end_date": "2024-03-31", "bucket": "month" }
+    Returns 202 {"job": {...}}; the report id appears on the job when done.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        job = enqueue_report_job("period", date.fromisoformat(data['start_date']),
+                                 date.fromisoformat(data['end_date']),
+                                 data.get('bucket', 'week'), requested_by_id=current_user.id)
+    except KeyError:
+        return jsonify(error="start_date and end_date are required"), 400
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(job=job.get_json()), 202
+
+
+@report_views.route('/reports/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def report_job_status(job_id):
+    job = get_report_job(job_id)
+    if not job:
+        return jsonify(error="Job not found"), 404
+    return jsonify(job.get_json()), 200
+
+
+@report_views.route('/reports/export', methods=['GET'])
+@jwt_required()
+def export_rows():
+    """
+    GET /reports/export?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&format=csv|ndjson&user_id=<id>
+    Every shift in the range with its attendance, streamed as it is read.
+    """
+    fmt = request.args.get('format', 'csv')
+    try:
+        start_date = date.fromisoformat(request.args['start_date'])
+        end_date = date.fromisoformat(request.args['end_date'])
+        chunks = stream_export(start_date, end_date, fmt, user_id=request.args.get('user_id', type=int))
+    except KeyError:
+        return jsonify(error="start_date and end_date are required"), 400
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f'export_{start_date}_{end_date}.{fmt}'
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
 @report_views.route('/reports/download/<int:report_id>')
 @jwt_required()
 def download_report(report_id):
@@ -38,12 +149,16 @@ def download_report(report_id):
         flash("Report not found", "error")
         return redirect(url_for('report_views.view_reports'))
 
+    # reports generated before payroll was added have no "payroll" section
+    totals = (report.payload.get('payroll') or {}).get('totals', {})
+    summary = [totals.get(key, 'N/A') for key in
+               ('scheduled_shifts', 'worked_hours', 'attendance_rate', 'overtime_hours')]
+
     if fmt == 'csv':
         output = io.StringIO()
         writer = csv.writer(output)
         writer.writerow(['Start Date', 'End Date', 'Total Shifts', 'Total Hours', 'Attendance Rate', 'Overtime Hours'])
-        writer.writerow([report.start_date, report.end_date, report.total_shifts,
-                         report.total_hours, report.attendance_rate, report.overtime_hours])
+        writer.writerow([report.period_start.isoformat(), report.period_end.isoformat(), *summary])
         output.seek(0)
         return send_file(
             io.BytesIO(output.getvalue().encode()),
@@ -61,15 +176,20 @@ def download_report(report_id):
 
         output = io.BytesIO()
         pdf = canvas.Canvas(output, pagesize=letter)
+        shifts, hours, rate, overtime = summary
         pdf.drawString(100, 750, f"Weekly Report: {report.period_start} - {report.period_end}")
-        pdf.drawString(100, 730, f"Total Shifts: {report.payload.get('total_shifts', 'N/A')}")
-        pdf.drawString(100, 710, f"Total Hours: {report.payload.get('total_hours', 'N/A')}")
-        pdf.drawString(100, 690, f"Staff Attendance Rate: {report.payload.get('attendance_rate', 'N/A')}")
-        pdf.drawString(100, 670, f"Overtime Hours: {report.payload.get('overtime_hours', 'N/A')}")
+        pdf.drawString(100, 730, f"Total Shifts: {shifts}")
+        pdf.drawString(100, 710, f"Total Hours: {hours}")
+        pdf.drawString(100, 690, f"Staff Attendance Rate: {rate}")
+        pdf.drawString(100, 670, f"Overtime Hours: {overtime}")
         pdf.save()
         output.seek(0)
         return send_file(output, mimetype='application/pdf',
                          as_attachment=True, download_name=f'report_{report.id}.pdf')
     else:
         flash("Invalid format", "error")
-        return redirect(url_for('report_views.view_reports'))
\ No newline at end of file
+        return redirect(url_for('report_views.view_reports'))
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if value else None
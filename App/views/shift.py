@@ -1,7 +1,15 @@
 from flask import Blueprint, request, jsonify, render_template
-from App.controllers import schedule_shift, schedule_week, get_roster
+from datetime import date, time as dtime
+from App.controllers import (
+    schedule_shift, schedule_week, get_roster, get_roster_page,
+    refresh_daily_hours, get_daily_hours, get_hours_totals, invalidate_roster,
+    get_shift_summary, get_user_shifts_json, range_etag, SHIFTS_SCOPE,
+    ShiftConflictError, check_shift_conflicts, coverage_timeline
+)
 from App.models import Shift, User
 from App.database import db
+from App.conditional import not_modified, with_validators
+from App.serializers import json_response
 
 shift_views = Blueprint('shift_views', __name__)
 
@@ -27,14 +35,17 @@ def create_shift():
         return jsonify({"error": "Missing JSON body"}), 400
 
     # delegate parsing/validation to controller
-    shift = schedule_shift(
-        user_id=data.get('user_id'),
-        work_date=data.get('work_date'),
-        start=data.get('start_time'),
-        end=data.get('end_time'),
-        role=data.get('role'),
-        location=data.get('location')
-    )
+    try:
+        shift = schedule_shift(
+            user_id=data.get('user_id'),
+            work_date=data.get('work_date'),
+            start=data.get('start_time'),
+            end=data.get('end_time'),
+            role=data.get('role'),
+            location=data.get('location')
+        )
+    except ShiftConflictError as e:
+        return _conflict_response(e)
 
     # assume controller returns a Shift instance or dict-like result
     if hasattr(shift, 'get_json'):
@@ -49,31 +60,59 @@ def create_week_schedule():
     if not data:
         return jsonify({"error": "Missing JSON body"}), 400
 
-    result = schedule_week(
-        user_id=data.get('user_id'),
-        week_start=data.get('week_start'),
-        daily_windows=data.get('daily_windows'),
-        role=data.get('role'),
-        location=data.get('location'),
-        skip_existing=data.get('skip_existing', True)
-    )
+    try:
+        result = schedule_week(
+            user_id=data.get('user_id'),
+            week_start=data.get('week_start'),
+            daily_windows=data.get('daily_windows'),
+            role=data.get('role'),
+            location=data.get('location'),
+            skip_existing=data.get('skip_existing', True),
+            skip_conflicts=data.get('skip_conflicts', False)
+        )
+    except ShiftConflictError as e:
+        return _conflict_response(e)
 
     return jsonify({"message": "Week scheduled", "result": result}), 201
 
 
 @shift_views.route('/api/roster', methods=['GET'])
 def get_roster_api():
-    """Get roster for a date range — delegate to controller"""
+    """Get roster for a date range — delegate to controller.
+    Pass `limit` and/or `after` (a previous next_cursor) for keyset pages.
+    """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-
-    roster = get_roster(start_date, end_date)
-    return jsonify({
+    start, end = _as_date(start_date), _as_date(end_date)
+
+    # answered from the shift change counters before any shift is read
+    etag = range_etag(SHIFTS_SCOPE, start, end, "roster", sorted(request.args.items()))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if 'limit' in request.args or 'after' in request.args:
+        try:
+            page = get_roster_page(start, end,
+                                   limit=request.args.get('limit', type=int),
+                                   after=request.args.get('after'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return with_validators(json_response({
+            "start_date": start_date,
+            "end_date": end_date,
+            "shifts": page["shifts"],
+            "count": len(page["shifts"]),
+            "next_cursor": page["next_cursor"]
+        }), etag), 200
+
+    roster = get_roster(start, end)
+    return with_validators(json_response({
         "start_date": start_date,
         "end_date": end_date,
         "shifts": roster,
         "count": len(roster) if roster is not None else 0
-    }), 200
+    }), etag), 200
 
 
 @shift_views.route('/api/shifts/<int:shift_id>', methods=['GET'])
@@ -93,19 +132,29 @@ def update_shift(shift_id):
         return jsonify({"error": "Shift not found"}), 404
 
     data = request.get_json() or {}
+    old_key = (shift.user_id, shift.work_date)
 
     # assign values directly; assume model or controller enforces types/constraints
     if 'work_date' in data:
-        shift.work_date = data['work_date']
+        shift.work_date = _as_date(data['work_date'])
     if 'start_time' in data:
-        shift.start_time = data['start_time']
+        shift.start_time = _as_time(data['start_time'])
     if 'end_time' in data:
-        shift.end_time = data['end_time']
+        shift.end_time = _as_time(data['end_time'])
     if 'role' in data:
         shift.role = data['role']
     if 'location' in data:
         shift.location = data['location']
 
+    try:
+        check_shift_conflicts(shift.user_id, shift.work_date, shift.start_time, shift.end_time,
+                              exclude_id=shift.id)
+    except ShiftConflictError as e:
+        db.session.rollback()
+        return _conflict_response(e)
+
+    refresh_daily_hours([old_key, (shift.user_id, shift.work_date)])
+    invalidate_roster([old_key[1], shift.work_date])
     db.session.commit()
     return jsonify({"message": "Shift updated", "shift": shift.get_json()}), 200
 
@@ -117,7 +166,10 @@ def delete_shift(shift_id):
     if not shift:
         return jsonify({"error": "Shift not found"}), 404
 
+    key = (shift.user_id, shift.work_date)
     db.session.delete(shift)
+    refresh_daily_hours([key])
+    invalidate_roster([key[1]])
     db.session.commit()
     return jsonify({"message": "Shift deleted"}), 200
 
@@ -129,58 +181,88 @@ def get_user_shifts(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    query = Shift.query.filter_by(user_id=user_id)
-
     start_str = request.args.get('start_date')
     end_str = request.args.get('end_date')
+    start, end = _as_date(start_str), _as_date(end_str)
 
-    if start_str:
-        query = query.filter(Shift.work_date >= start_str)
-    if end_str:
-        query = query.filter(Shift.work_date <= end_str)
+    # the counters are per date, not per user: another user's change on
+    # these dates costs a full response, never a stale 304
+    etag = range_etag(SHIFTS_SCOPE, start, end, "user", user_id, user.username)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    shifts = query.order_by(Shift.work_date.asc(), Shift.start_time.asc()).all()
-    return jsonify({
+    shifts = get_user_shifts_json(user_id, start, end)
+    return with_validators(json_response({
         "user_id": user_id,
         "username": user.username,
-        "shifts": [s.get_json() for s in shifts],
+        "shifts": shifts,
         "count": len(shifts)
-    }), 200
+    }), etag), 200
 
 
 @shift_views.route('/api/shifts/summary', methods=['GET'])
 def get_shifts_summary():
-    """Get summary statistics — view delegates filtering to model/query and summarises minimal info"""
-    query = Shift.query
-
+    """Get summary statistics — aggregated in the database by the controller.
+    Optional group_by=day|user|location_role adds a "groups" breakdown.
+    """
+    try:
+        summary = get_shift_summary(
+            start_date=_as_date(request.args.get('start_date')),
+            end_date=_as_date(request.args.get('end_date')),
+            user_id=request.args.get('user_id', type=int),
+            group_by=request.args.get('group_by'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary), 200
+
+
+@shift_views.route('/api/shifts/coverage', methods=['GET'])
+def get_shift_coverage():
+    """Headcount per location/role per time slot over a date range.
+    GET /api/shifts/coverage?start_date=&end_date=&slot=15&location=&role=&compare=actual
+    """
+    try:
+        coverage = coverage_timeline(
+            _as_date(request.args.get('start_date')),
+            _as_date(request.args.get('end_date')),
+            slot_minutes=request.args.get('slot', type=int),
+            location=request.args.get('location'),
+            role=request.args.get('role'),
+            actual=request.args.get('compare') == 'actual',
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return json_response(coverage), 200
+
+
+@shift_views.route('/api/hours', methods=['GET'])
+def get_hours():
+    """Per-user/per-day hours from the rollup table, plus range totals"""
     start_str = request.args.get('start_date')
     end_str = request.args.get('end_date')
     user_id = request.args.get('user_id', type=int)
 
-    if start_str:
-        query = query.filter(Shift.work_date >= start_str)
-    if end_str:
-        query = query.filter(Shift.work_date <= end_str)
-    if user_id:
-        query = query.filter_by(user_id=user_id)
+    start, end = _as_date(start_str), _as_date(end_str)
+    rows = get_daily_hours(start, end, user_id)
+    return jsonify({
+        "start_date": start_str,
+        "end_date": end_str,
+        "days": [r.get_json() for r in rows],
+        "totals": get_hours_totals(start, end, user_id)
+    }), 200
+
 
-    shifts = query.all()
+# ==================== HELPERS ====================
 
-    total_hours = sum(getattr(s, 'duration_hours', lambda: 0)() for s in shifts)
-    unique_users = len(set(s.user_id for s in shifts))
-    shifts_by_location = {}
-    shifts_by_role = {}
+def _conflict_response(e):
+    return jsonify({"error": str(e), "conflicts": e.conflicts}), 409
 
-    for shift in shifts:
-        if shift.location:
-            shifts_by_location[shift.location] = shifts_by_location.get(shift.location, 0) + 1
-        if shift.role:
-            shifts_by_role[shift.role] = shifts_by_role.get(shift.role, 0) + 1
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value) if value else None
+    return value
 
-    return jsonify({
-        "total_shifts": len(shifts),
-        "total_hours": round(total_hours, 2),
-        "unique_users": unique_users,
-        "shifts_by_location": shifts_by_location,
-        "shifts_by_role": shifts_by_role
-    }), 200
\ No newline at end of file
+def _as_time(value):
+    return dtime.fromisoformat(value) if isinstance(value, str) else value
@@ -1,5 +1,10 @@
 # gunicorn_config.py
 import multiprocessing
+import os
+import shutil
+import tempfile
+
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "shiftmate-metrics"))
 
 # The socket to bind.
 # "0.0.0.0" to bind to all interfaces. 8000 is the port number.
@@ -11,6 +16,24 @@ workers = 4
 # Use the 'gevent' worker type for async performance.
 worker_class = 'gevent'
 
+# Hash passwords in a small per-worker process pool so PBKDF2 doesn't block
+# the gevent loop (see App/hashing.py). Set to 0 to hash inline.
+raw_env = [
+    "FLASK_PASSWORD_POOL_SIZE=2",
+    "FLASK_PASSWORD_POOL_MAX_QUEUE=32",
+    # Each worker writes its request/SQL counters here; /metrics sums them.
+    "FLASK_METRICS_DIR=" + METRICS_DIR,
+    # Report jobs run in `flask report work`, not in the gevent workers.
+    "FLASK_REPORT_JOB_WORKERS=0",
+]
+
+
+def on_starting(server):
+    # Drop per-worker metric files left over from the previous run.
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
 # Log level
 loglevel = 'info'
 
@@ -0,0 +1,51 @@
+"""add query indexes
+
+Indexes the roster, clocked-in list and report index read through:
+ix_shifts_date_start (roster order), ix_attendance_clocked_in (partial,
+open attendance rows) and ix_reports_created (newest-first pagination).
+ix_attendance_pending_approval is built by 7934dc91c51a. Databases
+created by `flask init` already have them, so only missing ones are added.
+
+Revision ID: 63c12ad4a0c7
+Revises: 7934dc91c51a
+Create Date: 2026-10-17 20:23:13.823667
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '63c12ad4a0c7'
+down_revision = '7934dc91c51a'
+branch_labels = None
+depends_on = None
+
+attendance = sa.table("attendance", sa.column("time_in", sa.DateTime), sa.column("time_out", sa.DateTime))
+clocked_in = sa.and_(attendance.c.time_in.isnot(None), attendance.c.time_out.is_(None))
+
+INDEXES = [
+    # (name, table, columns, extra create_index kwargs)
+    ("ix_shifts_date_start", "shifts", ["work_date", "start_time"], {}),
+    ("ix_attendance_clocked_in", "attendance", ["user_id"],
+     {"sqlite_where": clocked_in, "postgresql_where": clocked_in}),
+    ("ix_reports_created", "reports", ["created_at", "id"], {}),
+]
+
+
+def _missing_index(table, name):
+    # False when the table doesn't exist yet: create_all() will build it whole
+    inspector = sa.inspect(op.get_bind())
+    return table in inspector.get_table_names() and \
+        name not in {ix["name"] for ix in inspector.get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns, kwargs in INDEXES:
+        if _missing_index(table, name):
+            op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
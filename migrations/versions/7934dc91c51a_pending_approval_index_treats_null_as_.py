@@ -0,0 +1,41 @@
+"""pending approval index treats NULL as not approved
+
+Rebuild ix_attendance_pending_approval with the predicate the pending list
+and bulk approval now filter on, coalesce(approved, false) = false; a
+partial index is only used when the query repeats its predicate.
+
+Revision ID: 7934dc91c51a
+Revises: f9fa3b98cae9
+Create Date: 2026-10-17 20:07:51.828853
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7934dc91c51a'
+down_revision = 'f9fa3b98cae9'
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_attendance_pending_approval"
+attendance = sa.table("attendance", sa.column("approved", sa.Boolean), sa.column("time_out", sa.DateTime))
+
+
+def _rebuild(approved_clause):
+    inspector = sa.inspect(op.get_bind())
+    if "attendance" not in inspector.get_table_names():
+        return
+    if INDEX in {ix["name"] for ix in inspector.get_indexes("attendance")}:
+        op.drop_index(INDEX, table_name="attendance")
+    where = sa.and_(approved_clause, attendance.c.time_out.isnot(None))
+    op.create_index(INDEX, "attendance", ["user_id"], sqlite_where=where, postgresql_where=where)
+
+
+def upgrade():
+    _rebuild(sa.func.coalesce(attendance.c.approved, sa.false()) == sa.false())
+
+
+def downgrade():
+    _rebuild(attendance.c.approved == sa.false())
@@ -0,0 +1,44 @@
+"""add daily_hours table
+
+Per-user, per-day hours rollup kept current by the shift and attendance
+writers. The table starts empty: run `flask report rebuild-rollups` after
+upgrading to fill it from existing shifts and attendance.
+
+Revision ID: 87f80f82b23b
+Revises: 63c12ad4a0c7
+Create Date: 2026-10-17 20:23:55.333540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '87f80f82b23b'
+down_revision = '63c12ad4a0c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # databases created by `flask init` after the model was added already have it
+    if "daily_hours" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "daily_hours",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("work_date", sa.Date(), nullable=False),
+        sa.Column("scheduled_hours", sa.Float(), nullable=False),
+        sa.Column("worked_hours", sa.Float(), nullable=False),
+        sa.Column("approved_hours", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "work_date", name="uq_daily_hours_user_date"),
+    )
+    op.create_index("ix_daily_hours_work_date", "daily_hours", ["work_date"])
+
+
+def downgrade():
+    op.drop_index("ix_daily_hours_work_date", table_name="daily_hours")
+    op.drop_table("daily_hours")
@@ -0,0 +1,39 @@
+"""add data_versions table
+
+Per (scope, work_date) change counters behind roster ETags, the roster
+cache and identity cache checks. An empty table is a valid starting point:
+the first write to a date creates its counter.
+
+Revision ID: b887a353d556
+Revises: 87f80f82b23b
+Create Date: 2026-10-17 20:24:31.416971
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b887a353d556'
+down_revision = '87f80f82b23b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # databases created by `flask init` after the model was added already have it
+    if "data_versions" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "data_versions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("scope", sa.String(length=40), nullable=False),
+        sa.Column("work_date", sa.Date(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("scope", "work_date", name="uq_data_version_scope_date"),
+    )
+
+
+def downgrade():
+    op.drop_table("data_versions")
@@ -0,0 +1,38 @@
+"""add reports.payload_packed
+
+Packed (columnar + compressed) report payloads; rows written before this
+keep their JSON payload until `flask report pack-payloads` converts them.
+Databases created by `flask init` after the column was added already have
+it, so the upgrade only adds what is missing.
+
+Revision ID: c18eeb788ec8
+Revises: 
+Create Date: 2026-10-17 20:06:12.300177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c18eeb788ec8'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing_column(table, column):
+    # False when the table doesn't exist yet: create_all() will build it whole
+    inspector = sa.inspect(op.get_bind())
+    return table in inspector.get_table_names() and \
+        column not in {c["name"] for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    if _missing_column("reports", "payload_packed"):
+        op.add_column("reports", sa.Column("payload_packed", sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("reports") as batch_op:
+        batch_op.drop_column("payload_packed")
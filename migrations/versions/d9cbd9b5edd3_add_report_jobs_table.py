@@ -0,0 +1,50 @@
+"""add report_jobs table
+
+Durable queue for report generation, drained by `flask report work`.
+
+Revision ID: d9cbd9b5edd3
+Revises: b887a353d556
+Create Date: 2026-10-17 20:24:32.627966
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9cbd9b5edd3'
+down_revision = 'b887a353d556'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # databases created by `flask init` after the model was added already have it
+    if "report_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("claimed_by", sa.String(length=80), nullable=True),
+        sa.Column("requested_by_id", sa.Integer(), nullable=True),
+        sa.Column("report_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["requested_by_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["report_id"], ["reports.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_report_jobs_status_id", "report_jobs", ["status", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_report_jobs_status_id", table_name="report_jobs")
+    op.drop_table("report_jobs")
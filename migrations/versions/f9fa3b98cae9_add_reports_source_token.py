@@ -0,0 +1,37 @@
+"""add reports.source_token
+
+The data-version token a stored report was built from; the report
+scheduler re-queues closed-period reports whose token no longer matches.
+Rows written before this have NULL, which counts as stale.
+
+Revision ID: f9fa3b98cae9
+Revises: c18eeb788ec8
+Create Date: 2026-10-17 20:07:19.483985
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9fa3b98cae9'
+down_revision = 'c18eeb788ec8'
+branch_labels = None
+depends_on = None
+
+
+def _missing_column(table, column):
+    # False when the table doesn't exist yet: create_all() will build it whole
+    inspector = sa.inspect(op.get_bind())
+    return table in inspector.get_table_names() and \
+        column not in {c["name"] for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    if _missing_column("reports", "source_token"):
+        op.add_column("reports", sa.Column("source_token", sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("reports") as batch_op:
+        batch_op.drop_column("source_token")
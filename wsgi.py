@@ -1,11 +1,16 @@
-import click, pytest, sys, json
+import click, pytest, sys, json, csv, time
 from flask.cli import AppGroup
 from datetime import datetime, date, time as dtime, timedelta
 from App.database import db, get_migrate
 from App.models import User, Shift, Attendance
 from App.main import create_app
+from App import bench
 from App.controllers import ( create_user, get_all_users_json, get_all_users, initialize )
-from App.controllers import schedule_shift, schedule_week, get_roster, clock_in, clock_out, weekly_report
+from App.controllers import schedule_shift, schedule_week, schedule_bulk, get_roster, clock_in, clock_out, weekly_report
+from App.controllers import rebuild_daily_hours, stream_export, pack_report_payloads, generate_period_report, run_pending_jobs
+from App.controllers import in_off_peak, schedule_closed_reports, get_user_shifts_json, ShiftConflictError
+from App.controllers import set_attendance_approval
+from App.serializers import dumps
 
 app = create_app()
 migrate = get_migrate(app)
@@ -21,6 +26,7 @@ test = AppGroup('test', help='Testing commands')
 shift_cli = AppGroup('shift', help='Shift scheduling and roster commands')
 att_cli = AppGroup('att', help='Attendance (clock in/out) commands')
 report_cli = AppGroup('report', help='Reporting commands')
+bench_cli = AppGroup('bench', help='Synthetic data and benchmark commands')
 
 '''
 User Commands
@@ -82,9 +88,12 @@ def schedule_simple_week(username, week_start):
     ws = date.fromisoformat(week_start)
     windows = {i: ("09:00","17:00") for i in range(5)}  # Mon-Fri
 
-    result = schedule_week(u.id, ws, windows, role=None, location=None, skip_existing=True)
+    result = schedule_week(u.id, ws, windows, role=None, location=None, skip_existing=True,
+                           skip_conflicts=True)
     created, skipped = result["created"], result["skipped"]
     print(f"Created {len(created)} shifts; Skipped (already existed) {len(skipped)}.")
+    if result["conflicts"]:
+        print(f"Left out {len(result['conflicts'])} day(s) overlapping existing shifts.")
 
 '''
 Integration Test Commands
@@ -110,7 +119,7 @@ app.cli.add_command(test)
 
 
 def _print_json(data):
-    print(json.dumps(data, indent=2, default=str))
+    print(dumps(data, indent=True, default=str).decode())
 
 def _to_time(s):
     return dtime.fromisoformat(s)
@@ -150,14 +159,18 @@ def _find_shift_id(username, work_date, start_str=None):
 def shift_add(username, work_date, start, end, role, location):
     u = _find_user(username)
     if not u: return
-    s = schedule_shift(
-        user_id=u.id,
-        work_date=date.fromisoformat(work_date),
-        start=_to_time(start),
-        end=_to_time(end),
-        role=role,
-        location=location
-    )
+    try:
+        s = schedule_shift(
+            user_id=u.id,
+            work_date=date.fromisoformat(work_date),
+            start=_to_time(start),
+            end=_to_time(end),
+            role=role,
+            location=location
+        )
+    except ShiftConflictError as e:
+        print(e)
+        return
     print("Created shift:")
     _print_json(s.get_json())
 
@@ -173,9 +186,8 @@ def shift_roster(start, end):
 @click.argument("start")
 @click.argument("end")
 def shift_user(username, start, end):
-    roster = get_roster(date.fromisoformat(start), date.fromisoformat(end))
-    only = [r for r in roster if r.get('username') == username]
-    _print_json(only)
+    u = User.query.filter_by(username=username).first()
+    _print_json(get_user_shifts_json(u.id, date.fromisoformat(start), date.fromisoformat(end)) if u else [])
 
 @shift_cli.command("find", help="Find a user's shift IDs on a given date (useful before clock-in/out)")
 @click.argument("username")
@@ -193,6 +205,42 @@ def shift_find(username, work_date):
     else:
         _print_json(payload)
 
+@shift_cli.command("bulk", help="Schedule many shifts from a CSV file in one transaction")
+@click.argument("csv_file", type=click.File("r"))
+@click.option("--no-skip", is_flag=True, help="Fail instead of skipping windows that already exist")
+@click.option("--skip-conflicts", is_flag=True, help="Leave out rows overlapping a user's other shifts instead of failing")
+def shift_bulk(csv_file, no_skip, skip_conflicts):
+    """
+    CSV header: username (or user_id), date, start, end, role, location
+    """
+    rows = list(csv.DictReader(csv_file))
+    names = {r["username"] for r in rows if not r.get("user_id") and r.get("username")}
+    ids = dict(db.session.execute(
+        db.select(User.username, User.id).where(User.username.in_(names))
+    ).all()) if names else {}
+    unknown = names - ids.keys()
+    if unknown:
+        print(f"Unknown user(s): {', '.join(sorted(unknown))}")
+        return
+    for r in rows:
+        if not r.get("user_id"):
+            r["user_id"] = ids[r["username"]]
+        r["role"] = r.get("role") or None
+        r["location"] = r.get("location") or None
+    try:
+        result = schedule_bulk(rows, skip_existing=not no_skip, skip_conflicts=skip_conflicts)
+    except ShiftConflictError as e:
+        print(e)
+        _print_json(e.conflicts)
+        return
+    except ValueError as e:
+        print(e)
+        return
+    print(f"Created {len(result['created'])} shifts; Skipped (already existed) {len(result['skipped'])}.")
+    if result["conflicts"]:
+        print(f"Left out {len(result['conflicts'])} overlapping shift(s):")
+        _print_json(result["conflicts"])
+
 app.cli.add_command(shift_cli)
 
 # ---- ATTENDANCE COMMANDS ----
@@ -242,6 +290,30 @@ def att_status(username, shift_id):
         _print_json(rec.get_json())
     else:
         print("No attendance record found.")
+@att_cli.command("approve", help="Approve (or --unapprove) many attendance records in one UPDATE, by filter or user:shift pairs")
+@click.option("--start", "start_date", default=None, help="YYYY-MM-DD (with --end)")
+@click.option("--end", "end_date", default=None, help="YYYY-MM-DD (with --start)")
+@click.option("--location", default=None)
+@click.option("--user", "usernames", multiple=True, help="Username; repeatable")
+@click.option("--pair", "pairs", multiple=True, help="USER_ID:SHIFT_ID; repeatable")
+@click.option("--unapprove", is_flag=True, default=False)
+def att_approve(start_date, end_date, location, usernames, pairs, unapprove):
+    user_ids = None
+    if usernames:
+        users = [_find_user(name) for name in usernames]
+        if not all(users): return
+        user_ids = [u.id for u in users]
+    try:
+        result = set_attendance_approval(
+            not unapprove,
+            pairs=[tuple(int(x) for x in p.split(":")) for p in pairs] or None,
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            end_date=date.fromisoformat(end_date) if end_date else None,
+            location=location, user_ids=user_ids)
+    except ValueError as e:
+        print(e)
+        return
+    _print_json(result)
 app.cli.add_command(att_cli)
 
 # ---- REPORT COMMANDS  ----
@@ -250,4 +322,114 @@ app.cli.add_command(att_cli)
 def report_week(week_start):
     rep = weekly_report(date.fromisoformat(week_start))
     _print_json(rep)
-app.cli.add_command(report_cli)
\ No newline at end of file
+
+@report_cli.command("rebuild-rollups", help="Rebuild the per-user/per-day hours rollup from shifts and attendance")
+def report_rebuild_rollups():
+    count = rebuild_daily_hours()
+    print(f"Rebuilt {count} daily hours rows.")
+
+@report_cli.command("pack-payloads", help="Convert JSON report payloads to the packed column (run `flask db upgrade` first)")
+@click.option("--batch", default=100, show_default=True, help="Reports per commit")
+def report_pack_payloads(batch):
+    print(f"Packed {pack_report_payloads(batch)} report payload(s).")
+
+@report_cli.command("period", help="Hours per day/week/pay_period/month over a date range (saved as a report)")
+@click.argument("start_date")
+@click.argument("end_date")
+@click.option("--bucket", type=click.Choice(["day", "week", "pay_period", "month"]), default="week", show_default=True)
+def report_period(start_date, end_date, bucket):
+    rpt = generate_period_report(date.fromisoformat(start_date), date.fromisoformat(end_date), bucket)
+    _print_json(rpt.get_json())
+
+@report_cli.command("work", help="Run queued report jobs in this process")
+@click.option("--once", is_flag=True, help="Exit when the queue is empty instead of polling")
+@click.option("--poll", default=2.0, show_default=True, help="Seconds between checks when idle")
+def report_work(once, poll):
+    while True:
+        ran = run_pending_jobs()
+        if ran:
+            print(f"Ran {ran} report job(s).")
+        if once:
+            break
+        time.sleep(poll)
+
+@report_cli.command("scheduler", help="Pre-compute missing or stale weekly/monthly reports for closed periods during off-peak hours")
+@click.option("--interval", default=300, show_default=True, help="Seconds between checks")
+@click.option("--once", is_flag=True, help="Check once and exit")
+@click.option("--anytime", is_flag=True, help="Ignore REPORT_OFF_PEAK_HOURS")
+def report_scheduler(interval, once, anytime):
+    while True:
+        if anytime or in_off_peak():
+            jobs = schedule_closed_reports()
+            if jobs:
+                print(f"Queued {len(jobs)} report job(s): {', '.join(str(j.id) for j in jobs)}")
+            ran = run_pending_jobs()
+            if ran:
+                print(f"Ran {ran} report job(s).")
+        if once:
+            break
+        time.sleep(interval)
+
+@report_cli.command("export", help="Stream every shift/attendance row in a date range as CSV or NDJSON")
+@click.argument("start_date")
+@click.argument("end_date")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option("--user-id", type=int, default=None)
+@click.option("--output", type=click.File("w"), default="-", help="Write here instead of stdout")
+def report_export(start_date, end_date, fmt, user_id, output):
+    for chunk in stream_export(date.fromisoformat(start_date), date.fromisoformat(end_date), fmt, user_id=user_id):
+        output.write(chunk)
+app.cli.add_command(report_cli)
+
+# ---- BENCHMARK COMMANDS ----
+@bench_cli.command("seed", help="Bulk-generate synthetic users, shifts and attendance")
+@click.option("--users", default=100, show_default=True)
+@click.option("--weeks", default=4, show_default=True)
+@click.option("--start", default=None, help="First Monday (YYYY-MM-DD); default: --weeks before this week")
+@click.option("--seed", "rng_seed", default=42, show_default=True)
+def bench_seed(users, weeks, start, rng_seed):
+    result = bench.seed(users=users, weeks=weeks, rng_seed=rng_seed,
+                        start=date.fromisoformat(start) if start else None)
+    _print_json(result)
+
+@bench_cli.command("run", help="Time roster/report/clock/schedule paths; prints JSON (writes data: use a scratch DB)")
+@click.option("--repeat", default=10, show_default=True)
+@click.option("--ranges", default="1,4", show_default=True, help="Roster ranges to time, in weeks")
+@click.option("--output", type=click.File("w"), default=None, help="Write JSON here instead of stdout")
+def bench_run(repeat, ranges, output):
+    result = bench.run(repeat=repeat, range_weeks=[int(w) for w in ranges.split(",")])
+    if output:
+        json.dump(result, output, indent=2)
+    else:
+        _print_json(result)
+
+@bench_cli.command("clock-storm", help="Clock-in throughput with and without write coalescing (writes data)")
+@click.option("--clients", default=100, show_default=True, help="Concurrent clock-ins")
+@click.option("--windows", default="0,5", show_default=True, help="ATTENDANCE_COALESCE_MS values to compare")
+def bench_clock_storm(clients, windows):
+    _print_json(bench.clock_storm(clients=clients, windows=[int(w) for w in windows.split(",")]))
+
+@bench_cli.command("report-storage", help="Report payload size and encode/decode time, JSON vs packed")
+@click.option("--weeks", default=52, show_default=True)
+def bench_report_storage(weeks):
+    _print_json(bench.report_storage(weeks=weeks))
+@bench_cli.command("serialize", help="Rows/s of ORM get_json() vs column-projection serializers on read paths")
+@click.option("--weeks", default=4, show_default=True)
+@click.option("--repeat", default=5, show_default=True)
+def bench_serialize(weeks, repeat):
+    _print_json(bench.serialization(weeks=weeks, repeat=repeat))
+@bench_cli.command("overlaps", help="Shift overlap checks/s, interval index vs per-user scan")
+@click.option("--users", default=100, show_default=True)
+@click.option("--shifts", default=40000, show_default=True)
+@click.option("--write", is_flag=True, help="Also schedule them with schedule_bulk (writes data)")
+def bench_overlaps(users, shifts, write):
+    _print_json(bench.overlap_check(users=users, shifts=shifts, write=write))
+@bench_cli.command("payroll", help="Payroll/overtime computation over every shift, numpy vs plain Python")
+@click.option("--repeat", default=5, show_default=True)
+def bench_payroll(repeat):
+    _print_json(bench.payroll(repeat=repeat))
+@bench_cli.command("approvals", help="Approve the last N days of attendance, per-record calls vs one bulk UPDATE (writes data)")
+@click.option("--days", default=7, show_default=True)
+def bench_approvals(days):
+    _print_json(bench.approvals(days=days))
+app.cli.add_command(bench_cli)
\ No newline at end of file